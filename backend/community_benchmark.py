@@ -0,0 +1,97 @@
+import argparse
+import os
+import time
+import numpy as np
+from src.louvain import build_adjacency, hierarchical_louvain, modularity
+
+# Compares the in-process Louvain engine with GDS Leiden on the entity graph of a database,
+# or times the local engine alone on a synthetic graph with planted communities.
+# Usage: python community_benchmark.py --synthetic 20000
+#        python community_benchmark.py  (uses NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, NEO4J_DATABASE)
+# The database run writes to the scratch property `communities_benchmark` and removes it afterwards.
+
+BENCHMARK_PROPERTY = "communities_benchmark"
+BENCHMARK_PROJECTION = "communities_benchmark"
+
+
+def synthetic_graph(nodes, community_size, degree, noise, seed=0):
+    rng = np.random.default_rng(seed)
+    planted = np.arange(nodes) // community_size
+    edge_count = nodes * degree // 2
+    sources = rng.integers(0, nodes, edge_count)
+    targets = planted[sources] * community_size + rng.integers(0, community_size, edge_count)
+    targets = np.minimum(targets, nodes - 1)
+    noisy = rng.random(edge_count) < noise
+    targets[noisy] = rng.integers(0, nodes, noisy.sum())
+    return build_adjacency(sources, targets, np.ones(edge_count), nodes), planted
+
+
+def describe(levels, adjacency):
+    return ", ".join(f"level {level}: {communities.max() + 1} communities, modularity {modularity(adjacency, communities):.4f}"
+                     for level, communities in enumerate(levels))
+
+
+def run_synthetic(args):
+    adjacency, planted = synthetic_graph(args.synthetic, args.community_size, args.degree, args.noise)
+    print(f"Synthetic graph: {adjacency.shape[0]} nodes, {adjacency.nnz // 2} relationships, planted modularity {modularity(adjacency, planted):.4f}")
+    start = time.perf_counter()
+    levels, _ = hierarchical_louvain(adjacency, args.levels)
+    print(f"local: {time.perf_counter() - start:.2f} s; {describe(levels, adjacency)}")
+
+
+def run_database(args):
+    from dotenv import load_dotenv
+    from graphdatascience import GraphDataScience
+    from src.communities import CypherRunner, write_local_communities, write_communities, create_community_graph_projection, GET_COMMUNITY_ADJACENCY, NODE_PROJECTION
+    load_dotenv()
+    uri, username, password, database = (os.getenv('NEO4J_URI'), os.getenv('NEO4J_USERNAME'), os.getenv('NEO4J_PASSWORD'), os.getenv('NEO4J_DATABASE'))
+    runner = CypherRunner(uri, username, password, database)
+    edges = runner.run_cypher(GET_COMMUNITY_ADJACENCY.format(node_projection=NODE_PROJECTION))
+    element_ids, endpoints = np.unique(np.concatenate([edges['source'].to_numpy(), edges['target'].to_numpy()]), return_inverse=True)
+    adjacency = build_adjacency(endpoints[:len(edges)], endpoints[len(edges):], edges['weight'].to_numpy(dtype=float), len(element_ids))
+    index = {element_id: position for position, element_id in enumerate(element_ids.tolist())}
+    print(f"Entity graph: {len(element_ids)} nodes, {len(edges)} weighted relationships")
+
+    def written_levels():
+        rows = runner.run_cypher(f"MATCH (e) WHERE e.{BENCHMARK_PROPERTY} IS NOT NULL RETURN elementId(e) AS elementId, e.{BENCHMARK_PROPERTY} AS communities")
+        level_count = min(len(communities) for communities in rows['communities'])
+        levels = [np.zeros(len(element_ids), dtype=np.int64) for _ in range(level_count)]
+        for element_id, communities in zip(rows['elementId'], rows['communities']):
+            for level in range(level_count):
+                levels[level][index[element_id]] = communities[level]
+        return [np.unique(level, return_inverse=True)[1] for level in levels]
+
+    try:
+        start = time.perf_counter()
+        write_local_communities(runner, BENCHMARK_PROPERTY)
+        print(f"local: {time.perf_counter() - start:.2f} s including fetch and write; {describe(written_levels(), adjacency)}")
+        runner.run_cypher(f"MATCH (e) WHERE e.{BENCHMARK_PROPERTY} IS NOT NULL REMOVE e.{BENCHMARK_PROPERTY}")
+        if args.skip_gds:
+            return
+        gds = GraphDataScience(uri, auth=(username, password), database=database)
+        start = time.perf_counter()
+        graph_project = create_community_graph_projection(gds, project_name=BENCHMARK_PROJECTION)
+        write_communities(gds, graph_project, project_name=BENCHMARK_PROJECTION, write_property=BENCHMARK_PROPERTY)
+        print(f"gds:   {time.perf_counter() - start:.2f} s including projection and write; {describe(written_levels(), adjacency)}")
+        gds.graph.drop(BENCHMARK_PROJECTION)
+    finally:
+        runner.run_cypher(f"MATCH (e) WHERE e.{BENCHMARK_PROPERTY} IS NOT NULL REMOVE e.{BENCHMARK_PROPERTY}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--synthetic", type=int, default=0, help="number of nodes of a synthetic graph; 0 benchmarks the configured database")
+    parser.add_argument("--community-size", type=int, default=100)
+    parser.add_argument("--degree", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--levels", type=int, default=3)
+    parser.add_argument("--skip-gds", action="store_true")
+    args = parser.parse_args()
+    if args.synthetic:
+        run_synthetic(args)
+    else:
+        run_database(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Measures the import cost of the backend with `python -X importtime` and prints the modules
+with the highest cumulative import time, to catch heavy imports creeping back into the
+startup path.
+
+    python import_benchmark.py [--module score] [--top 25]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+def measure_imports(module):
+    """Imports `module` in a fresh interpreter; returns (wall seconds, [(cumulative us, self us, module)])."""
+    start = time.time()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+    elapsed = time.time() - start
+    if result.returncode != 0:
+        tail = result.stderr.strip().splitlines()[-1:] or [""]
+        raise RuntimeError(f"import {module} failed: {tail[0]}")
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings.append((int(cumulative_us), int(self_us), name.strip()))
+    return elapsed, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="score")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+    elapsed, timings = measure_imports(args.module)
+    print(f"import {args.module}: {elapsed:.2f}s wall, {len(timings)} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(timings, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
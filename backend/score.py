@@ -8,19 +8,28 @@ from src.shared.llm_graph_builder_exception import LLMGraphBuilderException
 import uvicorn
 import asyncio
 import base64
-from langserve import add_routes
-from langchain_google_vertexai import ChatVertexAI
 from src.api_response import create_api_response
 from src.graphDB_dataAccess import graphDBdataAccess
 from src.graph_query import get_graph_results,get_chunktext_results,visualize_schema
 from src.chunkid_entities import get_entities_from_chunkids
-from src.post_processing import create_vector_fulltext_indexes, create_entity_embedding, graph_schema_consolidation
+from src.post_processing import create_vector_fulltext_indexes, create_entity_embedding, graph_schema_consolidation, get_entity_embedding_progress
 from sse_starlette.sse import EventSourceResponse
-from src.communities import create_communities
+from src.communities import create_communities, get_community_update_report
+from src.community_summarizer import get_community_summary_stats
 from src.neighbours import get_neighbour_nodes
+from src.extraction_scheduler import get_extraction_scheduler_stats
+from src.job_queue import ExtractJobQueue, ExtractWorkerPool
+from src.embedding_cache import get_embedding_cache_stats
+from src.extraction_cache import get_extraction_cache_stats
+from src.near_duplicate_index import get_near_duplicate_stats
+from src.count_reconciliation import get_count_reconciliation_stats, is_count_reconciliation_pending
+from src.status_bus import stream_document_status, status_bus
+from src.shared.driver_registry import driver_registry, get_database_key
+from src.shared.embedding_registry import embedding_registry
+from src.warmup import start_background_warmup, get_warmup_stats
+from src.document_sources.pdf_parser import shutdown_pdf_parser
 import json
 from typing import List, Optional
-from google.oauth2.credentials import Credentials
 import os
 from src.logger import CustomLogger
 from datetime import datetime, timezone
@@ -29,7 +38,6 @@ import gc
 from Secweb.XContentTypeOptions import XContentTypeOptions
 from Secweb.XFrameOptions import XFrame
 from fastapi.middleware.gzip import GZipMiddleware
-from src.ragas_eval import *
 from starlette.types import ASGIApp, Receive, Scope, Send
 from langchain_neo4j import Neo4jGraph
 from starlette.middleware.sessions import SessionMiddleware
@@ -114,6 +122,8 @@ app.add_middleware(SessionMiddleware, secret_key=os.urandom(24))
 
 is_gemini_enabled = os.environ.get("GEMINI_ENABLED", "False").lower() in ("true", "1", "yes")
 if is_gemini_enabled:
+    from langserve import add_routes
+    from langchain_google_vertexai import ChatVertexAI
     add_routes(app,ChatVertexAI(), path="/vertexai")
 
 app.add_api_route("/health", health([healthy_condition, healthy]))
@@ -151,6 +161,7 @@ async def create_source_knowledge_graph_url(
             lst_file_name,success_count,failed_count = await asyncio.to_thread(create_source_node_graph_url_s3,graph, model, source_url, aws_access_key_id, aws_secret_access_key, source_type
             )
         elif source_type == 'gcs bucket':
+            from google.oauth2.credentials import Credentials
             lst_file_name,success_count,failed_count = create_source_node_graph_url_gcs(graph, model, gcs_project_id, gcs_bucket_name, gcs_bucket_folder, source_type,Credentials(access_token)
             )
         elif source_type == 'web-url':
@@ -192,6 +203,46 @@ async def create_source_knowledge_graph_url(
     finally:
         gc.collect()
 
+EXTRACT_QUEUE_ENABLED = os.environ.get("EXTRACT_QUEUE_ENABLED", "False").lower() in ("true", "1", "yes")
+extract_job_queue = ExtractJobQueue() if EXTRACT_QUEUE_ENABLED else None
+extract_worker_pool = None
+
+@app.on_event("startup")
+async def warm_up_models():
+    start_background_warmup()
+
+@app.on_event("startup")
+async def start_extract_workers():
+    global extract_worker_pool
+    if EXTRACT_QUEUE_ENABLED:
+        extract_worker_pool = ExtractWorkerPool(extract_job_queue, run_queued_extract_job)
+        extract_worker_pool.start()
+
+@app.on_event("shutdown")
+async def stop_extract_workers():
+    if extract_worker_pool is not None:
+        await extract_worker_pool.stop()
+
+@app.on_event("shutdown")
+async def close_neo4j_drivers():
+    driver_registry.close_all()
+
+@app.on_event("shutdown")
+async def stop_pdf_parser():
+    await asyncio.to_thread(shutdown_pdf_parser)
+
+async def run_queued_extract_job(params, attempt=1):
+    if attempt > 1:
+        # The worker of the previous attempt stopped mid-job and left the Document in
+        # Processing, which processing_source would skip. Reset it so the job runs again;
+        # chunks extracted before the stop are skipped by the dedup check or served from the
+        # extraction cache.
+        graph = create_graph_database_connection(params['uri'], params['userName'], params['password'], params['database'])
+        file_name = sanitize_filename(params['file_name']) if params['source_type'] == 'local file' else params['file_name']
+        await asyncio.to_thread(set_status_retry, graph, file_name, params['retry_condition'])
+        logging.info(f"Resuming extraction of {file_name} after an interrupted attempt")
+    return await process_extract_request(**params)
+
 @app.post("/extract")
 async def extract_knowledge_graph_from_file(
     uri=Form(None),
@@ -218,7 +269,56 @@ async def extract_knowledge_graph_from_file(
     access_token=Form(None),
     retry_condition=Form(None),
     additional_instructions=Form(None),
-    email=Form(None)
+    email=Form(None),
+    priority: Optional[int] = Form(None),
+    incremental=Form(None),
+    bypass_cache=Form(None)
+):
+    """
+    Queues the extraction of a source when EXTRACT_QUEUE_ENABLED is set and returns the
+    job id; otherwise runs the extraction within the request (see process_extract_request).
+    """
+    if not EXTRACT_QUEUE_ENABLED:
+        return await process_extract_request(uri, userName, password, model, database, source_url, aws_access_key_id, aws_secret_access_key, wiki_query, gcs_project_id, gcs_bucket_name, gcs_bucket_folder, gcs_blob_filename, source_type, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, language, access_token, retry_condition, additional_instructions, email, incremental, bypass_cache)
+    try:
+        params = {'uri': uri, 'userName': userName, 'password': password, 'model': model, 'database': database, 'source_url': source_url, 'aws_access_key_id': aws_access_key_id, 'aws_secret_access_key': aws_secret_access_key, 'wiki_query': wiki_query, 'gcs_project_id': gcs_project_id, 'gcs_bucket_name': gcs_bucket_name, 'gcs_bucket_folder': gcs_bucket_folder, 'gcs_blob_filename': gcs_blob_filename, 'source_type': source_type, 'file_name': file_name, 'allowedNodes': allowedNodes, 'allowedRelationship': allowedRelationship, 'token_chunk_size': token_chunk_size, 'chunk_overlap': chunk_overlap, 'chunks_to_combine': chunks_to_combine, 'language': language, 'access_token': access_token, 'retry_condition': retry_condition, 'additional_instructions': additional_instructions, 'email': email, 'incremental': incremental, 'bypass_cache': bypass_cache}
+        job_id = await asyncio.to_thread(extract_job_queue.enqueue, get_database_key(uri, database), params, file_name, priority or 0)
+        extract_worker_pool.notify()
+        return create_api_response('Success', message="Extraction job queued", data={'job_id': job_id, 'status': 'queued'}, file_name=file_name)
+    except Exception as e:
+        message = f"Unable to queue extraction of file {file_name}"
+        error_message = str(e)
+        logging.exception(f'{message}:{error_message}')
+        return create_api_response('Failed', message=message, error=error_message, file_name=file_name)
+
+async def process_extract_request(
+    uri,
+    userName,
+    password,
+    model,
+    database,
+    source_url,
+    aws_access_key_id,
+    aws_secret_access_key,
+    wiki_query,
+    gcs_project_id,
+    gcs_bucket_name,
+    gcs_bucket_folder,
+    gcs_blob_filename,
+    source_type,
+    file_name,
+    allowedNodes,
+    allowedRelationship,
+    token_chunk_size,
+    chunk_overlap,
+    chunks_to_combine,
+    language,
+    access_token,
+    retry_condition,
+    additional_instructions,
+    email,
+    incremental=None,
+    bypass_cache=None
 ):
     """
     Calls 'extract_graph_from_file' in a new thread to create Neo4jGraph from a
@@ -230,33 +330,41 @@ async def extract_knowledge_graph_from_file(
           password: Password to use for graph creation
           file: File object containing the PDF file
           model: Type of model to use ('Diffbot'or'OpenAI GPT')
+          incremental: 'true' to re-ingest a changed document, extracting only its new chunks
+          bypass_cache: 'true' to call the LLM for every chunk instead of reusing cached
+            extraction results (the fresh results still replace the cached ones)
 
     Returns:
-          Nodes and Relations created in Neo4j databse for the pdf file
+          Nodes and Relations created in Neo4j databse for the pdf file. When countsProvisional
+          is true the counts are the incrementally maintained ones; the Document node holds the
+          exact counts once the reconciliation scheduled by processing_source has run
+          (COUNT_RECONCILE_DELAY_SECONDS later).
     """
     try:
         start_time = time.time()
+        incremental = str(incremental).lower() in ("true", "1", "yes")
+        bypass_cache = str(bypass_cache).lower() in ("true", "1", "yes")
         graph = create_graph_database_connection(uri, userName, password, database)   
         graphDb_data_Access = graphDBdataAccess(graph)
         if source_type == 'local file':
             file_name = sanitize_filename(file_name)
             merged_file_path = validate_file_path(MERGED_DIR, file_name)
-            uri_latency, result = await extract_graph_from_file_local_file(uri, userName, password, database, model, merged_file_path, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions)
+            uri_latency, result = await extract_graph_from_file_local_file(uri, userName, password, database, model, merged_file_path, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental, bypass_cache)
 
         elif source_type == 's3 bucket' and source_url:
-            uri_latency, result = await extract_graph_from_file_s3(uri, userName, password, database, model, source_url, aws_access_key_id, aws_secret_access_key, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions)
+            uri_latency, result = await extract_graph_from_file_s3(uri, userName, password, database, model, source_url, aws_access_key_id, aws_secret_access_key, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental, bypass_cache)
         
         elif source_type == 'web-url':
-            uri_latency, result = await extract_graph_from_web_page(uri, userName, password, database, model, source_url, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions)
+            uri_latency, result = await extract_graph_from_web_page(uri, userName, password, database, model, source_url, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental, bypass_cache)
 
         elif source_type == 'youtube' and source_url:
-            uri_latency, result = await extract_graph_from_file_youtube(uri, userName, password, database, model, source_url, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions)
+            uri_latency, result = await extract_graph_from_file_youtube(uri, userName, password, database, model, source_url, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental, bypass_cache)
 
         elif source_type == 'Wikipedia' and wiki_query:
-            uri_latency, result = await extract_graph_from_file_Wikipedia(uri, userName, password, database, model, wiki_query, language, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions)
+            uri_latency, result = await extract_graph_from_file_Wikipedia(uri, userName, password, database, model, wiki_query, language, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental, bypass_cache)
 
         elif source_type == 'gcs bucket' and gcs_bucket_name:
-            uri_latency, result = await extract_graph_from_file_gcs(uri, userName, password, database, model, gcs_project_id, gcs_bucket_name, gcs_bucket_folder, gcs_blob_filename, access_token, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions)
+            uri_latency, result = await extract_graph_from_file_gcs(uri, userName, password, database, model, gcs_project_id, gcs_bucket_name, gcs_bucket_folder, gcs_blob_filename, access_token, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental, bypass_cache)
         else:
             return create_api_response('Failed',message='source_type is other than accepted source')
         extract_api_time = time.time() - start_time
@@ -265,8 +373,12 @@ async def extract_knowledge_graph_from_file(
             count_node_time = time.time()
             graph = create_graph_database_connection(uri, userName, password, database)   
             graphDb_data_Access = graphDBdataAccess(graph)
-            count_response = graphDb_data_Access.update_node_relationship_count(file_name)
-            logging.info("Nodes and Relationship Counts updated")
+            # processing_source keeps the document counts current, so they are read rather than recounted.
+            # They are provisional until the scheduled reconciliation recounts them: post-processing
+            # links and relationships between entities the document already had are not included yet.
+            count_response = graphDb_data_Access.get_node_relationship_count(file_name)
+            result['countsProvisional'] = is_count_reconciliation_pending(graph, file_name)
+            logging.info("Nodes and Relationship Counts read")
             if count_response :
                 result['chunkNodeCount'] = count_response[file_name].get('chunkNodeCount',"0")
                 result['chunkRelCount'] =  count_response[file_name].get('chunkRelCount',"0")
@@ -358,7 +470,7 @@ async def get_source_list(
         return create_api_response(job_status, message=message, error=error_message)
 
 @app.post("/post_processing")
-async def post_processing(uri=Form(None), userName=Form(None), password=Form(None), database=Form(None), tasks=Form(None), email=Form(None)):
+async def post_processing(uri=Form(None), userName=Form(None), password=Form(None), database=Form(None), tasks=Form(None), email=Form(None), incremental=Form(None)):
     try:
         graph = create_graph_database_connection(uri, userName, password, database)
         tasks = set(map(str.strip, json.loads(tasks)))
@@ -387,7 +499,10 @@ async def post_processing(uri=Form(None), userName=Form(None), password=Form(Non
             
         if "enable_communities" in tasks:
             api_name = 'create_communities'
-            await asyncio.to_thread(create_communities, uri, userName, password, database)  
+            incremental_communities = str(incremental).lower() in ("true", "1", "yes") if incremental is not None else None
+            community_report = await asyncio.to_thread(create_communities, uri, userName, password, database, incremental=incremental_communities)
+            if community_report:
+                logging.info(f'Community update touched {community_report["communities_created"]} new and {community_report["communities_deleted"]} removed communities, {community_report["changed_entities"]} entities')
             
             logging.info(f'created communities')
         graph = create_graph_database_connection(uri, userName, password, database)   
@@ -620,11 +735,29 @@ def encode_password(pwd):
     encoded_pwd_bytes = base64.b64encode(data_bytes)
     return encoded_pwd_bytes
 
-@app.get("/update_extract_status/{file_name}")
-async def update_extract_status(request: Request, file_name: str, uri:str=None, userName:str=None, password:str=None, database:str=None):
+def read_document_status(graphDb_data_Access, file_name):
+    result = graphDb_data_Access.get_current_status_document_node(file_name)
+    if len(result) == 0:
+        return None
+    return {'status':result[0]['Status'],
+            'processingTime':result[0]['processingTime'],
+            'nodeCount':result[0]['nodeCount'],
+            'relationshipCount':result[0]['relationshipCount'],
+            'model':result[0]['model'],
+            'total_chunks':result[0]['total_chunks'],
+            'fileSize':result[0]['fileSize'],
+            'processed_chunk':result[0]['processed_chunk'],
+            'fileSource':result[0]['fileSource'],
+            'chunkNodeCount' : result[0]['chunkNodeCount'],
+            'chunkRelCount' : result[0]['chunkRelCount'],
+            'entityNodeCount' : result[0]['entityNodeCount'],
+            'entityEntityRelCount' : result[0]['entityEntityRelCount'],
+            'communityNodeCount' : result[0]['communityNodeCount'],
+            'communityRelCount' : result[0]['communityRelCount']
+            }
+
+def document_status_events(request, file_names, uri, userName, password, database):
     async def generate():
-        status = ''
-        
         if password is not None and password != "null":
             decoded_password = decode_password(password)
         else:
@@ -636,38 +769,26 @@ async def update_extract_status(request: Request, file_name: str, uri:str=None,
             
         graph = create_graph_database_connection(url, userName, decoded_password, database)
         graphDb_data_Access = graphDBdataAccess(graph)
-        while True:
-            try:
-                if await request.is_disconnected():
-                    logging.info(" SSE Client disconnected")
-                    break
-                # get the current status of document node
-                
-                else:
-                    result = graphDb_data_Access.get_current_status_document_node(file_name)
-                    if len(result) > 0:
-                        status = json.dumps({'fileName':file_name, 
-                        'status':result[0]['Status'],
-                        'processingTime':result[0]['processingTime'],
-                        'nodeCount':result[0]['nodeCount'],
-                        'relationshipCount':result[0]['relationshipCount'],
-                        'model':result[0]['model'],
-                        'total_chunks':result[0]['total_chunks'],
-                        'fileSize':result[0]['fileSize'],
-                        'processed_chunk':result[0]['processed_chunk'],
-                        'fileSource':result[0]['fileSource'],
-                        'chunkNodeCount' : result[0]['chunkNodeCount'],
-                        'chunkRelCount' : result[0]['chunkRelCount'],
-                        'entityNodeCount' : result[0]['entityNodeCount'],
-                        'entityEntityRelCount' : result[0]['entityEntityRelCount'],
-                        'communityNodeCount' : result[0]['communityNodeCount'],
-                        'communityRelCount' : result[0]['communityRelCount']
-                        })
-                    yield status
-            except asyncio.CancelledError:
-                logging.info("SSE Connection cancelled")
-    
-    return EventSourceResponse(generate(),ping=60)
+        try:
+            async for status in stream_document_status(graph.status_key, file_names,
+                                                       lambda file_name: read_document_status(graphDb_data_Access, file_name),
+                                                       request.is_disconnected):
+                yield json.dumps(status, default=str)
+        except asyncio.CancelledError:
+            logging.info("SSE Connection cancelled")
+    return generate()
+
+@app.get("/update_extract_status/{file_name}")
+async def update_extract_status(request: Request, file_name: str, uri:str=None, userName:str=None, password:str=None, database:str=None):
+    return EventSourceResponse(document_status_events(request, [file_name], uri, userName, password, database),ping=60)
+
+@app.get("/extract_status_stream")
+async def extract_status_stream(request: Request, file_names: str, uri:str=None, userName:str=None, password:str=None, database:str=None):
+    """
+    One SSE stream for all the files of a client. file_names is a JSON list; each event is
+    the status of one file, sent when the ingestion pipeline publishes a change.
+    """
+    return EventSourceResponse(document_status_events(request, list(map(str.strip, json.loads(file_names))), uri, userName, password, database),ping=60)
 
 @app.post("/delete_document_and_entities")
 async def delete_document_and_entities(uri=Form(None), 
@@ -918,6 +1039,7 @@ async def calculate_metric(question: str = Form(),
                            model: str = Form(),
                            mode: str = Form()):
     try:
+        from src.ragas_eval import get_ragas_metrics
         start = time.time()
         context_list = [str(item).strip() for item in json.loads(context)] if context else []
         answer_list = [str(item).strip() for item in json.loads(answer)] if answer else []
@@ -959,6 +1081,7 @@ async def calculate_additional_metrics(question: str = Form(),
                                         mode: str = Form(),
 ):
    try:
+       from src.ragas_eval import get_additional_metrics
        context_list = [str(item).strip() for item in json.loads(context)] if context else []
        answer_list = [str(item).strip() for item in json.loads(answer)] if answer else []
        mode_list = [str(item).strip() for item in json.loads(mode)] if mode else []
@@ -1066,6 +1189,35 @@ async def backend_connection_configuration():
     finally:
         gc.collect()
     
+@app.get("/extract_job_status/{job_id}")
+async def get_extract_job_status(job_id):
+    try:
+        if not EXTRACT_QUEUE_ENABLED:
+            return create_api_response('Failed', message="Extraction queue is not enabled")
+        job = await asyncio.to_thread(extract_job_queue.get_job, job_id)
+        if job is None:
+            return create_api_response('Failed', message=f"Extraction job {job_id} not found")
+        return create_api_response('Success', data=job, file_name=job['file_name'])
+    except Exception as e:
+        message=f"Unable to get the status of extraction job {job_id}"
+        error_message = str(e)
+        logging.exception(f'{message}:{error_message}')
+        return create_api_response('Failed', message=message, error=error_message)
+
+@app.get("/runtime_metrics")
+async def get_runtime_metrics():
+    try:
+        result = {'extraction_scheduler': get_extraction_scheduler_stats(), 'embedding_cache': get_embedding_cache_stats(), 'extraction_cache': get_extraction_cache_stats(), 'near_duplicate_index': get_near_duplicate_stats(), 'count_reconciliation': get_count_reconciliation_stats(), 'status_bus': status_bus.stats(), 'neo4j_drivers': driver_registry.stats(), 'embedding_models': embedding_registry.stats(), 'entity_embedding': get_entity_embedding_progress(), 'community_summaries': get_community_summary_stats(), 'communities': get_community_update_report(), 'warmup': get_warmup_stats()}
+        if EXTRACT_QUEUE_ENABLED:
+            result['extract_queue'] = extract_job_queue.stats()
+            result['extract_queue'].update(extract_worker_pool.stats() if extract_worker_pool is not None else {})
+        return create_api_response('Success',data=result)
+    except Exception as e:
+        message="Unable to get runtime metrics"
+        error_message = str(e)
+        logging.exception(f'{message}:{error_message}')
+        return create_api_response('Failed', message=message, error=error_message)
+
 @app.post("/schema_visualization")
 async def get_schema_visualization(uri=Form(None), userName=Form(None), password=Form(None), database=Form(None)):
     try:
@@ -22,23 +22,13 @@ from langchain_core.messages import HumanMessage, AIMessage
 from langchain_community.chat_message_histories import ChatMessageHistory 
 from langchain_core.callbacks import StdOutCallbackHandler, BaseCallbackHandler
 
-# LangChain chat models
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
-from langchain_google_vertexai import ChatVertexAI
-from langchain_groq import ChatGroq
-from langchain_anthropic import ChatAnthropic
-from langchain_fireworks import ChatFireworks
-from langchain_aws import ChatBedrock
-from langchain_community.chat_models import ChatOllama
-
 # Local imports
 from src.llm import get_llm
-from src.shared.common_fn import load_embedding_model
+from src.shared.common_fn import get_embedding_model
 from src.shared.constants import *
 load_dotenv() 
 
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL')
-EMBEDDING_FUNCTION , _ = load_embedding_model(EMBEDDING_MODEL) 
 
 class SessionChatHistory:
     history_dict = {}
@@ -73,21 +63,23 @@ def get_history_by_session_id(session_id):
 
 def get_total_tokens(ai_response, llm):
     try:
-        if isinstance(llm, (ChatOpenAI, AzureChatOpenAI, ChatFireworks, ChatGroq)):
+        # Compared by class name so provider packages are only imported by get_llm, on first use.
+        llm_class = type(llm).__name__
+        if llm_class in ("ChatOpenAI", "AzureChatOpenAI", "ChatFireworks", "ChatGroq"):
             total_tokens = ai_response.response_metadata.get('token_usage', {}).get('total_tokens', 0)
         
-        elif isinstance(llm, ChatVertexAI):
+        elif llm_class == "ChatVertexAI":
             total_tokens = ai_response.response_metadata.get('usage_metadata', {}).get('prompt_token_count', 0)
         
-        elif isinstance(llm, ChatBedrock):
+        elif llm_class == "ChatBedrock":
             total_tokens = ai_response.response_metadata.get('usage', {}).get('total_tokens', 0)
         
-        elif isinstance(llm, ChatAnthropic):
+        elif llm_class == "ChatAnthropic":
             input_tokens = int(ai_response.response_metadata.get('usage', {}).get('input_tokens', 0))
             output_tokens = int(ai_response.response_metadata.get('usage', {}).get('output_tokens', 0))
             total_tokens = input_tokens + output_tokens
         
-        elif isinstance(llm, ChatOllama):
+        elif llm_class == "ChatOllama":
             total_tokens = ai_response.response_metadata.get("prompt_eval_count", 0)
         
         else:
@@ -305,7 +297,7 @@ def create_document_retriever_chain(llm, retriever):
 
         splitter = TokenTextSplitter(chunk_size=CHAT_DOC_SPLIT_SIZE, chunk_overlap=0)
         embeddings_filter = EmbeddingsFilter(
-            embeddings=EMBEDDING_FUNCTION,
+            embeddings=get_embedding_model(EMBEDDING_MODEL)[0],
             similarity_threshold=CHAT_EMBEDDING_FILTER_SCORE_THRESHOLD
         )
 
@@ -347,7 +339,7 @@ def initialize_neo4j_vector(graph, chat_mode_settings):
 
         if keyword_index:
             neo_db = Neo4jVector.from_existing_graph(
-                embedding=EMBEDDING_FUNCTION,
+                embedding=get_embedding_model(EMBEDDING_MODEL)[0],
                 index_name=index_name,
                 retrieval_query=retrieval_query,
                 graph=graph,
@@ -360,7 +352,7 @@ def initialize_neo4j_vector(graph, chat_mode_settings):
             logging.info(f"Successfully retrieved Neo4jVector Fulltext index '{index_name}' and keyword index '{keyword_index}'")
         else:
             neo_db = Neo4jVector.from_existing_graph(
-                embedding=EMBEDDING_FUNCTION,
+                embedding=get_embedding_model(EMBEDDING_MODEL)[0],
                 index_name=index_name,
                 retrieval_query=retrieval_query,
                 graph=graph,
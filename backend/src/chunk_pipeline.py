@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+import time
+
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 2))
+
+_END_OF_BATCHES = object()
+
+
+class ChunkBatchPipeline:
+    """
+    Runs chunk batches through the embedding, extraction and graph write stages
+    concurrently. Each stage is a single worker connected to the next one by a
+    bounded queue, so batch N+1 can be embedded and extracted while batch N is
+    still being written, and batches leave every stage in the order they entered.
+
+    Stages are coroutines taking a batch dict and returning it (enriched with
+    whatever the next stage needs).
+    """
+
+    def __init__(self, embed_stage, extract_stage, write_stage, queue_size=PIPELINE_QUEUE_SIZE):
+        self.embed_stage = embed_stage
+        self.extract_stage = extract_stage
+        self.write_stage = write_stage
+        self.queue_size = max(1, int(queue_size))
+        self.cancelled = False
+        self.stage_wait = {'extract': 0.0, 'write': 0.0}
+
+    async def run(self, batches, is_cancelled=None):
+        """
+        Feeds every batch from `batches` (a sync or async iterable) through the stages.
+
+        Args:
+            batches: Iterable of batch dicts, consumed lazily as the first stage has capacity.
+            is_cancelled: Optional coroutine function checked before a batch is admitted.
+                Once it returns True no new batch is admitted and batches that were not
+                yet extracted are dropped; already extracted batches are still written.
+        Returns:
+            Number of batches that went through the write stage.
+        """
+        self.cancelled = False
+        extract_queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue = asyncio.Queue(maxsize=self.queue_size)
+        written = 0
+
+        async def embed_worker():
+            async for batch in _iterate(batches):
+                if is_cancelled is not None and await is_cancelled():
+                    self.cancelled = True
+                    logging.info('Exit from running loop of processing file')
+                    break
+                await extract_queue.put(await self.embed_stage(batch))
+            await extract_queue.put(_END_OF_BATCHES)
+
+        async def extract_worker():
+            while True:
+                wait_start = time.time()
+                batch = await extract_queue.get()
+                self.stage_wait['extract'] += time.time() - wait_start
+                if batch is _END_OF_BATCHES:
+                    break
+                if self.cancelled:
+                    continue
+                await write_queue.put(await self.extract_stage(batch))
+            await write_queue.put(_END_OF_BATCHES)
+
+        async def write_worker():
+            nonlocal written
+            while True:
+                wait_start = time.time()
+                batch = await write_queue.get()
+                self.stage_wait['write'] += time.time() - wait_start
+                if batch is _END_OF_BATCHES:
+                    break
+                await self.write_stage(batch)
+                written += 1
+
+        # A failing stage stops the whole pipeline: the other workers would otherwise
+        # block forever on a queue nobody reads from or writes to anymore.
+        tasks = [asyncio.create_task(embed_worker()), asyncio.create_task(extract_worker()), asyncio.create_task(write_worker())]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        logging.info(f"Chunk pipeline wrote {written} batches, extraction stage waited {self.stage_wait['extract']:.2f}s and write stage waited {self.stage_wait['write']:.2f}s for input")
+        return written
+
+
+async def _iterate(batches):
+    if hasattr(batches, '__aiter__'):
+        async for batch in batches:
+            yield batch
+        return
+    iterator = iter(batches)
+    while True:
+        # Batches may come from a generator doing blocking I/O (page loading, chunk writes).
+        batch = await asyncio.to_thread(next, iterator, _END_OF_BATCHES)
+        if batch is _END_OF_BATCHES:
+            return
+        yield batch
@@ -0,0 +1,113 @@
+import logging
+import math
+import os
+import re
+from collections import Counter
+from langchain_core.documents import Document
+
+PREFILTER_ENABLED = os.environ.get("PREFILTER_ENABLED", "False").lower() in ("true", "1", "yes")
+PREFILTER_MIN_SCORE = float(os.getenv('PREFILTER_MIN_SCORE', 0.35))
+PREFILTER_MIN_TOKENS = int(os.getenv('PREFILTER_MIN_TOKENS', 8))
+REPEATED_LINE_MIN_PAGES = int(os.getenv('REPEATED_LINE_MIN_PAGES', 3))
+REPEATED_LINE_WINDOW_PAGES = int(os.getenv('REPEATED_LINE_WINDOW_PAGES', 8))
+EDGE_LINES = 3
+
+_DIGIT_PATTERN = re.compile(r"\d+")
+_SPACE_PATTERN = re.compile(r"\s+")
+# Scripts written without spaces between words count one token per character.
+_CJK_CHARACTERS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_PATTERN = re.compile(rf"[{_CJK_CHARACTERS}]|[^\W\d_{_CJK_CHARACTERS}]+|\d+")
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no nor not now of off on once only or other
+our ours ourselves out over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which while who whom why will
+with would you your yours yourself yourselves
+""".split())
+
+
+def _normalize_line(line):
+    # Page numbers and dates change from page to page, so digits are folded before comparing.
+    return _SPACE_PATTERN.sub(" ", _DIGIT_PATTERN.sub("#", line)).strip().lower()
+
+
+def _edge_line_indexes(lines):
+    """Indexes of the first and last EDGE_LINES non-empty lines of a page, where running headers and footers sit."""
+    non_empty = [index for index, line in enumerate(lines) if line.strip()]
+    return set(non_empty[:EDGE_LINES] + non_empty[-EDGE_LINES:])
+
+
+def _edge_lines(lines):
+    return {_normalize_line(lines[index]) for index in _edge_line_indexes(lines)}
+
+
+def strip_repeated_page_lines(pages, stats=None):
+    """
+    Yields the pages with running headers, footers and page number lines removed.
+
+    A line is treated as repeated once its digit-folded form appears among the first or
+    last EDGE_LINES lines of REPEATED_LINE_MIN_PAGES pages, and is only removed from that
+    same edge window, so body lines such as a bare number are kept. The first REPEATED_LINE_WINDOW_PAGES
+    pages are buffered to learn those lines before any page is yielded; later pages keep
+    updating the counts, so memory stays bounded while the stream is consumed.
+    stats['stripped_lines'] counts the removed lines.
+    """
+    line_pages = Counter()
+    buffered = []
+
+    def strip(page, lines):
+        edges = _edge_line_indexes(lines)
+        kept = [line for index, line in enumerate(lines) if not (index in edges and line_pages[_normalize_line(line)] >= REPEATED_LINE_MIN_PAGES)]
+        if stats is not None:
+            stats['stripped_lines'] = stats.get('stripped_lines', 0) + len(lines) - len(kept)
+        if len(kept) == len(lines):
+            return page
+        return Document(page_content="\n".join(kept), metadata=page.metadata)
+
+    for page in pages:
+        lines = page.page_content.split("\n")
+        line_pages.update(_edge_lines(lines))
+        if len(buffered) < REPEATED_LINE_WINDOW_PAGES:
+            buffered.append((page, lines))
+            continue
+        while buffered:
+            yield strip(*buffered.pop(0))
+        yield strip(page, lines)
+    for page, lines in buffered:
+        yield strip(page, lines)
+
+
+def information_score(text):
+    """
+    Cheap information density of a chunk in [0, 1]: the normalized entropy of its tokens
+    (words, numbers and single CJK characters), times the share of letters among non-space
+    characters and the share of non-numeric tokens, scaled down when stopwords make up more
+    than 70% of the tokens. Tables of contents, number tables, reference lists and repeated
+    filler score low; prose typically scores above 0.7. Chunks with fewer than
+    PREFILTER_MIN_TOKENS tokens are too short to judge and score 1, empty chunks score 0.
+    """
+    words = [word.lower() for word in _TOKEN_PATTERN.findall(text)]
+    if not words:
+        return 0.0
+    if len(words) < PREFILTER_MIN_TOKENS:
+        return 1.0
+    counts = Counter(words)
+    entropy = -sum(count / len(words) * math.log2(count / len(words)) for count in counts.values())
+    normalized_entropy = entropy / math.log2(len(words))
+    characters = [char for char in text if not char.isspace()]
+    letter_ratio = sum(char.isalpha() for char in characters) / len(characters)
+    digit_ratio = sum(word.isdigit() for word in words) / len(words)
+    content_ratio = sum(word not in STOPWORDS for word in words) / len(words)
+    return normalized_entropy * letter_ratio * (1 - digit_ratio) * min(1.0, content_ratio / 0.3)
+
+
+def filter_low_information_chunks(chunkId_chunkDoc_list, min_score=None):
+    """Splits chunks into (chunks to extract, low information chunks skipped by extraction)."""
+    min_score = PREFILTER_MIN_SCORE if min_score is None else min_score
+    kept, skipped = [], []
+    for row in chunkId_chunkDoc_list:
+        (kept if information_score(row['chunk_doc'].page_content) >= min_score else skipped).append(row)
+    if skipped:
+        logging.info(f"Prefilter skipped {len(skipped)} of {len(chunkId_chunkDoc_list)} low information chunks ({sum(len(row['chunk_doc'].page_content) for row in skipped)} characters)")
+    return kept, skipped
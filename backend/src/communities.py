@@ -3,9 +3,14 @@ from graphdatascience import GraphDataScience
 from src.llm import get_llm
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser 
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
-from src.shared.common_fn import load_embedding_model
+import numpy as np
+from neo4j import Result
+from src.graph_query import get_graphDB_driver
+from src.louvain import build_adjacency, hierarchical_louvain
+from src.shared.common_fn import get_embedding_model
+from src.embedding_cache import embed_documents_with_cache
+from src.community_summarizer import summarize_communities
 
 
 COMMUNITY_PROJECTION_NAME = "communities"
@@ -15,6 +20,13 @@ MAX_WORKERS = 10
 MAX_COMMUNITY_LEVELS = 3 
 MIN_COMMUNITY_SIZE = 1 
 COMMUNITY_CREATION_DEFAULT_MODEL = "openai_gpt_4o"
+# "gds" runs Leiden in the GDS plugin, "local" runs Louvain in process (see src/louvain.py).
+COMMUNITY_ENGINE = os.getenv('COMMUNITY_ENGINE', 'gds').lower()
+COMMUNITY_INCREMENTAL = os.environ.get("COMMUNITY_INCREMENTAL", "False").lower() in ("true", "1", "yes")
+COMMUNITY_SEED_PROPERTY = "communitySeed"
+COMMUNITY_NEXT_PROPERTY = "communities_next"
+COMMUNITY_WRITE_BATCH_SIZE = 1000
+_last_community_report = {}
 
 
 CREATE_COMMUNITY_GRAPH_PROJECTION = """
@@ -33,10 +45,77 @@ RETURN
   g.graphName AS graph_name, g.nodeCount AS nodes, g.relationshipCount AS rels
 """
 
+# Same projection with each node's previous level 0 community as the Leiden seed; nodes
+# without one get a fresh seed above $seed_offset.
+CREATE_SEEDED_COMMUNITY_GRAPH_PROJECTION = """
+MATCH (source:{node_projection})-[]->(target:{node_projection})
+WITH source, target, count(*) as weight
+WITH gds.graph.project(
+               '{project_name}',
+               source,
+               target,
+               {{
+               sourceNodeProperties: {{ {seed_property}: coalesce(source.communities[0], $seed_offset + id(source)) }},
+               targetNodeProperties: {{ {seed_property}: coalesce(target.communities[0], $seed_offset + id(target)) }},
+               relationshipProperties: {{ weight: weight }}
+               }},
+               {{undirectedRelationshipTypes: ['*']}}
+               ) AS g
+RETURN
+  g.graphName AS graph_name, g.nodeCount AS nodes, g.relationshipCount AS rels
+"""
+
+# Edge list with the weights of CREATE_COMMUNITY_GRAPH_PROJECTION for the local engine.
+GET_COMMUNITY_ADJACENCY = """
+MATCH (source:{node_projection})-[]->(target:{node_projection})
+RETURN elementId(source) AS source, elementId(target) AS target, count(*) AS weight,
+       source.communities[0] AS source_seed, target.communities[0] AS target_seed
+"""
+
+WRITE_LOCAL_COMMUNITIES = """
+UNWIND $rows AS row
+MATCH (e) WHERE elementId(e) = row.elementId
+SET e.{write_property} = row.communities
+"""
+
+GET_MAX_COMMUNITY_SEED = """
+MATCH (e:`__Entity__`) WHERE e.communities IS NOT NULL
+RETURN coalesce(max(e.communities[0]), -1) + 1 AS seed_offset, count(e) AS entities
+"""
+
+GET_COMMUNITY_ASSIGNMENTS = f"""
+MATCH (e) WHERE e.{COMMUNITY_NEXT_PROPERTY} IS NOT NULL OR e.communities IS NOT NULL
+RETURN elementId(e) AS elementId, e.communities AS previous, e.{COMMUNITY_NEXT_PROPERTY} AS next
+"""
+
+UPDATE_ENTITY_COMMUNITIES = """
+UNWIND $rows AS row
+MATCH (e) WHERE elementId(e) = row.elementId
+SET e.communities = row.communities
+WITH e
+OPTIONAL MATCH (e)-[r:IN_COMMUNITY]->(c:`__Community__`)
+WHERE e.communities IS NULL OR c.id <> '0-' + toString(e.communities[0])
+DELETE r
+"""
+
+DELETE_COMMUNITIES_BY_ID = """
+UNWIND $ids AS id
+MATCH (c:`__Community__` {id: id})
+DETACH DELETE c
+"""
+# Parent summaries are written from their children's, so an ancestor of a created or
+# deleted community is summarized and embedded again by create_community_summaries.
+CLEAR_ANCESTOR_COMMUNITY_SUMMARIES = """
+UNWIND $ids AS id
+MATCH (:`__Community__` {id: id})-[:PARENT_COMMUNITY*]->(p:`__Community__`)
+WITH DISTINCT p
+REMOVE p.summary, p.title, p.embedding
+"""
+
+DROP_NEXT_COMMUNITY_PROPERTY = f"MATCH (e) WHERE e.{COMMUNITY_NEXT_PROPERTY} IS NOT NULL REMOVE e.{COMMUNITY_NEXT_PROPERTY}"
+
 CREATE_COMMUNITY_CONSTRAINT = "CREATE CONSTRAINT IF NOT EXISTS FOR (c:__Community__) REQUIRE c.id IS UNIQUE;"
-CREATE_COMMUNITY_LEVELS = """
-MATCH (e:`__Entity__`)
-WHERE e.communities is NOT NULL
+COMMUNITY_LEVELS_BODY = """
 UNWIND range(0, size(e.communities) - 1 , 1) AS index
 CALL {
   WITH e, index
@@ -60,42 +139,53 @@ CALL {
 }
 RETURN count(*)
 """
-CREATE_COMMUNITY_RANKS = """
-MATCH (c:__Community__)<-[:IN_COMMUNITY*]-(:!Chunk&!Document&!__Community__)<-[HAS_ENTITY]-(:Chunk)<-[]-(d:Document)
-WITH c, count(distinct d) AS rank
-SET c.community_rank = rank;
+CREATE_COMMUNITY_LEVELS = """
+MATCH (e:`__Entity__`)
+WHERE e.communities is NOT NULL""" + COMMUNITY_LEVELS_BODY
+CREATE_CHANGED_COMMUNITY_LEVELS = """
+UNWIND $element_ids AS element_id
+MATCH (e:`__Entity__`)
+WHERE elementId(e) = element_id AND e.communities IS NOT NULL""" + COMMUNITY_LEVELS_BODY
+# Chunks and documents mentioning the members of each level 0 community; the sets of
+# parent communities are the unions of their children's, computed in create_community_ranks.
+GET_LEVEL_0_COMMUNITY_SOURCES = """
+MATCH (c:`__Community__` {level: 0})<-[:IN_COMMUNITY]-(:!Chunk&!Document&!__Community__)<-[:HAS_ENTITY]-(chunk:Chunk)
+OPTIONAL MATCH (chunk)<-[]-(d:Document)
+RETURN c.id AS communityId, collect(DISTINCT elementId(chunk)) AS chunks, collect(DISTINCT elementId(d)) AS documents
 """
 
-CREATE_PARENT_COMMUNITY_RANKS = """
-MATCH (c:__Community__)<-[:PARENT_COMMUNITY*]-(:__Community__)<-[:IN_COMMUNITY*]-(:!Chunk&!Document&!__Community__)<-[HAS_ENTITY]-(:Chunk)<-[]-(d:Document)
-WITH c, count(distinct d) AS rank
-SET c.community_rank = rank;
+GET_COMMUNITY_HIERARCHY = """
+MATCH (child:`__Community__`)-[:PARENT_COMMUNITY]->(parent:`__Community__`)
+RETURN child.id AS childId, parent.id AS parentId, parent.level AS level
 """
 
-CREATE_COMMUNITY_WEIGHTS = """
-MATCH (n:`__Community__`)<-[:IN_COMMUNITY]-()<-[:HAS_ENTITY]-(c)
-WITH n, count(distinct c) AS chunkCount
-SET n.weight = chunkCount
-"""
-CREATE_PARENT_COMMUNITY_WEIGHTS = """
-MATCH (n:`__Community__`)<-[:PARENT_COMMUNITY*]-(:`__Community__`)<-[:IN_COMMUNITY]-()<-[:HAS_ENTITY]-(c)
-WITH n, count(distinct c) AS chunkCount
-SET n.weight = chunkCount
+WRITE_COMMUNITY_RANKS = """
+UNWIND $rows AS row
+MATCH (c:`__Community__` {id: row.communityId})
+SET c.community_rank = row.rank,
+    c.weight = row.weight
 """
 
+# One page of level 0 communities, ordered by id for keyset paging, with their members and
+# every relationship between two members. Communities with a single member are returned
+# too so the last id of a full page is always the next cursor; iter_community_info skips them.
 GET_COMMUNITY_INFO = """
-MATCH (c:`__Community__`)<-[:IN_COMMUNITY]-(e)
-WHERE c.level = 0
-WITH c, collect(e) AS nodes
-WHERE size(nodes) > 1
-CALL apoc.path.subgraphAll(nodes[0], {
-	whitelistNodes:nodes
-})
-YIELD relationships
-RETURN c.id AS communityId,
-       [n in nodes | {id: n.id, description: n.description, type: [el in labels(n) WHERE el <> '__Entity__'][0]}] AS nodes,
-       [r in relationships | {start: startNode(r).id, type: type(r), end: endNode(r).id}] AS rels
+MATCH (c:`__Community__`)
+WHERE c.level = 0 AND c.id > $after {summary_filter}
+WITH c ORDER BY c.id LIMIT $limit
+CALL {{
+  WITH c
+  MATCH (c)<-[:IN_COMMUNITY]-(n)
+  RETURN collect({{id: n.id, description: n.description, type: [el in labels(n) WHERE el <> '__Entity__'][0]}}) AS nodes
+}}
+CALL {{
+  WITH c
+  MATCH (c)<-[:IN_COMMUNITY]-(source)-[r]->(target)-[:IN_COMMUNITY]->(c)
+  RETURN collect({{start: source.id, type: type(r), end: target.id}}) AS rels
+}}
+RETURN c.id AS communityId, nodes, rels
 """
+COMMUNITY_INFO_PAGE_SIZE = 500
 
 GET_PARENT_COMMUNITY_INFO = """
 MATCH (p:`__Community__`)<-[:PARENT_COMMUNITY*]-(c:`__Community__`)
@@ -188,10 +278,30 @@ OPTIONS {{
 COMMUNITY_FULLTEXT_INDEX_NAME = "community_keyword"
 COMMUNITY_FULLTEXT_INDEX_DROP_QUERY = f"DROP INDEX  {COMMUNITY_FULLTEXT_INDEX_NAME} IF EXISTS;"
 COMMUNITY_INDEX_FULL_TEXT_QUERY = f"CREATE FULLTEXT INDEX {COMMUNITY_FULLTEXT_INDEX_NAME} FOR (n:`__Community__`) ON EACH [n.summary]" 
+COMMUNITY_INDEX_FULL_TEXT_IF_NOT_EXISTS_QUERY = f"CREATE FULLTEXT INDEX {COMMUNITY_FULLTEXT_INDEX_NAME} IF NOT EXISTS FOR (n:`__Community__`) ON EACH [n.summary]"
+
 
 
+class CypherRunner:
+    """
+    Runs Cypher on the shared Neo4j driver and returns DataFrames like
+    GraphDataScience.run_cypher, so the community pipeline works without the GDS plugin
+    when COMMUNITY_ENGINE is "local".
+    """
+
+    def __init__(self, uri, username, password, database):
+        if all(v is None for v in [username, password]):
+            database = os.getenv('NEO4J_DATABASE')
+        self.database = database
+        self.driver = get_graphDB_driver(uri, username, password, database)
+
+    def run_cypher(self, query, params=None):
+        return self.driver.execute_query(query, params or {}, database_=self.database, result_transformer_=Result.to_df)
+
 
 def get_gds_driver(uri, username, password, database):
+    if COMMUNITY_ENGINE == "local":
+        return CypherRunner(uri, username, password, database)
     try:
         if all(v is None for v in [username, password]):
             username= os.getenv('NEO4J_USERNAME')
@@ -209,7 +319,7 @@ def get_gds_driver(uri, username, password, database):
         logging.error(f"Failed to create GDS driver: {e}")
         raise
 
-def create_community_graph_projection(gds, project_name=COMMUNITY_PROJECTION_NAME, node_projection=NODE_PROJECTION):
+def create_community_graph_projection(gds, project_name=COMMUNITY_PROJECTION_NAME, node_projection=NODE_PROJECTION, seed_offset=None):
     try:
         existing_projects = gds.graph.list()
         project_exists = existing_projects["graphName"].str.contains(project_name, regex=False).any()
@@ -219,8 +329,12 @@ def create_community_graph_projection(gds, project_name=COMMUNITY_PROJECTION_NAM
             gds.graph.drop(project_name)
         
         logging.info(f"Creating new graph project '{project_name}'.")
-        projection_query = CREATE_COMMUNITY_GRAPH_PROJECTION.format(node_projection=node_projection,project_name=project_name)
-        graph_projection_result = gds.run_cypher(projection_query)
+        if seed_offset is None:
+            projection_query = CREATE_COMMUNITY_GRAPH_PROJECTION.format(node_projection=node_projection,project_name=project_name)
+            graph_projection_result = gds.run_cypher(projection_query)
+        else:
+            projection_query = CREATE_SEEDED_COMMUNITY_GRAPH_PROJECTION.format(node_projection=node_projection,project_name=project_name,seed_property=COMMUNITY_SEED_PROPERTY)
+            graph_projection_result = gds.run_cypher(projection_query, params={"seed_offset": seed_offset})
         projection_result = graph_projection_result.to_dict(orient="records")[0]
         logging.info(f"Graph projection '{projection_result['graph_name']}' created successfully with {projection_result['nodes']} nodes and {projection_result['rels']} relationships.")
         graph_project = gds.graph.get(projection_result['graph_name'])
@@ -229,16 +343,18 @@ def create_community_graph_projection(gds, project_name=COMMUNITY_PROJECTION_NAM
         logging.error(f"Failed to create community graph project: {e}")
         raise
 
-def write_communities(gds, graph_project, project_name=COMMUNITY_PROJECTION_NAME):
+def write_communities(gds, graph_project, project_name=COMMUNITY_PROJECTION_NAME, write_property=None, seed_property=None):
     try:
         logging.info(f"Writing communities to the graph project '{project_name}'.")
+        seed_config = {"seedProperty": seed_property} if seed_property else {}
         gds.leiden.write(
             graph_project,
-            writeProperty=project_name,
+            writeProperty=write_property or project_name,
             includeIntermediateCommunities=True,
             relationshipWeightProperty="weight",
             maxLevels=MAX_COMMUNITY_LEVELS,
             minCommunitySize=MIN_COMMUNITY_SIZE,
+            **seed_config,
         )
         logging.info("Communities written successfully.")
         return True
@@ -247,6 +363,167 @@ def write_communities(gds, graph_project, project_name=COMMUNITY_PROJECTION_NAME
         return False
 
 
+def write_local_communities(gds, write_property=COMMUNITY_PROJECTION_NAME, seeded=False):
+    """
+    Local engine counterpart of create_community_graph_projection and write_communities:
+    fetches the entity graph as a weighted edge list, runs hierarchical Louvain in process
+    and writes each entity's community per level to `write_property`. With `seeded` the
+    first level starts from the stored level 0 communities.
+    """
+    try:
+        edges = gds.run_cypher(GET_COMMUNITY_ADJACENCY.format(node_projection=NODE_PROJECTION))
+        if edges.empty:
+            logging.info("No entity relationships found, no communities to write.")
+            return False
+        element_ids, endpoints = np.unique(np.concatenate([edges['source'].to_numpy(), edges['target'].to_numpy()]), return_inverse=True)
+        adjacency = build_adjacency(endpoints[:len(edges)], endpoints[len(edges):], edges['weight'].to_numpy(dtype=float), len(element_ids))
+        logging.info(f"Fetched entity graph with {len(element_ids)} nodes and {len(edges)} weighted relationships.")
+
+        seeds = None
+        if seeded:
+            seeds = np.full(len(element_ids), -1, dtype=np.int64)
+            for endpoint, column in (('source', 'source_seed'), ('target', 'target_seed')):
+                has_seed = edges[column].notna().to_numpy()
+                positions = endpoints[:len(edges)] if endpoint == 'source' else endpoints[len(edges):]
+                seeds[positions[has_seed]] = edges[column].to_numpy()[has_seed].astype(np.int64)
+            unseeded = seeds < 0
+            seeds[unseeded] = seeds.max() + 1 + np.arange(unseeded.sum())
+
+        levels, modularities = hierarchical_louvain(adjacency, MAX_COMMUNITY_LEVELS, seeds)
+        communities = np.stack(levels, axis=1).tolist()
+        rows = [{'elementId': element_id, 'communities': node_communities} for element_id, node_communities in zip(element_ids.tolist(), communities)]
+        query = WRITE_LOCAL_COMMUNITIES.format(write_property=write_property)
+        for i in range(0, len(rows), COMMUNITY_WRITE_BATCH_SIZE):
+            gds.run_cypher(query, params={"rows": rows[i:i + COMMUNITY_WRITE_BATCH_SIZE]})
+        logging.info(f"Communities written successfully: {len(levels)} levels, modularity {modularities[-1]:.4f}.")
+        return True
+    except Exception as e:
+        logging.error(f"Failed to write communities: {e}")
+        return False
+
+def detect_communities(gds, write_property=None, seed_offset=None):
+    """Runs community detection with COMMUNITY_ENGINE; a `seed_offset` seeds it with the stored communities."""
+    if COMMUNITY_ENGINE == "local":
+        return write_local_communities(gds, write_property or COMMUNITY_PROJECTION_NAME, seeded=seed_offset is not None)
+    graph_project = create_community_graph_projection(gds, seed_offset=seed_offset)
+    return write_communities(gds, graph_project, write_property=write_property,
+                             seed_property=COMMUNITY_SEED_PROPERTY if seed_offset is not None else None)
+
+def match_community_assignments(rows):
+    """
+    Maps the communities just detected onto the existing ones. A new community
+    whose member entities are exactly those of an existing community at the same level
+    takes over its id, so its node, summary and embedding stay as they are; any other new
+    community gets an unused id. Existing communities that no longer match are deleted.
+
+    Args:
+        rows: {elementId, previous, next} per entity, the stored and new community lists.
+
+    Returns:
+        (entity updates as {elementId, communities}, ids of communities to delete,
+         ids of communities to create, report)
+    """
+    levels = max((len(row[key] or []) for row in rows for key in ('previous', 'next')), default=0)
+    final = {row['elementId']: [] for row in rows}
+    report = {'entities': sum(1 for row in rows if row['next'] is not None), 'changed_entities': 0,
+              'communities_kept': 0, 'communities_created': 0, 'communities_deleted': 0}
+    deleted_ids, created_ids = [], []
+    for level in range(levels):
+        previous_members, next_members = {}, {}
+        for row in rows:
+            if row['previous'] is not None and level < len(row['previous']):
+                previous_members.setdefault(row['previous'][level], set()).add(row['elementId'])
+            if row['next'] is not None and level < len(row['next']):
+                next_members.setdefault(row['next'][level], set()).add(row['elementId'])
+        previous_by_members = {frozenset(members): community for community, members in previous_members.items()}
+        next_free_id = max(previous_members, default=-1) + 1
+        kept = set()
+        for community, members in next_members.items():
+            existing = previous_by_members.get(frozenset(members))
+            if existing is not None:
+                kept.add(existing)
+                final_id = existing
+            else:
+                final_id = next_free_id
+                next_free_id += 1
+                created_ids.append(f"{level}-{final_id}")
+            for element_id in members:
+                final[element_id].append(final_id)
+        report['communities_kept'] += len(kept)
+        for community in previous_members:
+            if community not in kept:
+                deleted_ids.append(f"{level}-{community}")
+    report['communities_created'] = len(created_ids)
+    report['communities_deleted'] = len(deleted_ids)
+    updates = []
+    for row in rows:
+        communities = final[row['elementId']] if row['next'] is not None else None
+        if communities != row['previous']:
+            updates.append({'elementId': row['elementId'], 'communities': communities})
+    report['changed_entities'] = len(updates)
+    return updates, deleted_ids, created_ids, report
+
+def update_communities_incrementally(gds):
+    """
+    Reruns community detection seeded with the stored level 0 communities and rewrites only the
+    communities whose membership changed. Kept parent communities above a created or deleted
+    one lose their summary, title and embedding so they are summarized again. Returns the report of match_community_assignments,
+    or None when there are no stored communities to start from.
+    """
+    seed = gds.run_cypher(GET_MAX_COMMUNITY_SEED).to_dict(orient="records")[0]
+    if not seed['entities']:
+        logging.info("No existing communities found, running full community detection.")
+        return None
+    if not detect_communities(gds, write_property=COMMUNITY_NEXT_PROPERTY, seed_offset=int(seed['seed_offset'])):
+        raise Exception("Failed to write incremental communities.")
+    rows = gds.run_cypher(GET_COMMUNITY_ASSIGNMENTS).to_dict(orient="records")
+    rows = [{'elementId': row['elementId'], 'previous': list(row['previous']) if row['previous'] is not None else None,
+             'next': list(row['next']) if row['next'] is not None else None} for row in rows]
+    updates, deleted_ids, created_ids, report = match_community_assignments(rows)
+
+    for i in range(0, len(deleted_ids), COMMUNITY_WRITE_BATCH_SIZE):
+        batch = deleted_ids[i:i + COMMUNITY_WRITE_BATCH_SIZE]
+        gds.run_cypher(CLEAR_ANCESTOR_COMMUNITY_SUMMARIES, params={"ids": batch})
+        gds.run_cypher(DELETE_COMMUNITIES_BY_ID, params={"ids": batch})
+    for i in range(0, len(updates), COMMUNITY_WRITE_BATCH_SIZE):
+        batch = updates[i:i + COMMUNITY_WRITE_BATCH_SIZE]
+        gds.run_cypher(UPDATE_ENTITY_COMMUNITIES, params={"rows": batch})
+        gds.run_cypher(CREATE_CHANGED_COMMUNITY_LEVELS, params={"element_ids": [row['elementId'] for row in batch if row['communities'] is not None]})
+    for i in range(0, len(created_ids), COMMUNITY_WRITE_BATCH_SIZE):
+        gds.run_cypher(CLEAR_ANCESTOR_COMMUNITY_SUMMARIES, params={"ids": created_ids[i:i + COMMUNITY_WRITE_BATCH_SIZE]})
+    gds.run_cypher(DROP_NEXT_COMMUNITY_PROPERTY)
+    logging.info(f"Incremental community update: {report}")
+    return report
+
+def create_community_ranks(gds):
+    """
+    Sets community_rank (distinct documents) and weight (distinct chunks) on every
+    community in one bottom-up pass: the chunk and document sets of level 0 communities
+    are fetched once and each parent gets the union of its children's sets, level by level.
+    """
+    interned = {}
+    sources = {}
+    for row in gds.run_cypher(GET_LEVEL_0_COMMUNITY_SOURCES).to_dict(orient="records"):
+        sources[row['communityId']] = ({interned.setdefault(chunk, len(interned)) for chunk in row['chunks']},
+                                       {interned.setdefault(document, len(interned)) for document in row['documents']})
+    children_by_level = {}
+    for row in gds.run_cypher(GET_COMMUNITY_HIERARCHY).to_dict(orient="records"):
+        children_by_level.setdefault(row['level'], {}).setdefault(row['parentId'], []).append(row['childId'])
+    for level in sorted(children_by_level):
+        for parent, children in children_by_level[level].items():
+            chunks, documents = set(), set()
+            for child in children:
+                child_chunks, child_documents = sources.get(child, ((), ()))
+                chunks.update(child_chunks)
+                documents.update(child_documents)
+            if chunks:
+                sources[parent] = (chunks, documents)
+
+    rows = [{'communityId': community, 'rank': len(documents), 'weight': len(chunks)} for community, (chunks, documents) in sources.items()]
+    for i in range(0, len(rows), COMMUNITY_WRITE_BATCH_SIZE):
+        gds.run_cypher(WRITE_COMMUNITY_RANKS, params={"rows": rows[i:i + COMMUNITY_WRITE_BATCH_SIZE]})
+    logging.info(f"Wrote ranks and weights of {len(rows)} communities.")
+
 def get_community_chain(model, is_parent=False,community_template=COMMUNITY_TEMPLATE,system_template=COMMUNITY_SYSTEM_TEMPLATE):
     try:
         if is_parent:
@@ -269,33 +546,33 @@ def get_community_chain(model, is_parent=False,community_template=COMMUNITY_TEMP
         logging.error(f"Failed to create community chain: {e}")
         raise
 
+def _describe_node(node):
+    node_description = f", description: {node['description']}" if node.get('description') else ""
+    return f"id: {node['id']}, type: {node['type']}{node_description}\n"
+
+def _describe_relationship(rel):
+    relationship_description = f", description: {rel['description']}" if rel.get('description') else ""
+    return f"({rel['start']})-[:{rel['type']}]->({rel['end']}){relationship_description}\n"
+
 def prepare_string(community_data):
     try:
-        nodes_description = "Nodes are:\n"
-        for node in community_data['nodes']:
-            node_id = node['id']
-            node_type = node['type']
-            node_description = f", description: {node['description']}" if 'description' in node and node['description'] else ""
-            nodes_description += f"id: {node_id}, type: {node_type}{node_description}\n"
-
-        relationships_description = "Relationships are:\n"
-        for rel in community_data['rels']:
-            start_node = rel['start']
-            end_node = rel['end']
-            relationship_type = rel['type']
-            relationship_description = f", description: {rel['description']}" if 'description' in rel and rel['description'] else ""
-            relationships_description += f"({start_node})-[:{relationship_type}]->({end_node}){relationship_description}\n"
-        return nodes_description + "\n" + relationships_description
+        # Sorted so the same community always produces the same text and summary cache key.
+        nodes = sorted(community_data['nodes'], key=lambda node: str(node['id']))
+        rels = sorted(community_data['rels'], key=lambda rel: (str(rel['start']), rel['type'], str(rel['end'])))
+        return "".join(["Nodes are:\n", *map(_describe_node, nodes), "\n", "Relationships are:\n", *map(_describe_relationship, rels)])
     except Exception as e:
         logging.error(f"Failed to prepare string from community data: {e}")
         raise
 
-def process_community_info(community, chain, is_parent=False):
+def get_community_text(community, is_parent=False):
+    if is_parent:
+        return " ".join(f"Summary {i+1}: {summary}" for i, summary in enumerate(sorted(community.get("texts", []))))
+    return prepare_string(community)
+
+def process_community_info(community, chain, is_parent=False, combined_text=None):
     try:
-        if is_parent:
-            combined_text = " ".join(f"Summary {i+1}: {summary}" for i, summary in enumerate(community.get("texts", [])))
-        else:
-            combined_text = prepare_string(community)
+        if combined_text is None:
+            combined_text = get_community_text(community, is_parent)
         summary_response = chain.invoke({'community_info': combined_text})
         lines = summary_response.splitlines()
         title = "Untitled Community"
@@ -311,37 +588,39 @@ def process_community_info(community, chain, is_parent=False):
         logging.error(f"Failed to process community {community.get('communityId', 'unknown')}: {e}")
         return None
 
-def create_community_summaries(gds, model):
+def iter_community_info(gds, only_missing=False, page_size=COMMUNITY_INFO_PAGE_SIZE):
+    """
+    Yields the members and internal relationships of every level 0 community with more
+    than one member, one page of communities per query. With `only_missing` only
+    communities without a summary are read.
+    """
+    query = GET_COMMUNITY_INFO.format(summary_filter="AND c.summary IS NULL" if only_missing else "")
+    after = ""
+    while True:
+        page = gds.run_cypher(query, params={"after": after, "limit": page_size}).to_dict(orient="records")
+        for community in page:
+            if len(community['nodes']) > 1:
+                yield community
+        if len(page) < page_size:
+            return
+        after = page[-1]['communityId']
+
+def create_community_summaries(gds, model, only_missing=False):
     try:
-        community_info_list = gds.run_cypher(GET_COMMUNITY_INFO)
         community_chain = get_community_chain(model)
 
-        summaries = []
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(process_community_info, community, community_chain) for community in community_info_list.to_dict(orient="records")]
-   
-            for future in as_completed(futures):
-                result = future.result()
-                if result:
-                    summaries.append(result)
-                else:
-                    logging.error("community summaries could not be processed.")
+        summaries = summarize_communities(iter_community_info(gds, only_missing), model,
+                                          lambda community, text: process_community_info(community, community_chain, combined_text=text),
+                                          get_community_text)
 
         gds.run_cypher(STORE_COMMUNITY_SUMMARIES, params={"data": summaries})
 
         parent_community_info = gds.run_cypher(GET_PARENT_COMMUNITY_INFO)
         parent_community_chain = get_community_chain(model, is_parent=True)
 
-        parent_summaries = []
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(process_community_info, community, parent_community_chain, is_parent=True) for community in parent_community_info.to_dict(orient="records")]
-            
-            for future in as_completed(futures):
-                result = future.result()
-                if result:
-                    parent_summaries.append(result)
-                else:
-                    logging.error("parent community summaries could not be processed.")
+        parent_summaries = summarize_communities(parent_community_info.to_dict(orient="records"), model,
+                                                 lambda community, text: process_community_info(community, parent_community_chain, is_parent=True, combined_text=text),
+                                                 lambda community: get_community_text(community, is_parent=True), is_parent=True)
 
         gds.run_cypher(STORE_COMMUNITY_SUMMARIES, params={"data": parent_summaries})
 
@@ -352,7 +631,7 @@ def create_community_summaries(gds, model):
 def create_community_embeddings(gds):
     try:
         embedding_model = os.getenv('EMBEDDING_MODEL')
-        embeddings, dimension = load_embedding_model(embedding_model)
+        embeddings, dimension = get_embedding_model(embedding_model)
         logging.info(f"Embedding model '{embedding_model}' loaded successfully.")
         
         logging.info("Fetching community details.")
@@ -363,12 +642,13 @@ def create_community_embeddings(gds):
         batch_size = 100
         for i in range(0, len(rows), batch_size):
             batch_rows = rows[i:i+batch_size]            
-            for row in batch_rows:
-                try:
-                    row['embedding'] = embeddings.embed_query(row['text'])
-                except Exception as e:
-                    logging.error(f"Failed to embed text for community ID {row['communityId']}: {e}")
-                    row['embedding'] = None
+            try:
+                batch_embeddings = embed_documents_with_cache(embeddings, dimension, [row['text'] for row in batch_rows])
+            except Exception as e:
+                logging.error(f"Failed to embed text for community IDs {[row['communityId'] for row in batch_rows]}: {e}")
+                batch_embeddings = [None] * len(batch_rows)
+            for row, embedding in zip(batch_rows, batch_embeddings):
+                row['embedding'] = embedding
             
             try:
                 logging.info("Writing embeddings to the database.")
@@ -382,7 +662,7 @@ def create_community_embeddings(gds):
         logging.error(f"An error occurred during the community embedding process: {e}")
 
 
-def create_vector_index(gds, index_type,embedding_dimension=None):
+def create_vector_index(gds, index_type,embedding_dimension=None,drop_existing=True):
     drop_query = ""
     query = ""
     
@@ -405,8 +685,9 @@ def create_vector_index(gds, index_type,embedding_dimension=None):
     try:
         logging.info("Starting the process to create vector index.")
 
-        logging.info(f"Executing drop query: {drop_query}")
-        gds.run_cypher(drop_query)
+        if drop_existing:
+            logging.info(f"Executing drop query: {drop_query}")
+            gds.run_cypher(drop_query)
 
         logging.info(f"Executing create query: {query}")
         gds.run_cypher(query)
@@ -418,7 +699,7 @@ def create_vector_index(gds, index_type,embedding_dimension=None):
         logging.error(f"Error details: {str(e)}")
 
 
-def create_fulltext_index(gds, index_type):
+def create_fulltext_index(gds, index_type, drop_existing=True):
     drop_query = ""
     query = ""
     
@@ -432,8 +713,11 @@ def create_fulltext_index(gds, index_type):
     try:
         logging.info("Starting the process to create full-text index.")
 
-        logging.info(f"Executing drop query: {drop_query}")
-        gds.run_cypher(drop_query)
+        if drop_existing:
+            logging.info(f"Executing drop query: {drop_query}")
+            gds.run_cypher(drop_query)
+        else:
+            query = COMMUNITY_INDEX_FULL_TEXT_IF_NOT_EXISTS_QUERY
 
         logging.info(f"Executing create query: {query}")
         gds.run_cypher(query)
@@ -444,33 +728,31 @@ def create_fulltext_index(gds, index_type):
         logging.error("An error occurred while creating the full-text index.", exc_info=True)
         logging.error(f"Error details: {str(e)}")
 
-def create_community_properties(gds, model):
+def create_community_properties(gds, model, incremental=False):
     commands = [
         (CREATE_COMMUNITY_CONSTRAINT, "created community constraint to the graph."),
-        (CREATE_COMMUNITY_LEVELS, "Successfully created community levels."),
-        (CREATE_COMMUNITY_RANKS, "Successfully created community ranks."),
-        (CREATE_PARENT_COMMUNITY_RANKS, "Successfully created parent community ranks."),
-        (CREATE_COMMUNITY_WEIGHTS, "Successfully created community weights."),
-        (CREATE_PARENT_COMMUNITY_WEIGHTS, "Successfully created parent community weights."),
-    ]
+    ] + ([] if incremental else [(CREATE_COMMUNITY_LEVELS, "Successfully created community levels.")])
     try:
         for command, message in commands:
             gds.run_cypher(command)
             logging.info(message)
 
-        create_community_summaries(gds, model)
+        create_community_ranks(gds)
+        logging.info("Successfully created community ranks and weights.")
+
+        create_community_summaries(gds, model, only_missing=incremental)
         logging.info("Successfully created community summaries.")
 
         embedding_dimension = create_community_embeddings(gds)
         logging.info("Successfully created community embeddings.")
 
-        create_vector_index(gds=gds,index_type=ENTITY_VECTOR_INDEX_NAME,embedding_dimension=embedding_dimension)
+        create_vector_index(gds=gds,index_type=ENTITY_VECTOR_INDEX_NAME,embedding_dimension=embedding_dimension,drop_existing=not incremental)
         logging.info("Successfully created Entity Vector Index.")
 
-        create_vector_index(gds=gds,index_type=COMMUNITY_VECTOR_INDEX_NAME,embedding_dimension=embedding_dimension)
+        create_vector_index(gds=gds,index_type=COMMUNITY_VECTOR_INDEX_NAME,embedding_dimension=embedding_dimension,drop_existing=not incremental)
         logging.info("Successfully created community Vector Index.")
 
-        create_fulltext_index(gds=gds,index_type=COMMUNITY_FULLTEXT_INDEX_NAME)
+        create_fulltext_index(gds=gds,index_type=COMMUNITY_FULLTEXT_INDEX_NAME,drop_existing=not incremental)
         logging.info("Successfully created community fulltext Index.")
 
     except Exception as e:
@@ -495,18 +777,37 @@ def clear_communities(gds):
         raise
 
 
-def create_communities(uri, username, password, database,model=COMMUNITY_CREATION_DEFAULT_MODEL):
+def create_communities(uri, username, password, database,model=COMMUNITY_CREATION_DEFAULT_MODEL,incremental=None):
+    """
+    Detects communities and creates their nodes, summaries, embeddings and indexes. With
+    `incremental` (COMMUNITY_INCREMENTAL by default) existing communities are kept where
+    their membership did not change; see update_communities_incrementally. Returns the
+    incremental update report, or None after a full rebuild.
+    """
     try:
         gds = get_gds_driver(uri, username, password, database)
+        if COMMUNITY_INCREMENTAL if incremental is None else incremental:
+            report = update_communities_incrementally(gds)
+            if report is not None:
+                create_community_properties(gds, model, incremental=True)
+                _last_community_report.clear()
+                _last_community_report.update(report, mode='incremental')
+                logging.info("Incremental communities update completed successfully.")
+                return report
         clear_communities(gds)
 
-        graph_project = create_community_graph_projection(gds)
-        write_communities_sucess = write_communities(gds, graph_project)
+        write_communities_sucess = detect_communities(gds)
         if write_communities_sucess:
             logging.info("Starting Community properties creation process.")
             create_community_properties(gds,model)
+            _last_community_report.clear()
+            _last_community_report['mode'] = 'full'
             logging.info("Communities creation process completed successfully.")
         else:
             logging.warning("Failed to write communities. Constraint was not applied.")
     except Exception as e:
         logging.error(f"Failed to create communities: {e}")
+
+
+def get_community_update_report():
+    return dict(_last_community_report)
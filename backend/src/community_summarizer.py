@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from src.create_chunks import get_token_encoder
+from src.shared.sqlite_cache import SQLiteBlobCache
+
+COMMUNITY_SUMMARY_CONCURRENCY = int(os.getenv('COMMUNITY_SUMMARY_CONCURRENCY', 10))
+COMMUNITY_SUMMARY_BATCH_SIZE = int(os.getenv('COMMUNITY_SUMMARY_BATCH_SIZE', 100))
+COMMUNITY_SUMMARY_TOKENS_PER_MINUTE = int(os.getenv('COMMUNITY_SUMMARY_TOKENS_PER_MINUTE', 0))
+COMMUNITY_SUMMARY_MAX_INPUT_TOKENS = int(os.getenv('COMMUNITY_SUMMARY_MAX_INPUT_TOKENS', 6000))
+# Tokens reserved per call for the generated title and summary when spending the budget.
+COMMUNITY_SUMMARY_OUTPUT_TOKENS = int(os.getenv('COMMUNITY_SUMMARY_OUTPUT_TOKENS', 300))
+COMMUNITY_SUMMARY_CACHE_ENABLED = os.environ.get("COMMUNITY_SUMMARY_CACHE_ENABLED", "True").lower() in ("true", "1", "yes")
+COMMUNITY_SUMMARY_CACHE_PATH = os.getenv('COMMUNITY_SUMMARY_CACHE_PATH') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'community_summary_cache.db')
+COMMUNITY_SUMMARY_CACHE_MAX_MB = float(os.getenv('COMMUNITY_SUMMARY_CACHE_MAX_MB', 256))
+
+_cache = None
+_cache_lock = threading.Lock()
+_stats = {'cache_hits': 0, 'summarized': 0, 'failed': 0, 'truncated': 0, 'input_tokens': 0, 'budget_wait_seconds': 0.0}
+_stats_lock = threading.Lock()
+
+
+def get_community_summary_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteBlobCache(COMMUNITY_SUMMARY_CACHE_PATH, 'community_summaries', int(COMMUNITY_SUMMARY_CACHE_MAX_MB * 1024 * 1024))
+        return _cache
+
+
+class TokenBudget:
+    """
+    Token bucket shared by the summarizer threads: holds up to `tokens_per_minute` tokens,
+    refilled continuously, and blocks callers until their tokens are available. A call
+    larger than the whole bucket waits for a full bucket and then runs.
+    """
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.available = float(tokens_per_minute)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, tokens):
+        """Takes `tokens` from the bucket; returns the seconds spent waiting."""
+        if self.capacity <= 0:
+            return 0.0
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated_at) * self.capacity / 60)
+                self.updated_at = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return waited
+                delay = (tokens - self.available) * 60 / self.capacity
+            time.sleep(delay)
+            waited += delay
+
+
+def get_summary_cache_key(model, text, is_parent):
+    """Content hash of the community prompt input: its members and relationships, or its child summaries."""
+    return hashlib.sha256(json.dumps([model, 'parent' if is_parent else 'community', text]).encode()).hexdigest()
+
+
+def fit_to_token_budget(text, max_tokens=None):
+    """Truncates `text` to COMMUNITY_SUMMARY_MAX_INPUT_TOKENS tokens; returns (text, token count, truncated)."""
+    max_tokens = max_tokens or COMMUNITY_SUMMARY_MAX_INPUT_TOKENS
+    encoder = get_token_encoder()
+    tokens = encoder.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text, len(tokens), False
+    return encoder.decode(tokens[:max_tokens]), max_tokens, True
+
+
+def _record(**increments):
+    with _stats_lock:
+        for key, value in increments.items():
+            _stats[key] += value
+
+
+def summarize_communities(communities, model, summarize, get_text, is_parent=False):
+    """
+    Returns the {community, title, summary} rows for `communities`, an iterable consumed
+    lazily in batches of COMMUNITY_SUMMARY_BATCH_SIZE so fetching overlaps with summarizing.
+
+    `get_text(community)` builds the prompt input and `summarize(community, text)` calls the
+    LLM with it. Communities whose input hashes to a cached entry reuse the cached title
+    and summary; the others are summarized on COMMUNITY_SUMMARY_CONCURRENCY threads,
+    with inputs truncated to COMMUNITY_SUMMARY_MAX_INPUT_TOKENS and calls paced by
+    COMMUNITY_SUMMARY_TOKENS_PER_MINUTE when set.
+    """
+    summaries = []
+    budget = TokenBudget(COMMUNITY_SUMMARY_TOKENS_PER_MINUTE)
+    counts = {'cached': 0, 'summarized': 0}
+
+    def run(community, text, tokens, truncated, key):
+        waited = budget.consume(tokens + COMMUNITY_SUMMARY_OUTPUT_TOKENS)
+        _record(budget_wait_seconds=waited, input_tokens=tokens, truncated=int(truncated))
+        return key, summarize(community, text)
+
+    def collect(done):
+        computed = {}
+        for future in done:
+            key, result = future.result()
+            if result:
+                summaries.append(result)
+                computed[key] = json.dumps({"title": result["title"], "summary": result["summary"]}).encode()
+            else:
+                logging.error("community summaries could not be processed.")
+        _record(summarized=len(computed), failed=len(done) - len(computed))
+        counts['summarized'] += len(computed)
+        if COMMUNITY_SUMMARY_CACHE_ENABLED and computed:
+            try:
+                get_community_summary_cache().put_many(computed)
+            except Exception as e:
+                logging.warning(f"Failed to store community summaries in cache: {e}")
+
+    communities = iter(communities)
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=COMMUNITY_SUMMARY_CONCURRENCY) as executor:
+        while True:
+            batch = list(islice(communities, COMMUNITY_SUMMARY_BATCH_SIZE))
+            if not batch:
+                break
+            for miss in _reuse_cached_summaries(batch, model, get_text, is_parent, summaries):
+                in_flight.add(executor.submit(run, *miss))
+            # Bounds the communities held in memory while the fetch runs ahead.
+            while len(in_flight) > 2 * COMMUNITY_SUMMARY_CONCURRENCY:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(wait(in_flight)[0])
+    counts['cached'] = len(summaries) - counts['summarized']
+    logging.info(f"Community summaries: {counts['cached']} reused from cache, {counts['summarized']} summarized")
+    return summaries
+
+
+def _reuse_cached_summaries(batch, model, get_text, is_parent, summaries):
+    """Appends the cached summaries of `batch` to `summaries`; returns the communities left to summarize."""
+    pending = []
+    for community in batch:
+        text, tokens, truncated = fit_to_token_budget(get_text(community))
+        pending.append((community, text, tokens, truncated, get_summary_cache_key(model, text, is_parent)))
+    cached = {}
+    if COMMUNITY_SUMMARY_CACHE_ENABLED:
+        try:
+            cached = get_community_summary_cache().get_many([key for *_, key in pending])
+        except Exception as e:
+            logging.warning(f"Community summary cache lookup failed, summarizing all communities: {e}")
+    misses = []
+    for community, text, tokens, truncated, key in pending:
+        if key in cached:
+            summaries.append({"community": community['communityId'], **json.loads(cached[key])})
+        else:
+            misses.append((community, text, tokens, truncated, key))
+    _record(cache_hits=len(pending) - len(misses))
+    return misses
+
+
+def get_community_summary_stats():
+    with _stats_lock:
+        stats = {**_stats, 'budget_wait_seconds': round(_stats['budget_wait_seconds'], 2)}
+    stats['concurrency'] = COMMUNITY_SUMMARY_CONCURRENCY
+    stats['tokens_per_minute'] = COMMUNITY_SUMMARY_TOKENS_PER_MINUTE
+    stats['cache'] = get_community_summary_cache().stats() if COMMUNITY_SUMMARY_CACHE_ENABLED else {'enabled': False}
+    return stats
@@ -0,0 +1,59 @@
+import logging
+import os
+import threading
+from src.graphDB_dataAccess import graphDBdataAccess
+
+COUNT_RECONCILE_DELAY_SECONDS = float(os.getenv('COUNT_RECONCILE_DELAY_SECONDS', 30))
+
+_pending = {}
+_lock = threading.Lock()
+_stats = {'scheduled': 0, 'completed': 0, 'failed': 0, 'drift_corrected': 0}
+
+
+def _reconcile(key, graph, file_name):
+    with _lock:
+        _pending.pop(key, None)
+    try:
+        graphDb_data_Access = graphDBdataAccess(graph)
+        stored = graphDb_data_Access.get_node_relationship_count(file_name).get(file_name, {})
+        recounted = graphDb_data_Access.update_node_relationship_count(file_name).get(file_name, {})
+        drift = {key: recounted[key] - stored.get(key, 0) for key in recounted if recounted[key] != stored.get(key, 0)}
+        with _lock:
+            _stats['completed'] += 1
+            if drift:
+                _stats['drift_corrected'] += 1
+        if drift:
+            logging.info(f"Count reconciliation corrected drift for {file_name}: {drift}")
+    except Exception as e:
+        with _lock:
+            _stats['failed'] += 1
+        logging.warning(f"Count reconciliation failed for {file_name}: {e}")
+
+
+def schedule_count_reconciliation(graph, file_name, delay=None):
+    """
+    Recounts the node and relationship counts of `file_name` with the full count query in a
+    background thread after `delay` seconds (COUNT_RECONCILE_DELAY_SECONDS by default),
+    correcting the drift of the incrementally maintained counters. Requests for a document
+    that already has a reconciliation pending are merged into it.
+    """
+    key = (getattr(graph, '_database', None), file_name)
+    with _lock:
+        if key in _pending:
+            return
+        timer = threading.Timer(COUNT_RECONCILE_DELAY_SECONDS if delay is None else delay, _reconcile, args=(key, graph, file_name))
+        timer.daemon = True
+        _pending[key] = timer
+        _stats['scheduled'] += 1
+    timer.start()
+
+
+def is_count_reconciliation_pending(graph, file_name):
+    """True while the counts of `file_name` are the incremental ones, before the scheduled recount has run."""
+    with _lock:
+        return (getattr(graph, '_database', None), file_name) in _pending
+
+
+def get_count_reconciliation_stats():
+    with _lock:
+        return {**_stats, 'pending': len(_pending)}
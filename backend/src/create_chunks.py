@@ -2,15 +2,75 @@ from langchain_text_splitters import TokenTextSplitter
 from langchain.docstore.document import Document
 from langchain_neo4j import Neo4jGraph
 import logging
+from typing import Iterable
 from src.document_sources.youtube import get_chunks_with_timestamps, get_calculated_timestamps
 import re
 import os
+import itertools
+import tiktoken
+from functools import lru_cache
 
 logging.basicConfig(format="%(asctime)s - %(message)s", level="INFO")
 
+# Same encoding TokenTextSplitter uses by default.
+CHUNK_TOKEN_ENCODING = "gpt2"
+_UTF8_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+
+@lru_cache(maxsize=None)
+def get_token_encoder(encoding_name=CHUNK_TOKEN_ENCODING):
+    return tiktoken.get_encoding(encoding_name)
+
+
+def split_text_with_offsets(text, token_chunk_size, chunk_overlap, encoding_name=CHUNK_TOKEN_ENCODING):
+    """
+    Splits text into windows of token_chunk_size tokens overlapping by chunk_overlap
+    tokens, like TokenTextSplitter, but encodes the text once and slices the original
+    string, so every chunk comes with its exact character offset.
+
+    Returns:
+        A list of (start_char, end_char) pairs into `text`.
+    """
+    if chunk_overlap >= token_chunk_size:
+        raise ValueError(f"Chunk overlap ({chunk_overlap}) must be smaller than chunk size ({token_chunk_size})")
+    encoder = get_token_encoder(encoding_name)
+    tokens = encoder.encode_ordinary(text)
+    windows = []
+    start = 0
+    while start < len(tokens):
+        end = min(start + token_chunk_size, len(tokens))
+        windows.append((start, end))
+        if end == len(tokens):
+            break
+        start += token_chunk_size - chunk_overlap
+    if not windows:
+        return []
+
+    # Token index -> char offset, computed only at window boundaries: bytes are decoded
+    # segment by segment between consecutive boundaries and converted to characters by
+    # counting the bytes that start a UTF-8 character.
+    text_bytes = text.encode("utf-8")
+    boundaries = sorted({index for window in windows for index in window})
+    char_offsets = {}
+    previous_token, byte_position, char_count = 0, 0, 0
+    for boundary in boundaries:
+        segment_end = byte_position + len(encoder.decode_bytes(tokens[previous_token:boundary]))
+        char_count += len(text_bytes[byte_position:segment_end].translate(None, _UTF8_CONTINUATION_BYTES))
+        previous_token, byte_position = boundary, segment_end
+        # A token boundary inside a multi-byte character maps to the start of that character.
+        inside_character = byte_position < len(text_bytes) and 0x80 <= text_bytes[byte_position] < 0xC0
+        char_offsets[boundary] = char_count - 1 if inside_character else char_count
+    if byte_position != len(text_bytes):
+        # Text tiktoken had to repair (e.g. lone surrogates); fall back to its own offsets.
+        decoded_text, token_offsets = encoder.decode_with_offsets(tokens)
+        token_offsets.append(len(decoded_text))
+        char_offsets = {boundary: token_offsets[boundary] for boundary in boundaries}
+    return [(char_offsets[start], char_offsets[end]) for start, end in windows]
+
+
 
 class CreateChunksofDocument:
-    def __init__(self, pages: list[Document], graph: Neo4jGraph):
+    def __init__(self, pages: Iterable[Document], graph: Neo4jGraph):
         self.pages = pages
         self.graph = graph
 
@@ -24,32 +84,55 @@ class CreateChunksofDocument:
         Returns:
             A list of chunks each of which is a langchain Document.
         """
+        return list(self.iter_chunks(token_chunk_size, chunk_overlap))
+
+    def iter_chunks(self, token_chunk_size, chunk_overlap):
+        """
+        Generator version of split_file_into_chunks: pages are consumed one at a time,
+        so `pages` can itself be a generator and only the current page is held in memory.
+        Chunks carry their exact character offset in the document as 'content_offset'.
+        """
         logging.info("Split file into smaller chunks")
-        text_splitter = TokenTextSplitter(chunk_size=token_chunk_size, chunk_overlap=chunk_overlap)
         MAX_TOKEN_CHUNK_SIZE = int(os.getenv('MAX_TOKEN_CHUNK_SIZE', 10000))
         chunk_to_be_created = int(MAX_TOKEN_CHUNK_SIZE / token_chunk_size)
+        pages = iter(self.pages)
+        first_page = next(pages, None)
+        if first_page is None:
+            return
+        pages = itertools.chain([first_page], pages)
         
-        if 'page' in self.pages[0].metadata:
-            chunks = []
-            for i, document in enumerate(self.pages):
+        if 'page' in first_page.metadata:
+            chunk_count = 0
+            page_offset = 0
+            for i, document in enumerate(pages):
                 page_number = i + 1
-                if len(chunks) >= chunk_to_be_created:
-                    break
-                else:
-                    for chunk in text_splitter.split_documents([document]):
-                        chunks.append(Document(page_content=chunk.page_content, metadata={'page_number':page_number}))    
+                for start, end in split_text_with_offsets(document.page_content, token_chunk_size, chunk_overlap):
+                    if chunk_count >= chunk_to_be_created:
+                        return
+                    chunk_count += 1
+                    yield Document(page_content=document.page_content[start:end], metadata={'page_number':page_number, 'content_offset': page_offset + start})
+                page_offset += len(document.page_content)
         
-        elif 'length' in self.pages[0].metadata:
-            if len(self.pages) == 1  or (len(self.pages) > 1 and self.pages[1].page_content.strip() == ''): 
-                match = re.search(r'(?:v=)([0-9A-Za-z_-]{11})\s*',self.pages[0].metadata['source'])
+        elif 'length' in first_page.metadata:
+            # Transcripts are small and their timestamps are computed over all chunks.
+            pages = list(pages)
+            text_splitter = TokenTextSplitter(chunk_size=token_chunk_size, chunk_overlap=chunk_overlap)
+            if len(pages) == 1  or (len(pages) > 1 and pages[1].page_content.strip() == ''): 
+                match = re.search(r'(?:v=)([0-9A-Za-z_-]{11})\s*',pages[0].metadata['source'])
                 youtube_id=match.group(1)   
-                chunks_without_time_range = text_splitter.split_documents([self.pages[0]])
+                chunks_without_time_range = text_splitter.split_documents([pages[0]])
                 chunks = get_calculated_timestamps(chunks_without_time_range[:chunk_to_be_created], youtube_id)
             else: 
-                chunks_without_time_range = text_splitter.split_documents(self.pages)
+                chunks_without_time_range = text_splitter.split_documents(pages)
                 chunks = get_chunks_with_timestamps(chunks_without_time_range[:chunk_to_be_created])
+            yield from chunks[:chunk_to_be_created]
         else:
-            chunks = text_splitter.split_documents(self.pages)
-            
-        chunks = chunks[:chunk_to_be_created]
-        return chunks
\ No newline at end of file
+            chunk_count = 0
+            page_offset = 0
+            for document in pages:
+                for start, end in split_text_with_offsets(document.page_content, token_chunk_size, chunk_overlap):
+                    if chunk_count >= chunk_to_be_created:
+                        return
+                    chunk_count += 1
+                    yield Document(page_content=document.page_content[start:end], metadata={**document.metadata, 'content_offset': page_offset + start})
+                page_offset += len(document.page_content)
@@ -1,17 +1,14 @@
 import os
 import logging
-from google.cloud import storage
-from langchain_community.document_loaders import GCSFileLoader
 from langchain_core.documents import Document
-from PyPDF2 import PdfReader
 import io
 from src.shared.llm_graph_builder_exception import LLMGraphBuilderException
-from google.oauth2.credentials import Credentials
 import time
-import nltk
 from .local_file import load_document_content
+from .pdf_parser import parse_pdf_bytes_stream
 
 def get_gcs_bucket_files_info(gcs_project_id, gcs_bucket_name, gcs_bucket_folder, creds):
+    from google.cloud import storage
     storage_client = storage.Client(project=gcs_project_id, credentials=creds)
     file_name=''
     try:
@@ -46,6 +43,8 @@ def gcs_loader_func(file_path):
    return loader
 
 def get_documents_from_gcs(gcs_project_id, gcs_bucket_name, gcs_bucket_folder, gcs_blob_filename, access_token=None):
+  import nltk
+  from google.cloud import storage
   nltk.download('punkt')
   nltk.download('averaged_perceptron_tagger')
   if gcs_bucket_folder is not None and gcs_bucket_folder.strip()!="":
@@ -64,31 +63,30 @@ def get_documents_from_gcs(gcs_project_id, gcs_bucket_name, gcs_bucket_folder, g
     blob = bucket.blob(blob_name) 
     
     if blob.exists():
+      if blob_name.lower().endswith('.pdf'):
+        pages = parse_pdf_bytes_stream(blob.download_to_file, f'gs://{gcs_bucket_name}/{blob_name}')
+      else:
+        from langchain_community.document_loaders import GCSFileLoader
         loader = GCSFileLoader(project_name=gcs_project_id, bucket=gcs_bucket_name, blob=blob_name, loader_func=gcs_loader_func)
         pages = loader.load() 
     else :
       raise LLMGraphBuilderException('File does not exist, Please re-upload the file and try again.')
   else:
+    from google.oauth2.credentials import Credentials
     creds= Credentials(access_token)
     storage_client = storage.Client(project=gcs_project_id, credentials=creds)
   
     bucket = storage_client.bucket(gcs_bucket_name)
     blob = bucket.blob(blob_name) 
     if blob.exists():
-      content = blob.download_as_bytes()
-      pdf_file = io.BytesIO(content)
-      pdf_reader = PdfReader(pdf_file)
-      # Extract text from all pages
-      text = ""
-      for page in pdf_reader.pages:
-            text += page.extract_text()
-      pages = [Document(page_content = text)]
+      pages = parse_pdf_bytes_stream(blob.download_to_file, f'gs://{gcs_bucket_name}/{blob_name}')
     else:
       raise LLMGraphBuilderException(f'File Not Found in GCS bucket - {gcs_bucket_name}')
   return gcs_blob_filename, pages
 
 def upload_file_to_gcs(file_chunk, chunk_number, original_file_name, bucket_name, folder_name_sha1_hashed):
   try:
+    from google.cloud import storage
     storage_client = storage.Client()
   
     file_name = f'{original_file_name}_part_{chunk_number}'
@@ -106,6 +104,7 @@ def upload_file_to_gcs(file_chunk, chunk_number, original_file_name, bucket_name
   
 def merge_file_gcs(bucket_name, original_file_name: str, folder_name_sha1_hashed, total_chunks):
   try:
+      from google.cloud import storage
       storage_client = storage.Client()
       bucket = storage_client.bucket(bucket_name)
       chunks = []
@@ -132,6 +131,7 @@ def merge_file_gcs(bucket_name, original_file_name: str, folder_name_sha1_hashed
   
 def delete_file_from_gcs(bucket_name,folder_name, file_name):
   try:
+    from google.cloud import storage
     storage_client = storage.Client()
     bucket = storage_client.bucket(bucket_name)
     folder_file_name = folder_name +'/'+file_name
@@ -144,6 +144,7 @@ def delete_file_from_gcs(bucket_name,folder_name, file_name):
   
 def copy_failed_file(source_bucket_name,dest_bucket_name,folder_name, file_name):
   try:
+    from google.cloud import storage
     storage_client = storage.Client()
     source_bucket = storage_client.bucket(source_bucket_name)
     dest_bucket = storage_client.bucket(dest_bucket_name)
@@ -5,6 +5,7 @@ from langchain_community.document_loaders import UnstructuredFileLoader
 from langchain_core.documents import Document
 import chardet
 from langchain_core.document_loaders import BaseLoader
+from .pdf_parser import parse_pdf_pages
 
 class ListLoader(BaseLoader):
    """A wrapper to make a list of Documents compatible with BaseLoader."""
@@ -43,29 +44,45 @@ def load_document_content(file_path):
         return loader,encoding_flag
     
 def get_documents_from_file_by_path(file_path,file_name):
+    """
+    Returns the pages of the file as a generator, so large files are read page by page
+    while they are chunked instead of being loaded into memory at once.
+    """
     file_path = Path(file_path)
     if not file_path.exists():
         logging.info(f'File {file_name} does not exist')
         raise Exception(f'File {file_name} does not exist')
     logging.info(f'file {file_name} processing')
+    file_extension = file_path.suffix.lower()
+    if file_extension == ".pdf":
+        return file_name, read_pages(parse_pdf_pages(file_path)), file_extension
     try:
         loader, encoding_flag = load_document_content(file_path)
-        file_extension = file_path.suffix.lower()
-        if file_extension == ".pdf" or (file_extension == ".txt" and encoding_flag):
-            pages = loader.load()
-        else:
-            unstructured_pages = loader.load()
-            pages = get_pages_with_page_numbers(unstructured_pages)
     except Exception as e:
         raise Exception(f'Error while reading the file content or metadata, {e}')
-    return file_name, pages , file_extension
+    if file_extension == ".txt" and encoding_flag:
+        pages = loader.lazy_load()
+    else:
+        pages = get_pages_with_page_numbers(loader.lazy_load())
+    return file_name, read_pages(pages) , file_extension
+
+def read_pages(pages):
+    try:
+        yield from pages
+    except Exception as e:
+        raise Exception(f'Error while reading the file content or metadata, {e}')
 
 def get_pages_with_page_numbers(unstructured_pages):
-    pages = []
+    """Groups unstructured elements into pages, yielding each page as soon as it is complete."""
     page_number = 1
     page_content=''
     metadata = {}
-    for page in unstructured_pages:
+    elements = iter(unstructured_pages)
+    page = next(elements, None)
+    is_first = True
+    while page is not None:
+        next_page = next(elements, None)
+        is_last = next_page is None
         if  'page_number' in page.metadata:
             if page.metadata['page_number']==page_number:
                 page_content += page.page_content
@@ -74,15 +91,15 @@ def get_pages_with_page_numbers(unstructured_pages):
                 
             if page.metadata['page_number']>page_number:
                 page_number+=1
-                pages.append(Document(page_content = page_content))
+                yield Document(page_content = page_content)
                 page_content='' 
                 
-            if page == unstructured_pages[-1]:
-                pages.append(Document(page_content = page_content))
+            if is_last:
+                yield Document(page_content = page_content)
                     
-        elif page.metadata['category']=='PageBreak' and page!=unstructured_pages[0]:
+        elif page.metadata['category']=='PageBreak' and not is_first:
             page_number+=1
-            pages.append(Document(page_content = page_content, metadata=metadata))
+            yield Document(page_content = page_content, metadata=metadata)
             page_content=''
             metadata={}
         
@@ -91,6 +108,7 @@ def get_pages_with_page_numbers(unstructured_pages):
             metadata_with_custom_page_number = {'source':page.metadata['source'],
                             'page_number':1, 'filename':page.metadata['filename'],
                             'filetype':page.metadata['filetype']}
-            if page == unstructured_pages[-1]:
-                    pages.append(Document(page_content = page_content, metadata=metadata_with_custom_page_number))
-    return pages                
+            if is_last:
+                    yield Document(page_content = page_content, metadata=metadata_with_custom_page_number)
+        page = next_page
+        is_first = False
@@ -0,0 +1,108 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.documents import Document
+
+PDF_PARSE_WORKERS = int(os.getenv('PDF_PARSE_WORKERS', os.cpu_count() or 1))
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', 16))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 32))
+PDF_PARSE_START_METHOD = os.getenv('PDF_PARSE_START_METHOD', 'spawn')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # The API process runs threads (uvicorn, extraction workers, driver pools), so the
+            # workers are started fresh instead of forked with locks held by those threads.
+            _executor = ProcessPoolExecutor(max_workers=PDF_PARSE_WORKERS, mp_context=multiprocessing.get_context(PDF_PARSE_START_METHOD))
+        return _executor
+
+
+def shutdown_pdf_parser():
+    """Stops the pdf parsing processes, cancelling the page ranges not started yet."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _extract_page_range(file_path, start, end):
+    import fitz
+    with fitz.open(file_path) as pdf:
+        return [pdf[page_index].get_text() for page_index in range(start, end)]
+
+
+def _read_pdf_info(file_path):
+    import fitz
+    with fitz.open(file_path) as pdf:
+        metadata = {key: value for key, value in (pdf.metadata or {}).items() if value}
+        return pdf.page_count, metadata
+
+
+def parse_pdf_pages(file_path, source=None):
+    """
+    Yields one Document per PDF page, in page order, with the same `source`, `page`
+    (0-based) and `total_pages` metadata as PyMuPDFLoader.
+
+    Page ranges of PDF_PAGES_PER_TASK pages are parsed on a pool of PDF_PARSE_WORKERS
+    processes; at most two ranges per worker are in flight, so parsed text waiting to be
+    consumed stays bounded. Small files are parsed in-process.
+    """
+    file_path = str(file_path)
+    start_time = time.time()
+    total_pages, pdf_metadata = _read_pdf_info(file_path)
+    base_metadata = {**pdf_metadata, 'source': source or file_path, 'file_path': file_path, 'total_pages': total_pages}
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, total_pages)) for start in range(0, total_pages, PDF_PAGES_PER_TASK)]
+
+    if PDF_PARSE_WORKERS <= 1 or total_pages < PDF_PARALLEL_MIN_PAGES:
+        page_ranges = (_extract_page_range(file_path, start, end) for start, end in ranges)
+    else:
+        page_ranges = _parse_ranges_in_pool(file_path, ranges)
+
+    page_index = 0
+    for page_texts in page_ranges:
+        for text in page_texts:
+            yield Document(page_content=text, metadata={**base_metadata, 'page': page_index})
+            page_index += 1
+
+    elapsed = time.time() - start_time
+    logging.info(f"Parsed {total_pages} pdf pages of {base_metadata['source']} in {elapsed:.2f} seconds ({total_pages / elapsed if elapsed else 0:.1f} pages/sec)")
+
+
+def _parse_ranges_in_pool(file_path, ranges):
+    executor = _get_executor()
+    pending = deque()
+    next_range = 0
+    try:
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < 2 * PDF_PARSE_WORKERS:
+                pending.append(executor.submit(_extract_page_range, file_path, *ranges[next_range]))
+                next_range += 1
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def parse_pdf_bytes_stream(write_to_file, source):
+    """
+    Downloads a remote PDF through `write_to_file(file_object)` into a temporary file,
+    yields its pages with parse_pdf_pages and removes the file once they are consumed.
+    """
+    temp_file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+    try:
+        with temp_file:
+            write_to_file(temp_file)
+        yield from parse_pdf_pages(temp_file.name, source)
+    finally:
+        os.remove(temp_file.name)
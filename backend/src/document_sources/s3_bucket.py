@@ -1,7 +1,6 @@
-from langchain_community.document_loaders import S3DirectoryLoader
+from .pdf_parser import parse_pdf_bytes_stream
 import logging
 from src.shared.llm_graph_builder_exception import LLMGraphBuilderException
-import boto3
 import os
 from urllib.parse import urlparse
 
@@ -12,6 +11,7 @@ def get_s3_files_info(s3_url,aws_access_key_id=None,aws_secret_access_key=None):
       bucket_name = parsed_url.netloc
       directory = parsed_url.path.lstrip('/')
       try:
+        import boto3
         # Connect to S3
         s3 = boto3.client('s3',aws_access_key_id=aws_access_key_id,aws_secret_access_key=aws_secret_access_key)
 
@@ -48,8 +48,9 @@ def get_s3_pdf_content(s3_url,aws_access_key_id=None,aws_secret_access_key=None)
         logging.info(f'bucket name : {bucket_name}')
         directory = parsed_url.path.lstrip('/')
         if directory.endswith('.pdf'):
-          loader=S3DirectoryLoader(bucket_name, prefix=directory,aws_access_key_id=aws_access_key_id,aws_secret_access_key=aws_secret_access_key)
-          pages = loader.load_and_split()
+          import boto3
+          s3 = boto3.client('s3',aws_access_key_id=aws_access_key_id,aws_secret_access_key=aws_secret_access_key)
+          pages = parse_pdf_bytes_stream(lambda file_object: s3.download_fileobj(bucket_name, directory, file_object), s3_url)
           return pages
         else:
           return None
@@ -65,6 +66,7 @@ def get_documents_from_s3(s3_url, aws_access_key_id, aws_secret_access_key):
       bucket = parsed_url.netloc
       file_key = parsed_url.path.lstrip('/')
       file_name=file_key.split('/')[-1]
+      import boto3
       s3=boto3.client('s3',aws_access_key_id=aws_access_key_id,aws_secret_access_key=aws_secret_access_key)
       response=s3.head_object(Bucket=bucket,Key=file_key)
       file_size=response['ContentLength']
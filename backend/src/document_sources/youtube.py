@@ -1,7 +1,5 @@
 from langchain.docstore.document import Document
 from src.shared.llm_graph_builder_exception import LLMGraphBuilderException
-from youtube_transcript_api import YouTubeTranscriptApi 
-from youtube_transcript_api.proxies import GenericProxyConfig
 import logging
 from urllib.parse import urlparse,parse_qs
 from difflib import SequenceMatcher
@@ -12,6 +10,8 @@ import re
 
 def get_youtube_transcript(youtube_id):
   try:
+    from youtube_transcript_api import YouTubeTranscriptApi
+    from youtube_transcript_api.proxies import GenericProxyConfig
     proxy = os.environ.get("YOUTUBE_TRANSCRIPT_PROXY") 
     proxy_config = GenericProxyConfig(http_url=proxy, https_url=proxy) if proxy else None
     youtube_api = YouTubeTranscriptApi(proxy_config=proxy_config)
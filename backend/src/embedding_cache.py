@@ -0,0 +1,87 @@
+import hashlib
+import logging
+import os
+import threading
+from array import array
+from src.shared.common_fn import embed_documents_batched
+from src.shared.sqlite_cache import SQLiteBlobCache
+
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "True").lower() in ("true", "1", "yes")
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'embedding_cache.db')
+EMBEDDING_CACHE_MAX_MB = float(os.getenv('EMBEDDING_CACHE_MAX_MB', 1024))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteBlobCache(EMBEDDING_CACHE_PATH, 'embeddings', int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024))
+        return _cache
+
+
+def get_embedding_model_key(embeddings, dimension):
+    model_name = getattr(embeddings, 'model_name', None) or getattr(embeddings, 'model', None) or getattr(embeddings, 'model_id', None) or type(embeddings).__name__
+    return f"{model_name}:{dimension}"
+
+
+def text_sha1(text):
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def embed_documents_with_cache(embeddings, dimension, texts, sha1_list=None):
+    """
+    Returns the embeddings of `texts`, reading them from the on-disk cache keyed by
+    (model, dimension, sha1 of the text) and embedding only the misses.
+
+    Args:
+        sha1_list: sha1 hex digests of the texts when the caller already has them
+            (chunk ids are the sha1 of the chunk text).
+    """
+    if not texts:
+        return []
+    if not EMBEDDING_CACHE_ENABLED:
+        return embed_documents_batched(embeddings, texts)
+    model_key = get_embedding_model_key(embeddings, dimension)
+    keys = [f"{model_key}:{sha1}" for sha1 in (sha1_list or [text_sha1(text) for text in texts])]
+    cache = get_embedding_cache()
+    try:
+        cached = cache.get_many(keys)
+    except Exception as e:
+        logging.warning(f"Embedding cache lookup failed, embedding without cache: {e}")
+        return embed_documents_batched(embeddings, texts)
+
+    missing = {}
+    for index, key in enumerate(keys):
+        if key not in cached and key not in missing:
+            missing[key] = index
+    if missing:
+        vectors = embed_documents_batched(embeddings, [texts[index] for index in missing.values()])
+        computed = dict(zip(missing, vectors))
+        try:
+            cache.put_many({key: array('f', vector).tobytes() for key, vector in computed.items()})
+        except Exception as e:
+            logging.warning(f"Failed to store embeddings in cache: {e}")
+    else:
+        computed = {}
+    logging.info(f"Embedding cache: {len(keys) - len(missing)} hits, {len(missing)} misses for {len(keys)} texts")
+
+    result = []
+    for key in keys:
+        if key in computed:
+            result.append(computed[key])
+        else:
+            vector = array('f')
+            vector.frombytes(cached[key])
+            result.append(vector.tolist())
+    return result
+
+
+def get_embedding_cache_stats():
+    if not EMBEDDING_CACHE_ENABLED:
+        return {'enabled': False}
+    stats = get_embedding_cache().stats()
+    stats['enabled'] = True
+    return stats
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+from src.shared.sqlite_cache import SQLiteBlobCache
+
+EXTRACTION_CACHE_ENABLED = os.environ.get("EXTRACTION_CACHE_ENABLED", "True").lower() in ("true", "1", "yes")
+EXTRACTION_CACHE_PATH = os.getenv('EXTRACTION_CACHE_PATH') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'extraction_cache.db')
+EXTRACTION_CACHE_MAX_MB = float(os.getenv('EXTRACTION_CACHE_MAX_MB', 512))
+EXTRACTION_CACHE_TTL_HOURS = float(os.getenv('EXTRACTION_CACHE_TTL_HOURS', 24 * 7))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteBlobCache(EXTRACTION_CACHE_PATH, 'graph_documents', int(EXTRACTION_CACHE_MAX_MB * 1024 * 1024),
+                                     ttl_seconds=EXTRACTION_CACHE_TTL_HOURS * 3600 if EXTRACTION_CACHE_TTL_HOURS > 0 else None)
+        return _cache
+
+
+def get_extraction_cache_key(model_name, text, allowed_nodes, allowed_relationships, instructions):
+    key_data = json.dumps([model_name, text, list(allowed_nodes or []), [list(rel) for rel in allowed_relationships or []], instructions or ""])
+    return hashlib.sha256(key_data.encode()).hexdigest()
+
+
+def _node_to_dict(node):
+    return {'id': node.id, 'type': node.type, 'properties': node.properties}
+
+
+def serialize_graph_document(graph_document):
+    return json.dumps({
+        'nodes': [_node_to_dict(node) for node in graph_document.nodes],
+        'relationships': [{'source': _node_to_dict(rel.source), 'target': _node_to_dict(rel.target), 'type': rel.type, 'properties': rel.properties}
+                          for rel in graph_document.relationships],
+    }, default=str).encode()
+
+
+def deserialize_graph_document(value, source):
+    """Rebuilds a cached GraphDocument for `source`, the current combined chunk document (its chunk ids may differ)."""
+    data = json.loads(value)
+    return GraphDocument(
+        nodes=[Node(**node) for node in data['nodes']],
+        relationships=[Relationship(source=Node(**rel['source']), target=Node(**rel['target']), type=rel['type'], properties=rel['properties'])
+                       for rel in data['relationships']],
+        source=source,
+    )
+
+
+def get_cached_graph_documents(keys, documents):
+    """Returns {index: GraphDocument} for the documents whose extraction result is cached."""
+    try:
+        cached = get_extraction_cache().get_many(keys)
+    except Exception as e:
+        logging.warning(f"Extraction cache lookup failed, extracting without cache: {e}")
+        return {}
+    graph_documents = {}
+    for index, key in enumerate(keys):
+        if key in cached:
+            graph_documents[index] = deserialize_graph_document(cached[key], documents[index])
+    return graph_documents
+
+
+def store_graph_document(key, graph_document):
+    try:
+        get_extraction_cache().put(key, serialize_graph_document(graph_document))
+    except Exception as e:
+        logging.warning(f"Failed to store extraction result in cache: {e}")
+
+
+def get_extraction_cache_stats():
+    if not EXTRACTION_CACHE_ENABLED:
+        return {'enabled': False}
+    stats = get_extraction_cache().stats()
+    stats['enabled'] = True
+    return stats
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+EXTRACTION_INITIAL_CONCURRENCY = float(os.getenv('EXTRACTION_INITIAL_CONCURRENCY', 4))
+EXTRACTION_MIN_CONCURRENCY = float(os.getenv('EXTRACTION_MIN_CONCURRENCY', 1))
+EXTRACTION_MAX_CONCURRENCY = float(os.getenv('EXTRACTION_MAX_CONCURRENCY', 32))
+EXTRACTION_CONCURRENCY_INCREASE = float(os.getenv('EXTRACTION_CONCURRENCY_INCREASE', 1))
+EXTRACTION_CONCURRENCY_DECREASE = float(os.getenv('EXTRACTION_CONCURRENCY_DECREASE', 0.5))
+EXTRACTION_CALL_TIMEOUT = float(os.getenv('EXTRACTION_CALL_TIMEOUT', 0))
+EXTRACTION_MAX_RETRIES = int(os.getenv('EXTRACTION_MAX_RETRIES', 3))
+EXTRACTION_RETRY_BACKOFF = float(os.getenv('EXTRACTION_RETRY_BACKOFF', 2))
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def is_rate_limit_error(error):
+    status_code = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if status_code == 429:
+        return True
+    error_text = f"{type(error).__name__} {error}".lower()
+    return any(pattern in error_text for pattern in ('ratelimit', 'rate limit', 'rate_limit', '429', 'resource_exhausted', 'resourceexhausted', 'throttl', 'too many requests'))
+
+
+def is_timeout_error(error):
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    return 'timeout' in type(error).__name__.lower()
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps the number of in-flight LLM calls for one model and adapts the cap AIMD-style:
+    every success adds `increase / limit` (about +increase per round of calls) and a
+    rate-limit or timeout multiplies the cap by `decrease`, at most once per observed
+    call latency so a burst of 429s from the same round only counts once.
+
+    The state is guarded by a thread lock and waiters are woken on their own event
+    loop, so one limiter can be shared by requests running on different loops.
+    """
+
+    def __init__(self, name, initial=EXTRACTION_INITIAL_CONCURRENCY, minimum=EXTRACTION_MIN_CONCURRENCY,
+                 maximum=EXTRACTION_MAX_CONCURRENCY, increase=EXTRACTION_CONCURRENCY_INCREASE, decrease=EXTRACTION_CONCURRENCY_DECREASE):
+        self.name = name
+        self.minimum = max(1.0, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self.calls = 0
+        self.successes = 0
+        self.rate_limited = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.last_latency = 0.0
+        self.avg_latency = 0.0
+        self.max_latency = 0.0
+        self._last_decrease = 0.0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_flight < int(self.limit) and not self._waiters:
+                self.in_flight += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    return_slot = False
+                else:
+                    # The slot was handed over before the cancellation arrived.
+                    return_slot = True
+            if return_slot:
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_waiters()
+
+    def _wake_waiters(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            loop, future = self._waiters.popleft()
+            self.in_flight += 1
+            loop.call_soon_threadsafe(_grant, future)
+
+    def on_success(self, latency):
+        with self._lock:
+            self.successes += 1
+            self._record_latency(latency)
+            self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            self._wake_waiters()
+
+    def on_overload(self, latency, timed_out):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.rate_limited += 1
+            self._record_latency(latency)
+            now = time.monotonic()
+            if now - self._last_decrease >= max(1.0, self.avg_latency):
+                self._last_decrease = now
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                logging.info(f"Extraction concurrency for {self.name} reduced to {int(self.limit)} after {'timeout' if timed_out else 'rate limit'}")
+
+    def on_error(self, latency):
+        with self._lock:
+            self.errors += 1
+            self._record_latency(latency)
+
+    def _record_latency(self, latency):
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.avg_latency = latency if self.avg_latency == 0 else 0.8 * self.avg_latency + 0.2 * latency
+
+    async def run(self, call, *args):
+        """
+        Runs `call(*args)` once a slot is free. Rate-limited and timed out calls shrink the
+        cap and are retried with exponential backoff up to EXTRACTION_MAX_RETRIES times.
+        """
+        attempt = 0
+        while True:
+            await self.acquire()
+            start = time.time()
+            with self._lock:
+                self.calls += 1
+            try:
+                if EXTRACTION_CALL_TIMEOUT > 0:
+                    result = await asyncio.wait_for(call(*args), EXTRACTION_CALL_TIMEOUT)
+                else:
+                    result = await call(*args)
+            except Exception as e:
+                latency = time.time() - start
+                if not (is_rate_limit_error(e) or is_timeout_error(e)):
+                    self.on_error(latency)
+                    raise
+                self.on_overload(latency, is_timeout_error(e))
+                if attempt >= EXTRACTION_MAX_RETRIES:
+                    raise
+                attempt += 1
+                backoff = EXTRACTION_RETRY_BACKOFF * (2 ** (attempt - 1)) * (0.5 + random.random())
+                logging.info(f"Extraction call for {self.name} throttled, retry {attempt}/{EXTRACTION_MAX_RETRIES} in {backoff:.2f} seconds")
+            else:
+                self.on_success(time.time() - start)
+                return result
+            finally:
+                self.release()
+            await asyncio.sleep(backoff)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'model': self.name,
+                'concurrency_limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'queue_depth': len(self._waiters),
+                'calls': self.calls,
+                'successes': self.successes,
+                'rate_limited': self.rate_limited,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+                'last_latency': round(self.last_latency, 2),
+                'avg_latency': round(self.avg_latency, 2),
+                'max_latency': round(self.max_latency, 2),
+            }
+
+
+def _grant(future):
+    if not future.done():
+        future.set_result(True)
+
+
+def get_extraction_limiter(model_name):
+    with _limiters_lock:
+        if model_name not in _limiters:
+            _limiters[model_name] = AdaptiveConcurrencyLimiter(model_name)
+        return _limiters[model_name]
+
+
+async def run_extraction_calls(model_name, call, documents):
+    """Runs `call` for every document under the model's adaptive concurrency limit, keeping input order."""
+    limiter = get_extraction_limiter(model_name)
+    return await asyncio.gather(*[limiter.run(call, document) for document in documents])
+
+
+def get_extraction_scheduler_stats():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.stats() for limiter in limiters]
@@ -3,11 +3,12 @@ import os
 import time
 from neo4j.exceptions import TransientError
 from langchain_neo4j import Neo4jGraph
-from src.shared.common_fn import create_gcs_bucket_folder_name_hashed, delete_uploaded_local_file, load_embedding_model
+from src.shared.common_fn import create_gcs_bucket_folder_name_hashed, delete_uploaded_local_file, get_embedding_model
 from src.document_sources.gcs_bucket import delete_file_from_gcs
-from src.shared.constants import BUCKET_UPLOAD,NODEREL_COUNT_QUERY_WITH_COMMUNITY, NODEREL_COUNT_QUERY_WITHOUT_COMMUNITY
+from src.shared.constants import BUCKET_UPLOAD,NODEREL_COUNT_QUERY_WITH_COMMUNITY, NODEREL_COUNT_QUERY_WITHOUT_COMMUNITY, NODEREL_COUNT_INCREMENT_QUERY, NODEREL_COUNT_STORED_QUERY
 from src.entities.source_node import sourceNode
 from src.communities import MAX_COMMUNITY_LEVELS
+from src.status_bus import publish_document_status
 import json
 from dotenv import load_dotenv
 
@@ -33,6 +34,7 @@ class graphDBdataAccess:
             else :    
                 self.graph.query("""MERGE(d:Document {fileName :$fName}) SET d.status = $status, d.errorMessage = $error_msg""",
                             {"fName":file_name, "status":job_status, "error_msg":exp_msg},session_params={"database":self.graph._database})
+            publish_document_status(self.graph, file_name, {"status": job_status})
         except Exception as e:
             error_message = str(e)
             logging.error(f"Error in updating document node status as failed: {error_message}")
@@ -113,12 +115,16 @@ class graphDBdataAccess:
             if obj_source_node.retry_condition is not None :
                 params['retry_condition'] = obj_source_node.retry_condition    
 
+            if obj_source_node.prefilter_skipped_chunks is not None :
+                params['prefilter_skipped_chunks'] = obj_source_node.prefilter_skipped_chunks
+
             param= {"props":params}
             
             logging.info(f'Base Param value 1 : {param}')
             query = "MERGE(d:Document {fileName :$props.fileName}) SET d += $props"
             logging.info("Update source node properties")
             self.graph.query(query,param,session_params={"database":self.graph._database})
+            publish_document_status(self.graph, params.get('fileName'), params)
         except Exception as e:
             error_message = str(e)
             self.update_exception_db(self,self.file_name,error_message)
@@ -198,6 +204,10 @@ class graphDBdataAccess:
             return False
 
     def check_gds_version(self):
+        if os.getenv('COMMUNITY_ENGINE', 'gds').lower() == "local":
+            # Communities are detected in process, so community features do not need the plugin.
+            logging.info("Community detection uses the local engine; GDS is not required.")
+            return True
         try:
             gds_procedure_count = """
             SHOW FUNCTIONS YIELD name WHERE name STARTS WITH 'gds.version' RETURN COUNT(*) AS totalGdsProcedures
@@ -238,7 +248,7 @@ class graphDBdataAccess:
                                 """,session_params={"database":self.graph._database})
         
         embedding_model = os.getenv('EMBEDDING_MODEL')
-        embeddings, application_dimension = load_embedding_model(embedding_model)
+        embeddings, application_dimension = get_embedding_model(embedding_model)
         logging.info(f'embedding model:{embeddings} and dimesion:{application_dimension}')
 
         gds_status = self.check_gds_version()
@@ -355,6 +365,57 @@ class graphDBdataAccess:
             logging.info(f"Deleting {len(filename_list)} documents = '{filename_list}' from '{source_types_list}' with their entities from database")
         return len(filename_list)
     
+    def delete_removed_chunks(self, file_name, chunk_ids):
+        """
+        Unlinks chunks that are no longer part of a re-ingested document. Chunks left without
+        any document are deleted, together with the entities that only they mentioned.
+        Returns the number of deleted entities.
+        """
+        if not chunk_ids:
+            return 0
+        query_to_unlink_chunks = """
+            MATCH (d:Document {fileName: $file_name})<-[r:PART_OF]-(c:Chunk)
+            WHERE c.id IN $chunk_ids
+            OPTIONAL MATCH (d)-[f:FIRST_CHUNK]->(c)
+            DELETE r, f
+            WITH DISTINCT c
+            WHERE NOT EXISTS { (c)-[:PART_OF]->(:Document) }
+            OPTIONAL MATCH (c)-[:HAS_ENTITY]->(e)
+            WITH c, collect(DISTINCT elementId(e)) AS entity_ids
+            DETACH DELETE c
+            RETURN entity_ids
+            """
+        query_to_delete_orphan_entities = """
+            MATCH (e) WHERE elementId(e) IN $entity_ids
+            AND NOT EXISTS { (e)<-[:HAS_ENTITY]-(:Chunk) }
+            DETACH DELETE e
+            RETURN count(*) AS deleted
+            """
+        result = self.execute_query(query_to_unlink_chunks, {"file_name": file_name, "chunk_ids": chunk_ids})
+        entity_ids = list({entity_id for row in result for entity_id in row['entity_ids']})
+        if not entity_ids:
+            return 0
+        result = self.execute_query(query_to_delete_orphan_entities, {"entity_ids": entity_ids})
+        return result[0]['deleted'] if result else 0
+
+    def rewire_chunk_chain(self, file_name):
+        """
+        Drops NEXT_CHUNK and FIRST_CHUNK relationships left over from a previous version of
+        the document; the current ones were written with the new chunk positions.
+        """
+        query_to_delete_stale_next_chunk = """
+            MATCH (d:Document {fileName: $file_name})<-[:PART_OF]-(a:Chunk)-[n:NEXT_CHUNK]->(b:Chunk)-[:PART_OF]->(d)
+            WHERE b.position <> a.position + 1
+            DELETE n
+            """
+        query_to_delete_stale_first_chunk = """
+            MATCH (d:Document {fileName: $file_name})-[f:FIRST_CHUNK]->(c:Chunk)
+            WHERE c.position <> 1
+            DELETE f
+            """
+        self.execute_query(query_to_delete_stale_next_chunk, {"file_name": file_name})
+        self.execute_query(query_to_delete_stale_first_chunk, {"file_name": file_name})
+
     def list_unconnected_nodes(self):
         query = """
         MATCH (e:!Chunk&!Document&!`__Community__`) 
@@ -470,7 +531,7 @@ class graphDBdataAccess:
         drop and create the vector index when vector index dimesion are different.
         """
         embedding_model = os.getenv('EMBEDDING_MODEL')
-        embeddings, dimension = load_embedding_model(embedding_model)
+        embeddings, dimension = get_embedding_model(embedding_model)
         
         if isVectorIndexExist == 'true':
             self.graph.query("""drop index vector""",session_params={"database":self.graph._database})
@@ -538,6 +599,9 @@ class graphDBdataAccess:
                     "relationshipCount" : relationshipCount
                     })
                 
+                publish_document_status(self.graph, filename, {"nodeCount": nodeCount, "relationshipCount": relationshipCount,
+                    "chunkNodeCount": chunkNodeCount, "chunkRelCount": chunkRelCount, "entityNodeCount": entityNodeCount,
+                    "entityEntityRelCount": entityEntityRelCount, "communityNodeCount": communityNodeCount, "communityRelCount": communityRelCount})
                 response[filename] = {"chunkNodeCount": chunkNodeCount,
                     "chunkRelCount": chunkRelCount,
                     "entityNodeCount": entityNodeCount,
@@ -550,6 +614,27 @@ class graphDBdataAccess:
 
         return response
     
+    def _count_response(self, result):
+        count_keys = ["chunkNodeCount", "chunkRelCount", "entityNodeCount", "entityEntityRelCount",
+                      "communityNodeCount", "communityRelCount", "nodeCount", "relationshipCount"]
+        return {record["filename"]: {key: int(record.get(key) or 0) for key in count_keys} for record in result or []}
+
+    def increment_node_relationship_count(self, document_name, chunk_ids):
+        """
+        Adds what one written batch of chunks contributed to the stored document counts,
+        looking only at the batch neighbourhood instead of recounting the whole document.
+        Returns the updated counts in the same shape as update_node_relationship_count.
+        """
+        param = {"document_name": document_name, "chunk_ids": list(chunk_ids)}
+        response = self._count_response(self.execute_query(NODEREL_COUNT_INCREMENT_QUERY, param))
+        for filename, counts in response.items():
+            publish_document_status(self.graph, filename, counts)
+        return response
+
+    def get_node_relationship_count(self, document_name):
+        """Returns the stored document counts without recounting them."""
+        return self._count_response(self.execute_query(NODEREL_COUNT_STORED_QUERY, {"document_name": document_name}))
+
     def get_nodelabels_relationships(self):
         node_query = """
                     CALL db.labels() YIELD label
@@ -4,11 +4,13 @@ from neo4j import GraphDatabase
 import os
 import json
 
+from src.shared.driver_registry import DriverRegistry, driver_registry, get_pool_config
 from src.shared.constants import GRAPH_CHUNK_LIMIT,GRAPH_QUERY,CHUNK_TEXT_QUERY,COUNT_CHUNKS_QUERY,SCHEMA_VISUALIZATION_QUERY
 
 def get_graphDB_driver(uri, username, password,database="neo4j"):
     """
-    Creates and returns a Neo4j database driver instance configured with the provided credentials.
+    Returns the shared Neo4j driver for the provided credentials from the driver registry,
+    creating it on first use. The driver is pooled; callers must not close it.
 
     Returns:
     Neo4j.Driver: A driver object for interacting with the Neo4j database.
@@ -21,11 +23,12 @@ def get_graphDB_driver(uri, username, password,database="neo4j"):
             database= os.getenv('NEO4J_DATABASE')
             password= os.getenv('NEO4J_PASSWORD')
 
-        enable_user_agent = os.environ.get("ENABLE_USER_AGENT", "False").lower() in ("true", "1", "yes")
-        if enable_user_agent:
-            driver = GraphDatabase.driver(uri, auth=(username, password),database=database, user_agent=os.environ.get('NEO4J_USER_AGENT'))
-        else:
-            driver = GraphDatabase.driver(uri, auth=(username, password),database=database)
+        def connect():
+            enable_user_agent = os.environ.get("ENABLE_USER_AGENT", "False").lower() in ("true", "1", "yes")
+            if enable_user_agent:
+                return GraphDatabase.driver(uri, auth=(username, password),database=database, user_agent=os.environ.get('NEO4J_USER_AGENT'), **get_pool_config())
+            return GraphDatabase.driver(uri, auth=(username, password),database=database, **get_pool_config())
+        driver = driver_registry.get(DriverRegistry.make_key('driver', uri, username, password, database), connect)
         logging.info("Connection successful")
         return driver
     except Exception as e:
@@ -221,9 +224,6 @@ def get_graph_results(uri, username, password,database,document_names):
     except Exception as e:
         logging.error(f"graph_query module: An error occurred in get_graph_results. Error: {str(e)}")
         raise Exception(f"graph_query module: An error occurred in get_graph_results. Please check the logs for more details.") from e
-    finally:
-        logging.info("Closing connection for graph_query api")
-        driver.close()
 
 
 def get_chunktext_results(uri, username, password, database, document_name, page_no):
@@ -256,9 +256,6 @@ def get_chunktext_results(uri, username, password, database, document_name, page
    except Exception as e:
        logging.error(f"An error occurred in get_chunktext_results. Error: {str(e)}")
        raise Exception("An error occurred in get_chunktext_results. Please check the logs for more details.") from e
-   finally:
-       if driver:
-           driver.close()
 
 
 def visualize_schema(uri, userName, password, database):
@@ -275,6 +272,3 @@ def visualize_schema(uri, userName, password, database):
    except Exception as e:
        logging.error(f"An error occurred schema retrieval. Error: {str(e)}")
        raise Exception(f"An error occurred schema retrieval. Error: {str(e)}")
-   finally:
-       if driver:
-           driver.close()
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+EXTRACT_QUEUE_DB_PATH = os.getenv('EXTRACT_QUEUE_DB_PATH') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'extract_jobs.db')
+EXTRACT_QUEUE_WORKERS = int(os.getenv('EXTRACT_QUEUE_WORKERS', 4))
+EXTRACT_QUEUE_MAX_PER_DATABASE = int(os.getenv('EXTRACT_QUEUE_MAX_PER_DATABASE', 2))
+EXTRACT_QUEUE_POLL_INTERVAL = float(os.getenv('EXTRACT_QUEUE_POLL_INTERVAL', 5))
+EXTRACT_QUEUE_STALE_SECONDS = float(os.getenv('EXTRACT_QUEUE_STALE_SECONDS', 600))
+EXTRACT_QUEUE_MAX_ATTEMPTS = int(os.getenv('EXTRACT_QUEUE_MAX_ATTEMPTS', 2))
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+# Never written to the queue file; kept in the memory of the process that queued the job.
+CREDENTIAL_PARAMS = ('password', 'aws_secret_access_key', 'access_token')
+CREDENTIALS_LOST_ERROR = 'The credentials of this job were held by an API process that stopped; submit the job again'
+
+CREATE_JOBS_TABLE = """
+CREATE TABLE IF NOT EXISTS extract_jobs (
+    id TEXT PRIMARY KEY,
+    database_key TEXT NOT NULL,
+    file_name TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    params TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    credentials_owner TEXT
+)
+"""
+
+CREATE_INSTANCES_TABLE = """
+CREATE TABLE IF NOT EXISTS queue_instances (
+    id TEXT PRIMARY KEY,
+    heartbeat_at REAL NOT NULL
+)
+"""
+
+# Jobs of the database with the fewest running jobs (then the one served least recently)
+# go first within a priority, so one large upload cannot starve the other databases.
+CLAIM_NEXT_JOB = """
+SELECT j.id FROM extract_jobs j
+WHERE j.status = 'queued'
+  AND (j.credentials_owner IS NULL OR j.credentials_owner = ?)
+  AND (SELECT COUNT(*) FROM extract_jobs r WHERE r.status = 'running' AND r.database_key = j.database_key) < ?
+ORDER BY j.priority DESC,
+         (SELECT COUNT(*) FROM extract_jobs r WHERE r.status = 'running' AND r.database_key = j.database_key) ASC,
+         (SELECT COALESCE(MAX(s.started_at), 0) FROM extract_jobs s WHERE s.database_key = j.database_key) ASC,
+         j.created_at ASC
+LIMIT 1
+"""
+
+
+class ExtractJobQueue:
+    """
+    Durable queue of extraction jobs kept in a local SQLite file, so queued and running
+    jobs survive a restart of the API.
+
+    The CREDENTIAL_PARAMS of a job are not persisted: the queuing process keeps them in
+    memory and the row only records that process as the credentials owner, so only its
+    workers claim the job. Jobs whose owner stopped sending heartbeats can no longer run
+    and are failed with CREDENTIALS_LOST_ERROR.
+    """
+
+    def __init__(self, db_path=EXTRACT_QUEUE_DB_PATH, max_per_database=EXTRACT_QUEUE_MAX_PER_DATABASE):
+        self.db_path = db_path
+        self.max_per_database = max(1, max_per_database)
+        self.instance_id = uuid.uuid4().hex
+        self._credentials = {}
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(CREATE_JOBS_TABLE)
+            conn.execute(CREATE_INSTANCES_TABLE)
+            if 'credentials_owner' not in {row['name'] for row in conn.execute("PRAGMA table_info(extract_jobs)")}:
+                conn.execute("ALTER TABLE extract_jobs ADD COLUMN credentials_owner TEXT")
+            conn.execute("INSERT OR REPLACE INTO queue_instances (id, heartbeat_at) VALUES (?, ?)", (self.instance_id, time.time()))
+            conn.execute("CREATE INDEX IF NOT EXISTS extract_jobs_status ON extract_jobs(status, database_key)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, database_key, params, file_name=None, priority=0):
+        job_id = str(uuid.uuid4())
+        credentials = {name: params[name] for name in CREDENTIAL_PARAMS if params.get(name)}
+        stored_params = {name: value for name, value in params.items() if name not in credentials}
+        if credentials:
+            with self._lock:
+                self._credentials[job_id] = credentials
+        with self._connect() as conn:
+            conn.execute("INSERT INTO extract_jobs (id, database_key, file_name, priority, status, params, created_at, credentials_owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (job_id, database_key, file_name, int(priority or 0), JOB_QUEUED, json.dumps(stored_params), time.time(),
+                          self.instance_id if credentials else None))
+        logging.info(f"Queued extraction job {job_id} for file {file_name} with priority {priority}")
+        return job_id
+
+    def claim(self, worker_id):
+        """
+        Marks the next eligible job as running and returns (job_id, params, attempt), where
+        attempt is 1 for the first run of the job, or None.
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(CLAIM_NEXT_JOB, (self.instance_id, self.max_per_database)).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                now = time.time()
+                conn.execute("UPDATE extract_jobs SET status = ?, worker_id = ?, started_at = ?, heartbeat_at = ?, attempts = attempts + 1 WHERE id = ?",
+                             (JOB_RUNNING, worker_id, now, now, row['id']))
+                job = conn.execute("SELECT params, attempts FROM extract_jobs WHERE id = ?", (row['id'],)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            credentials = self._credentials.get(row['id'], {})
+        return row['id'], {**json.loads(job['params']), **credentials}, job['attempts']
+
+    def heartbeat(self, job_id):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("UPDATE extract_jobs SET heartbeat_at = ? WHERE id = ? AND status = ?", (now, job_id, JOB_RUNNING))
+            # Workers busy with long jobs do not poll, so running jobs keep the process marked alive.
+            conn.execute("INSERT OR REPLACE INTO queue_instances (id, heartbeat_at) VALUES (?, ?)", (self.instance_id, now))
+
+    def finish(self, job_id, result=None, error=None):
+        status = JOB_FAILED if error is not None else JOB_COMPLETED
+        with self._lock:
+            self._credentials.pop(job_id, None)
+        with self._connect() as conn:
+            conn.execute("UPDATE extract_jobs SET status = ?, result = ?, error = ?, params = NULL, finished_at = ? WHERE id = ?",
+                         (status, json.dumps(result, default=str) if result is not None else None, error, time.time(), job_id))
+
+    def requeue_stale(self, stale_seconds=EXTRACT_QUEUE_STALE_SECONDS, max_attempts=EXTRACT_QUEUE_MAX_ATTEMPTS):
+        """
+        Puts running jobs whose worker stopped sending heartbeats back in the queue, or fails
+        them after max_attempts. Also fails the jobs whose credentials owner stopped, and
+        records that this process is alive.
+        """
+        now = time.time()
+        cutoff = now - stale_seconds
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR REPLACE INTO queue_instances (id, heartbeat_at) VALUES (?, ?)", (self.instance_id, now))
+            failed = conn.execute("UPDATE extract_jobs SET status = ?, error = ?, params = NULL, finished_at = ? WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                                  (JOB_FAILED, 'Worker stopped while processing the job', time.time(), JOB_RUNNING, cutoff, max_attempts)).rowcount
+            requeued = conn.execute("UPDATE extract_jobs SET status = ?, worker_id = NULL WHERE status = ? AND heartbeat_at < ?",
+                                    (JOB_QUEUED, JOB_RUNNING, cutoff)).rowcount
+            orphaned = conn.execute("""UPDATE extract_jobs SET status = ?, error = ?, params = NULL, finished_at = ?
+                                       WHERE status = ? AND credentials_owner IS NOT NULL
+                                       AND credentials_owner NOT IN (SELECT id FROM queue_instances WHERE heartbeat_at >= ?)""",
+                                    (JOB_FAILED, CREDENTIALS_LOST_ERROR, now, JOB_QUEUED, cutoff)).rowcount
+            conn.execute("DELETE FROM queue_instances WHERE heartbeat_at < ?", (cutoff,))
+            conn.execute("COMMIT")
+        if failed or requeued or orphaned:
+            logging.info(f"Extraction queue: requeued {requeued} and failed {failed} stale jobs, failed {orphaned} jobs without credentials")
+        return requeued, failed
+
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT id, database_key, file_name, priority, status, result, error, attempts, created_at, started_at, finished_at FROM extract_jobs WHERE id = ?",
+                               (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            job['result'] = json.loads(job['result']) if job['result'] else None
+            if job['status'] == JOB_QUEUED:
+                job['queue_position'] = conn.execute("SELECT COUNT(*) FROM extract_jobs WHERE status = ? AND (priority > ? OR (priority = ? AND created_at < ?))",
+                                                     (JOB_QUEUED, job['priority'], job['priority'], job['created_at'])).fetchone()[0] + 1
+        job.pop('database_key')
+        return job
+
+    def stats(self):
+        with self._connect() as conn:
+            by_status = {row['status']: row['count'] for row in conn.execute("SELECT status, COUNT(*) AS count FROM extract_jobs GROUP BY status")}
+            by_database = [dict(row) for row in conn.execute(
+                "SELECT database_key, SUM(status = 'queued') AS queued, SUM(status = 'running') AS running FROM extract_jobs WHERE status IN ('queued', 'running') GROUP BY database_key")]
+        # database_key embeds the connection uri; only expose the database name part.
+        for row in by_database:
+            row['database'] = row.pop('database_key').rsplit('|', 1)[-1]
+        return {'queue_depth': by_status.get(JOB_QUEUED, 0), 'running': by_status.get(JOB_RUNNING, 0), 'completed': by_status.get(JOB_COMPLETED, 0),
+                'failed': by_status.get(JOB_FAILED, 0), 'max_per_database': self.max_per_database, 'databases': by_database}
+
+
+class ExtractWorkerPool:
+    """
+    Runs `handler(params, attempt)` for queued jobs on `worker_count` asyncio workers; attempt
+    is above 1 when the job is run again after its worker stopped. The handler returns the
+    API response dict of the job; a response with status 'Failed' fails the job.
+    """
+
+    def __init__(self, job_queue, handler, worker_count=EXTRACT_QUEUE_WORKERS, poll_interval=EXTRACT_QUEUE_POLL_INTERVAL):
+        self.job_queue = job_queue
+        self.handler = handler
+        self.worker_count = max(1, worker_count)
+        self.poll_interval = poll_interval
+        self.busy_workers = 0
+        self._wakeup = None
+        self._tasks = []
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(f"extract-worker-{i}")) for i in range(self.worker_count)]
+        logging.info(f"Started {self.worker_count} extraction queue workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self, worker_id):
+        while True:
+            try:
+                await asyncio.to_thread(self.job_queue.requeue_stale)
+                claimed = await asyncio.to_thread(self.job_queue.claim, worker_id)
+            except Exception as e:
+                logging.exception(f"{worker_id} failed to claim an extraction job: {e}")
+                claimed = None
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job_id, params, attempt = claimed
+            self.busy_workers += 1
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                logging.info(f"{worker_id} started extraction job {job_id} for file {params.get('file_name')}")
+                response = await self.handler(params, attempt)
+                error = (response.get('error') or response.get('message')) if response.get('status') == 'Failed' else None
+                await asyncio.to_thread(self.job_queue.finish, job_id, response, error)
+            except asyncio.CancelledError:
+                # Left as running: the job is requeued once its heartbeat goes stale.
+                raise
+            except Exception as e:
+                logging.exception(f"Extraction job {job_id} failed: {e}")
+                await asyncio.to_thread(self.job_queue.finish, job_id, None, str(e))
+            finally:
+                heartbeat.cancel()
+                self.busy_workers -= 1
+            # Another job of the same database may have become eligible.
+            self.notify()
+
+    async def _heartbeat(self, job_id):
+        while True:
+            await asyncio.sleep(max(1.0, EXTRACT_QUEUE_STALE_SECONDS / 4))
+            await asyncio.to_thread(self.job_queue.heartbeat, job_id)
+
+    def stats(self):
+        return {'workers': self.worker_count, 'busy_workers': self.busy_workers}
@@ -1,20 +1,12 @@
+import asyncio
 import logging
 from langchain.docstore.document import Document
 import os
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
-from langchain_google_vertexai import ChatVertexAI
-from langchain_groq import ChatGroq
-from langchain_google_vertexai import HarmBlockThreshold, HarmCategory
-from langchain_experimental.graph_transformers.diffbot import DiffbotGraphTransformer
 from langchain_experimental.graph_transformers import LLMGraphTransformer
-from langchain_anthropic import ChatAnthropic
-from langchain_fireworks import ChatFireworks
-from langchain_aws import ChatBedrock
-from langchain_community.chat_models import ChatOllama
-import boto3
-import google.auth
 from src.shared.constants import ADDITIONAL_INSTRUCTIONS
 from src.shared.llm_graph_builder_exception import LLMGraphBuilderException
+from src.extraction_scheduler import run_extraction_calls
+from src.extraction_cache import EXTRACTION_CACHE_ENABLED, get_extraction_cache_key, get_cached_graph_documents, store_graph_document
 import re
 from typing import List
 
@@ -30,8 +22,12 @@ def get_llm(model: str):
         raise Exception(err)
     
     logging.info("Model: {}".format(env_key))
+    # Provider packages are imported by the branch that uses them, so the API process only
+    # pays the import cost of the providers it is configured for, on first use.
     try:
         if "gemini" in model:
+            import google.auth
+            from langchain_google_vertexai import ChatVertexAI, HarmBlockThreshold, HarmCategory
             model_name = env_value
             credentials, project_id = google.auth.default()
             llm = ChatVertexAI(
@@ -49,6 +45,7 @@ def get_llm(model: str):
                 },
             )
         elif "openai" in model:
+            from langchain_openai import ChatOpenAI
             model_name, api_key = env_value.split(",")
             if "o3-mini" in model:
                 llm= ChatOpenAI(
@@ -62,6 +59,7 @@ def get_llm(model: str):
                 )
 
         elif "azure" in model:
+            from langchain_openai import AzureChatOpenAI
             model_name, api_endpoint, api_key, api_version = env_value.split(",")
             llm = AzureChatOpenAI(
                 api_key=api_key,
@@ -74,20 +72,25 @@ def get_llm(model: str):
             )
 
         elif "anthropic" in model:
+            from langchain_anthropic import ChatAnthropic
             model_name, api_key = env_value.split(",")
             llm = ChatAnthropic(
                 api_key=api_key, model=model_name, temperature=0, timeout=None
             )
 
         elif "fireworks" in model:
+            from langchain_fireworks import ChatFireworks
             model_name, api_key = env_value.split(",")
             llm = ChatFireworks(api_key=api_key, model=model_name)
 
         elif "groq" in model:
+            from langchain_groq import ChatGroq
             model_name, base_url, api_key = env_value.split(",")
             llm = ChatGroq(api_key=api_key, model_name=model_name, temperature=0)
 
         elif "bedrock" in model:
+            import boto3
+            from langchain_aws import ChatBedrock
             model_name, aws_access_key, aws_secret_key, region_name = env_value.split(",")
             bedrock_client = boto3.client(
                 service_name="bedrock-runtime",
@@ -101,10 +104,12 @@ def get_llm(model: str):
             )
 
         elif "ollama" in model:
+            from langchain_community.chat_models import ChatOllama
             model_name, base_url = env_value.split(",")
             llm = ChatOllama(base_url=base_url, model=model_name)
 
         elif "diffbot" in model:
+            from langchain_experimental.graph_transformers.diffbot import DiffbotGraphTransformer
             #model_name = "diffbot"
             model_name, api_key = env_value.split(",")
             llm = DiffbotGraphTransformer(
@@ -113,6 +118,7 @@ def get_llm(model: str):
             )
         
         else: 
+            from langchain_openai import ChatOpenAI
             model_name, api_endpoint, api_key = env_value.split(",")
             llm = ChatOpenAI(
                 api_key=api_key,
@@ -175,12 +181,13 @@ def get_chunk_id_as_doc_metadata(chunkId_chunkDoc_list):
       
 
 async def get_graph_document_list(
-    llm, combined_chunk_document_list, allowedNodes, allowedRelationship, additional_instructions=None
+    llm, combined_chunk_document_list, allowedNodes, allowedRelationship, additional_instructions=None, bypass_cache=False
 ):
+    from langchain_experimental.graph_transformers.diffbot import DiffbotGraphTransformer
     if additional_instructions:
         additional_instructions = sanitize_additional_instruction(additional_instructions)
     graph_document_list = []
-    if "diffbot_api_key" in dir(llm):
+    if isinstance(llm, DiffbotGraphTransformer):
         llm_transformer = llm
     else:
         if "get_name" in dir(llm) and llm.get_name() != "ChatOpenAI" or llm.get_name() != "ChatVertexAI" or llm.get_name() != "AzureChatOpenAI":
@@ -203,13 +210,36 @@ async def get_graph_document_list(
             additional_instructions=ADDITIONAL_INSTRUCTIONS+ (additional_instructions if additional_instructions else "")
         )
     
-    if isinstance(llm,DiffbotGraphTransformer):
+    if isinstance(llm, DiffbotGraphTransformer):
         graph_document_list = llm_transformer.convert_to_graph_documents(combined_chunk_document_list)
     else:
-        graph_document_list = await llm_transformer.aconvert_to_graph_documents(combined_chunk_document_list)
+        model_key = get_llm_model_name(llm) or type(llm).__name__
+        use_cache = EXTRACTION_CACHE_ENABLED
+        cache_keys = []
+        cached_graph_documents = {}
+        if use_cache:
+            instructions = ADDITIONAL_INSTRUCTIONS + (additional_instructions if additional_instructions else "")
+            cache_keys = [get_extraction_cache_key(model_key, document.page_content, allowedNodes, allowedRelationship, instructions) for document in combined_chunk_document_list]
+        # Bypassing skips the lookup only; the fresh results still replace the cached ones.
+        if use_cache and not bypass_cache:
+            cached_graph_documents = await asyncio.to_thread(get_cached_graph_documents, cache_keys, combined_chunk_document_list)
+            logging.info(f"Extraction cache: {len(cached_graph_documents)} of {len(combined_chunk_document_list)} combined chunks cached")
+
+        async def extract_document(index):
+            graph_document = await llm_transformer.aprocess_response(combined_chunk_document_list[index])
+            # Stored as soon as it is extracted, so a retry after a failed batch only pays for the failed chunks.
+            if use_cache:
+                await asyncio.to_thread(store_graph_document, cache_keys[index], graph_document)
+            return graph_document
+
+        # One call per combined chunk, admitted by the model's adaptive concurrency limit.
+        missing_indexes = [index for index in range(len(combined_chunk_document_list)) if index not in cached_graph_documents]
+        extracted = await run_extraction_calls(model_key, extract_document, missing_indexes)
+        cached_graph_documents.update(zip(missing_indexes, extracted))
+        graph_document_list = [cached_graph_documents[index] for index in range(len(combined_chunk_document_list))]
     return graph_document_list
 
-async def get_graph_from_llm(model, chunkId_chunkDoc_list, allowedNodes, allowedRelationship, chunks_to_combine, additional_instructions=None):
+async def get_graph_from_llm(model, chunkId_chunkDoc_list, allowedNodes, allowedRelationship, chunks_to_combine, additional_instructions=None, bypass_cache=False):
    try:
        llm, model_name = get_llm(model)
        logging.info(f"Using model: {model_name}")
@@ -242,7 +272,8 @@ async def get_graph_from_llm(model, chunkId_chunkDoc_list, allowedNodes, allowed
            combined_chunk_document_list,
            allowed_nodes,
            allowed_relationships,
-           additional_instructions
+           additional_instructions,
+           bypass_cache
        )
        logging.info(f"Generated {len(graph_document_list)} graph documents")
        return graph_document_list
@@ -1,10 +1,10 @@
 import os
-from google.cloud import logging as gclogger
 
 class CustomLogger:
     def __init__(self):
         self.is_gcp_log_enabled = os.environ.get("GCP_LOG_METRICS_ENABLED", "False").lower() in ("true", "1", "yes")
         if self.is_gcp_log_enabled:
+            from google.cloud import logging as gclogger
             self.logging_client = gclogger.Client()
             self.logger_name = "llm_experiments_metrics"
             self.logger = self.logging_client.logger(self.logger_name)
@@ -1,8 +1,8 @@
 from langchain_neo4j import Neo4jGraph
 from src.shared.constants import (BUCKET_UPLOAD,BUCKET_FAILED_FILE, PROJECT_ID, QUERY_TO_GET_CHUNKS, 
                                   QUERY_TO_DELETE_EXISTING_ENTITIES, 
-                                  QUERY_TO_GET_LAST_PROCESSED_CHUNK_POSITION,
-                                  QUERY_TO_GET_LAST_PROCESSED_CHUNK_WITHOUT_ENTITY,
+                                  QUERY_TO_GET_PROCESSED_CHUNK_CHECKPOINT,
+                                  QUERY_TO_GET_DOCUMENT_CHUNK_IDS,
                                   START_FROM_BEGINNING,
                                   START_FROM_LAST_PROCESSED_POSITION,
                                   DELETE_ENTITIES_AND_START_FROM_BEGINNING,
@@ -24,7 +24,13 @@ from src.shared.common_fn import *
 from src.make_relationships import *
 from src.document_sources.web_pages import *
 from src.graph_query import get_graphDB_driver
+from src.chunk_pipeline import ChunkBatchPipeline
+from src.near_duplicate_index import NEAR_DUP_ENABLED, find_near_duplicate_chunks, index_chunks
+from src.chunk_prefilter import PREFILTER_ENABLED, strip_repeated_page_lines, filter_low_information_chunks
+from src.count_reconciliation import schedule_count_reconciliation
 import re
+import asyncio
+import itertools
 from langchain_community.document_loaders import WikipediaLoader, WebBaseLoader
 import warnings
 import sys
@@ -227,7 +233,7 @@ def create_source_node_graph_url_wikipedia(graph, model, wiki_query, source_type
       lst_file_name.append({'fileName':obj_source_node.file_name,'fileSize':obj_source_node.file_size,'url':obj_source_node.url, 'language':obj_source_node.language, 'status':'Success'})
     return lst_file_name,success_count,failed_count
     
-async def extract_graph_from_file_local_file(uri, userName, password, database, model, merged_file_path, fileName, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions):
+async def extract_graph_from_file_local_file(uri, userName, password, database, model, merged_file_path, fileName, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental=False, bypass_cache=False):
 
   logging.info(f'Process file name :{fileName}')
   if not retry_condition:
@@ -237,13 +243,14 @@ async def extract_graph_from_file_local_file(uri, userName, password, database,
       file_name, pages = get_documents_from_gcs( PROJECT_ID, BUCKET_UPLOAD, folder_name, fileName)
     else:
       file_name, pages, file_extension = get_documents_from_file_by_path(merged_file_path,fileName)
-    if pages==None or len(pages)==0:
+    first_page, pages = peek_pages(pages)
+    if first_page is None:
       raise LLMGraphBuilderException(f'File content is not available for file : {file_name}')
-    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, True, merged_file_path, additional_instructions=additional_instructions)
+    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, True, merged_file_path, additional_instructions=additional_instructions, incremental=incremental, bypass_cache=bypass_cache)
   else:
-    return await processing_source(uri, userName, password, database, model, fileName, [], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, True, merged_file_path, retry_condition, additional_instructions=additional_instructions)
+    return await processing_source(uri, userName, password, database, model, fileName, [], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, True, merged_file_path, retry_condition, additional_instructions=additional_instructions, bypass_cache=bypass_cache)
   
-async def extract_graph_from_file_s3(uri, userName, password, database, model, source_url, aws_access_key_id, aws_secret_access_key, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions):
+async def extract_graph_from_file_s3(uri, userName, password, database, model, source_url, aws_access_key_id, aws_secret_access_key, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental=False, bypass_cache=False):
   if not retry_condition:
     if(aws_access_key_id==None or aws_secret_access_key==None):
       raise LLMGraphBuilderException('Please provide AWS access and secret keys')
@@ -251,50 +258,52 @@ async def extract_graph_from_file_s3(uri, userName, password, database, model, s
       logging.info("Insert in S3 Block")
       file_name, pages = get_documents_from_s3(source_url, aws_access_key_id, aws_secret_access_key)
 
-    if pages==None or len(pages)==0:
+    first_page, pages = peek_pages(pages)
+    if first_page is None:
       raise LLMGraphBuilderException(f'File content is not available for file : {file_name}')
-    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, additional_instructions=additional_instructions)
+    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, additional_instructions=additional_instructions, incremental=incremental, bypass_cache=bypass_cache)
   else:
-    return await processing_source(uri, userName, password, database, model, file_name, [], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition=retry_condition, additional_instructions=additional_instructions)
+    return await processing_source(uri, userName, password, database, model, file_name, [], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition=retry_condition, additional_instructions=additional_instructions, bypass_cache=bypass_cache)
   
-async def extract_graph_from_web_page(uri, userName, password, database, model, source_url, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions):
+async def extract_graph_from_web_page(uri, userName, password, database, model, source_url, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental=False, bypass_cache=False):
   if not retry_condition:
     pages = get_documents_from_web_page(source_url)
     if pages==None or len(pages)==0:
       raise LLMGraphBuilderException(f'Content is not available for given URL : {file_name}')
-    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, additional_instructions=additional_instructions)
+    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, additional_instructions=additional_instructions, incremental=incremental, bypass_cache=bypass_cache)
   else:
-    return await processing_source(uri, userName, password, database, model, file_name, [], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition=retry_condition, additional_instructions=additional_instructions)
+    return await processing_source(uri, userName, password, database, model, file_name, [], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition=retry_condition, additional_instructions=additional_instructions, bypass_cache=bypass_cache)
   
-async def extract_graph_from_file_youtube(uri, userName, password, database, model, source_url, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions):
+async def extract_graph_from_file_youtube(uri, userName, password, database, model, source_url, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental=False, bypass_cache=False):
   if not retry_condition:
     file_name, pages = get_documents_from_youtube(source_url)
 
     if pages==None or len(pages)==0:
       raise LLMGraphBuilderException(f'Youtube transcript is not available for file : {file_name}')
-    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, additional_instructions=additional_instructions)
+    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, additional_instructions=additional_instructions, incremental=incremental, bypass_cache=bypass_cache)
   else:
-     return await processing_source(uri, userName, password, database, model, file_name, [], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition=retry_condition, additional_instructions=additional_instructions)
+     return await processing_source(uri, userName, password, database, model, file_name, [], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition=retry_condition, additional_instructions=additional_instructions, bypass_cache=bypass_cache)
     
-async def extract_graph_from_file_Wikipedia(uri, userName, password, database, model, wiki_query, language, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions):
+async def extract_graph_from_file_Wikipedia(uri, userName, password, database, model, wiki_query, language, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental=False, bypass_cache=False):
   if not retry_condition:
     file_name, pages = get_documents_from_Wikipedia(wiki_query, language)
     if pages==None or len(pages)==0:
       raise LLMGraphBuilderException(f'Wikipedia page is not available for file : {file_name}')
-    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, additional_instructions=additional_instructions)
+    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, additional_instructions=additional_instructions, incremental=incremental, bypass_cache=bypass_cache)
   else:
-    return await processing_source(uri, userName, password, database, model, file_name,[], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition=retry_condition, additional_instructions=additional_instructions)
+    return await processing_source(uri, userName, password, database, model, file_name,[], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition=retry_condition, additional_instructions=additional_instructions, bypass_cache=bypass_cache)
 
-async def extract_graph_from_file_gcs(uri, userName, password, database, model, gcs_project_id, gcs_bucket_name, gcs_bucket_folder, gcs_blob_filename, access_token, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions):
+async def extract_graph_from_file_gcs(uri, userName, password, database, model, gcs_project_id, gcs_bucket_name, gcs_bucket_folder, gcs_blob_filename, access_token, file_name, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition, additional_instructions, incremental=False, bypass_cache=False):
   if not retry_condition:
     file_name, pages = get_documents_from_gcs(gcs_project_id, gcs_bucket_name, gcs_bucket_folder, gcs_blob_filename, access_token)
-    if pages==None or len(pages)==0:
+    first_page, pages = peek_pages(pages)
+    if first_page is None:
       raise LLMGraphBuilderException(f'File content is not available for file : {file_name}')
-    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, additional_instructions=additional_instructions)
+    return await processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, additional_instructions=additional_instructions, incremental=incremental, bypass_cache=bypass_cache)
   else:
-    return await processing_source(uri, userName, password, database, model, file_name, [], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition=retry_condition, additional_instructions=additional_instructions)
+    return await processing_source(uri, userName, password, database, model, file_name, [], allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, retry_condition=retry_condition, additional_instructions=additional_instructions, bypass_cache=bypass_cache)
   
-async def processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, is_uploaded_from_local=None, merged_file_path=None, retry_condition=None, additional_instructions=None):
+async def processing_source(uri, userName, password, database, model, file_name, pages, allowedNodes, allowedRelationship, token_chunk_size, chunk_overlap, chunks_to_combine, is_uploaded_from_local=None, merged_file_path=None, retry_condition=None, additional_instructions=None, incremental=False, bypass_cache=False):
   """
    Extracts a Neo4jGraph from a PDF file based on the model.
    
@@ -305,6 +314,8 @@ async def processing_source(uri, userName, password, database, model, file_name,
    	 password: Password to use for graph creation ( if None will use password from config file )
    	 file: File object containing the PDF file to be used
    	 model: Type of model to use ('Diffbot'or'OpenAI GPT')
+     incremental: Re-ingest a new version of an existing document, extracting only the
+       chunks whose sha1 is not already linked to it and removing the chunks that are gone
    
    Returns: 
    	 Json response to API with fileName, nodeCount, relationshipCount, processingTime, 
@@ -322,8 +333,23 @@ async def processing_source(uri, userName, password, database, model, file_name,
   uri_latency["create_connection"] = f'{elapsed_create_connection:.2f}'
   graphDb_data_Access = graphDBdataAccess(graph)
   create_chunk_vector_index(graph)
+  update_graph_chunk_processed = int(os.environ.get('UPDATE_GRAPH_CHUNKS_PROCESSED'))
   start_get_chunkId_chunkDoc_list = time.time()
-  total_chunks, chunkId_chunkDoc_list = get_chunkId_chunkDoc_list(graph, file_name, pages, token_chunk_size, chunk_overlap, retry_condition)
+  chunk_stream_stats = {'total_chunks': 0}
+  if retry_condition:
+    total_chunks, chunkId_chunkDoc_list = get_chunkId_chunkDoc_list(graph, file_name, pages, token_chunk_size, chunk_overlap, retry_condition)
+    chunk_windows = (chunkId_chunkDoc_list[i:i+update_graph_chunk_processed] for i in range(0, len(chunkId_chunkDoc_list), update_graph_chunk_processed))
+  else:
+    # New sources stream page -> chunk -> pipeline; the total is only known once the stream ends.
+    total_chunks = 0
+    if incremental:
+      existing_chunks = execute_graph_query(graph, QUERY_TO_GET_DOCUMENT_CHUNK_IDS, {"filename": file_name})
+      existing_chunk_ids = {row['id'] for row in existing_chunks}
+      # Chunks of an earlier run that never got past extraction are extracted again.
+      processed_chunk_ids = {row['id'] for row in existing_chunks if row['processed']}
+      seen_chunk_ids = set()
+      logging.info(f"Incremental ingestion of {file_name}: {len(existing_chunk_ids)} chunks already stored")
+    chunk_windows = stream_chunkId_chunkDoc_windows(graph, file_name, pages, token_chunk_size, chunk_overlap, update_graph_chunk_processed, chunk_stream_stats)
   end_get_chunkId_chunkDoc_list = time.time()
   elapsed_get_chunkId_chunkDoc_list = end_get_chunkId_chunkDoc_list - start_get_chunkId_chunkDoc_list
   logging.info(f'Time taken to create list chunkids with chunk document: {elapsed_get_chunkId_chunkDoc_list:.2f} seconds')
@@ -359,56 +385,120 @@ async def processing_source(uri, userName, password, database, model, file_name,
       
       start_update_source_node = time.time()
       graphDb_data_Access.update_source_node(obj_source_node)
-      graphDb_data_Access.update_node_relationship_count(file_name)
+      initial_counts = graphDb_data_Access.update_node_relationship_count(file_name)
+      # A first ingestion starts from zero, so the counts can be kept up to date from each
+      # batch; retries and re-ingestions of a populated document recount it instead.
+      count_incrementally = not retry_condition and not incremental and initial_counts.get(file_name, {}).get('chunkNodeCount', 0) == 0
       end_update_source_node = time.time()
       elapsed_update_source_node = end_update_source_node - start_update_source_node
       logging.info(f'Time taken to update the document source node: {elapsed_update_source_node:.2f} seconds')
       uri_latency["update_source_node"] = f'{elapsed_update_source_node:.2f}'
 
       logging.info('Update the status as Processing')
-      update_graph_chunk_processed = int(os.environ.get('UPDATE_GRAPH_CHUNKS_PROCESSED'))
-      # selected_chunks = []
-      is_cancelled_status = False
       job_status = "Completed"
-      for i in range(0, len(chunkId_chunkDoc_list), update_graph_chunk_processed):
-        select_chunks_upto = i+update_graph_chunk_processed
-        logging.info(f'Selected Chunks upto: {select_chunks_upto}')
-        if len(chunkId_chunkDoc_list) <= select_chunks_upto:
-          select_chunks_upto = len(chunkId_chunkDoc_list)
-        selected_chunks = chunkId_chunkDoc_list[i:select_chunks_upto]
-        
-        result = graphDb_data_Access.get_current_status_document_node(file_name)
-        is_cancelled_status = result[0]['is_cancelled']
+
+      def chunk_batches():
+        i = 0
+        for chunks in chunk_windows:
+          select_chunks_upto = i+len(chunks)
+          logging.info(f'Selected Chunks upto: {select_chunks_upto}')
+          chunk_ids = [row['chunk_id'] for row in chunks]
+          if incremental and not retry_condition:
+            seen_chunk_ids.update(row['chunk_id'] for row in chunks)
+            chunks = [row for row in chunks if row['chunk_id'] not in processed_chunk_ids]
+          yield {'start': i, 'end': select_chunks_upto, 'chunks': chunks, 'chunk_ids': chunk_ids, 'latency': {}}
+          i = select_chunks_upto
+
+      async def is_cancelled():
+        result = await asyncio.to_thread(graphDb_data_Access.get_current_status_document_node, file_name)
         logging.info(f"Value of is_cancelled : {result[0]['is_cancelled']}")
-        if bool(is_cancelled_status) == True:
-          job_status = "Cancelled"
-          logging.info('Exit from running loop of processing file')
-          break
-        else:
-          processing_chunks_start_time = time.time()
-          node_count,rel_count,latency_processed_chunk = await processing_chunks(selected_chunks,graph,uri, userName, password, database,file_name,model,allowedNodes,allowedRelationship,chunks_to_combine,node_count, rel_count, additional_instructions)
-          processing_chunks_end_time = time.time()
-          processing_chunks_elapsed_end_time = processing_chunks_end_time - processing_chunks_start_time
-          logging.info(f"Time taken {update_graph_chunk_processed} chunks processed upto {select_chunks_upto} completed in {processing_chunks_elapsed_end_time:.2f} seconds for file name {file_name}")
-          uri_latency[f'processed_combine_chunk_{i}-{select_chunks_upto}'] = f'{processing_chunks_elapsed_end_time:.2f}'
-          uri_latency[f'processed_chunk_detail_{i}-{select_chunks_upto}'] = latency_processed_chunk
-          end_time = datetime.now()
-          processed_time = end_time - start_time
-          
-          obj_source_node = sourceNode()
-          obj_source_node.file_name = file_name
-          obj_source_node.updated_at = end_time
-          obj_source_node.processing_time = processed_time
-          obj_source_node.processed_chunk = select_chunks_upto+select_chunks_with_retry
-          if retry_condition == START_FROM_BEGINNING:
-            result = execute_graph_query(graph,QUERY_TO_GET_NODES_AND_RELATIONS_OF_A_DOCUMENT, params={"filename":file_name})
-            obj_source_node.node_count = result[0]['nodes']
-            obj_source_node.relationship_count = result[0]['rels']
-          else:  
-            obj_source_node.node_count = node_count
-            obj_source_node.relationship_count = rel_count
-          graphDb_data_Access.update_source_node(obj_source_node)
-          graphDb_data_Access.update_node_relationship_count(file_name)
+        return bool(result[0]['is_cancelled'])
+
+      async def embed_stage(batch):
+        batch['start_time'] = time.time()
+        # Retries re-extract on purpose, so only new ingestions reuse other documents' extractions.
+        if CHUNK_DEDUP_ENABLED and not retry_condition and batch['chunks']:
+          dedup_stats['total'] += len(batch['chunks'])
+          batch['chunks'] = await dedup_chunks_batch(graph, batch['chunks'], batch['latency'])
+          dedup_stats['skipped'] += batch['latency']['dedup_skipped_chunks']
+        if batch['chunks']:
+          await embed_chunks_batch(graph, batch['chunks'], file_name, batch['latency'])
+        return batch
+
+      async def extract_stage(batch):
+        if PREFILTER_ENABLED and batch['chunks']:
+          # Low information chunks stay stored and embedded, they are only kept from the LLM.
+          batch['chunks'], skipped_chunks = filter_low_information_chunks(batch['chunks'])
+          dedup_stats['prefilter_skipped'] += len(skipped_chunks)
+          batch['latency']["prefilter_skipped_chunks"] = len(skipped_chunks)
+        if NEAR_DUP_ENABLED and not retry_condition and batch['chunks']:
+          batch['chunks'] = await near_dup_chunks_batch(graph, batch['chunks'], batch['latency'])
+          dedup_stats['near_dup_skipped'] += batch['latency']['near_dup_skipped_chunks']
+        # Incremental runs may leave a window without any chunk to extract; it still moves the checkpoint.
+        batch['graph_documents'] = await extract_chunks_batch(model, batch['chunks'], allowedNodes, allowedRelationship, chunks_to_combine, additional_instructions, batch['latency'],
+                                                              bypass_cache=bypass_cache) if batch['chunks'] else []
+        return batch
+
+      async def write_stage(batch):
+        nonlocal node_count, rel_count
+        i, select_chunks_upto = batch['start'], batch['end']
+        node_count, rel_count = await asyncio.to_thread(write_chunks_batch, graph, batch['graph_documents'], batch['chunks'], file_name, batch['latency'],
+                                                        batch['chunk_ids'] if count_incrementally else None)
+        if NEAR_DUP_ENABLED and batch['chunks']:
+          await asyncio.to_thread(index_chunks, batch['chunks'])
+        processing_chunks_elapsed_end_time = time.time() - batch['start_time']
+        logging.info(f"Time taken {update_graph_chunk_processed} chunks processed upto {select_chunks_upto} completed in {processing_chunks_elapsed_end_time:.2f} seconds for file name {file_name}")
+        uri_latency[f'processed_combine_chunk_{i}-{select_chunks_upto}'] = f'{processing_chunks_elapsed_end_time:.2f}'
+        uri_latency[f'processed_chunk_detail_{i}-{select_chunks_upto}'] = batch['latency']
+        end_time = datetime.now()
+        processed_time = end_time - start_time
+
+        # processed_chunk is the resume checkpoint, so it only moves once a batch is fully
+        # written; the pipeline writes batches in order, keeping it monotonic.
+        obj_source_node = sourceNode()
+        obj_source_node.file_name = file_name
+        obj_source_node.updated_at = end_time
+        obj_source_node.processing_time = processed_time
+        obj_source_node.processed_chunk = select_chunks_upto+select_chunks_with_retry
+        if not retry_condition:
+          obj_source_node.total_chunks = chunk_stream_stats['total_chunks']
+        if retry_condition == START_FROM_BEGINNING:
+          result = await asyncio.to_thread(execute_graph_query, graph, QUERY_TO_GET_NODES_AND_RELATIONS_OF_A_DOCUMENT, {"filename":file_name})
+          obj_source_node.node_count = result[0]['nodes']
+          obj_source_node.relationship_count = result[0]['rels']
+        else:  
+          obj_source_node.node_count = node_count
+          obj_source_node.relationship_count = rel_count
+        await asyncio.to_thread(graphDb_data_Access.update_source_node, obj_source_node)
+        if not count_incrementally:
+          await asyncio.to_thread(graphDb_data_Access.update_node_relationship_count, file_name)
+
+      dedup_stats = {'total': 0, 'skipped': 0, 'near_dup_skipped': 0, 'prefilter_skipped': 0}
+      chunk_pipeline = ChunkBatchPipeline(embed_stage, extract_stage, write_stage)
+      await chunk_pipeline.run(chunk_batches(), is_cancelled)
+      if dedup_stats['total']:
+        dedup_ratio = dedup_stats['skipped'] / dedup_stats['total']
+        logging.info(f"Dedup ratio for {file_name}: {dedup_stats['skipped']} of {dedup_stats['total']} chunks ({dedup_ratio:.1%}) reused existing extractions")
+        uri_latency["dedup_skipped_chunks"] = dedup_stats['skipped']
+        uri_latency["dedup_ratio"] = f'{dedup_ratio:.3f}'
+      if PREFILTER_ENABLED:
+        logging.info(f"Prefilter for {file_name}: {chunk_stream_stats.get('stripped_lines', 0)} repeated header/footer lines stripped, {dedup_stats['prefilter_skipped']} low information chunks not extracted")
+        uri_latency["prefilter_stripped_lines"] = chunk_stream_stats.get('stripped_lines', 0)
+        uri_latency["prefilter_skipped_chunks"] = dedup_stats['prefilter_skipped']
+      if NEAR_DUP_ENABLED:
+        logging.info(f"Near-duplicate check for {file_name}: {dedup_stats['near_dup_skipped']} chunks linked to similar extracted chunks")
+        uri_latency["near_dup_skipped_chunks"] = dedup_stats['near_dup_skipped']
+      if chunk_pipeline.cancelled:
+        job_status = "Cancelled"
+      elif incremental and not retry_condition:
+        removed_chunk_ids = list(existing_chunk_ids - seen_chunk_ids)
+        added_chunks = len(seen_chunk_ids - processed_chunk_ids)
+        deleted_entities = graphDb_data_Access.delete_removed_chunks(file_name, removed_chunk_ids)
+        graphDb_data_Access.rewire_chunk_chain(file_name)
+        logging.info(f"Incremental ingestion of {file_name}: {added_chunks} chunks extracted, {len(seen_chunk_ids) - added_chunks} unchanged, {len(removed_chunk_ids)} removed with {deleted_entities} orphaned entities")
+        uri_latency["incremental_added_chunks"] = added_chunks
+        uri_latency["incremental_removed_chunks"] = len(removed_chunk_ids)
+        uri_latency["incremental_deleted_entities"] = deleted_entities
       
       result = graphDb_data_Access.get_current_status_document_node(file_name)
       is_cancelled_status = result[0]['is_cancelled']
@@ -422,9 +512,20 @@ async def processing_source(uri, userName, password, database, model, file_name,
       obj_source_node.file_name = file_name.strip() if isinstance(file_name, str) else file_name
       obj_source_node.status = job_status
       obj_source_node.processing_time = processed_time
+      if not retry_condition:
+        total_chunks = chunk_stream_stats['total_chunks']
+        obj_source_node.total_chunks = total_chunks
+        uri_latency["total_chunks"] = total_chunks
+        if PREFILTER_ENABLED:
+          obj_source_node.prefilter_skipped_chunks = dedup_stats['prefilter_skipped']
 
       graphDb_data_Access.update_source_node(obj_source_node)
-      graphDb_data_Access.update_node_relationship_count(file_name)
+      if count_incrementally:
+        # Post-processing such as SIMILAR links is not part of the batch counts, and
+        # relationships between entities the document already had are not counted either.
+        schedule_count_reconciliation(graph, file_name)
+      else:
+        graphDb_data_Access.update_node_relationship_count(file_name)
       logging.info('Updated the nodeCount and relCount properties in Document node')
       logging.info(f'file:{file_name} extraction has been completed')
 
@@ -472,20 +573,69 @@ async def processing_chunks(chunkId_chunkDoc_list,graph,uri, userName, password,
   else:
     graph = create_graph_database_connection(uri, userName, password, database)
   
+  await embed_chunks_batch(graph, chunkId_chunkDoc_list, file_name, latency_processing_chunk)
+  graph_documents = await extract_chunks_batch(model, chunkId_chunkDoc_list, allowedNodes, allowedRelationship, chunks_to_combine, additional_instructions, latency_processing_chunk)
+  node_count,rel_count = write_chunks_batch(graph, graph_documents, chunkId_chunkDoc_list, file_name, latency_processing_chunk)
+  return node_count,rel_count,latency_processing_chunk
+
+async def embed_chunks_batch(graph, chunkId_chunkDoc_list, file_name, latency_processing_chunk):
+  """Embedding stage: stores the chunk embeddings of one batch."""
   start_update_embedding = time.time()
-  create_chunk_embeddings( graph, chunkId_chunkDoc_list, file_name)
+  await asyncio.to_thread(create_chunk_embeddings, graph, chunkId_chunkDoc_list, file_name)
   end_update_embedding = time.time()
   elapsed_update_embedding = end_update_embedding - start_update_embedding
   logging.info(f'Time taken to update embedding in chunk node: {elapsed_update_embedding:.2f} seconds')
   latency_processing_chunk["update_embedding"] = f'{elapsed_update_embedding:.2f}'
+
+async def dedup_chunks_batch(graph, chunkId_chunkDoc_list, latency_processing_chunk):
+  """
+  Dedup stage: drops the chunks of one batch whose content was already extracted for
+  another document. Chunk ids are the sha1 of the text, so such a chunk is the same node;
+  it was linked to this document when written and keeps its HAS_ENTITY relationships.
+  Returns the chunks still to embed and extract.
+  """
+  start_dedup = time.time()
+  extracted_chunk_ids = await asyncio.to_thread(get_extracted_chunk_ids, graph, [row['chunk_id'] for row in chunkId_chunkDoc_list])
+  new_chunks = [row for row in chunkId_chunkDoc_list if row['chunk_id'] not in extracted_chunk_ids]
+  elapsed_dedup = time.time() - start_dedup
+  logging.info(f'Dedup skipped {len(chunkId_chunkDoc_list) - len(new_chunks)} of {len(chunkId_chunkDoc_list)} chunks already extracted in {elapsed_dedup:.2f} seconds')
+  latency_processing_chunk["dedup"] = f'{elapsed_dedup:.2f}'
+  latency_processing_chunk["dedup_skipped_chunks"] = len(chunkId_chunkDoc_list) - len(new_chunks)
+  return new_chunks
+
+async def near_dup_chunks_batch(graph, chunkId_chunkDoc_list, latency_processing_chunk):
+  """
+  Near-duplicate stage: chunks whose MinHash similarity to an already extracted chunk reaches
+  NEAR_DUP_THRESHOLD are linked to that chunk's entities instead of being extracted.
+  Returns the chunks still to extract.
+  """
+  start_near_dup = time.time()
+  near_duplicates = await asyncio.to_thread(find_near_duplicate_chunks, chunkId_chunkDoc_list)
+  linked_chunk_ids = await asyncio.to_thread(link_entities_of_similar_chunks, graph, near_duplicates)
+  remaining_chunks = [row for row in chunkId_chunkDoc_list if row['chunk_id'] not in linked_chunk_ids]
+  elapsed_near_dup = time.time() - start_near_dup
+  logging.info(f'Near-duplicate check skipped {len(linked_chunk_ids)} of {len(chunkId_chunkDoc_list)} chunks in {elapsed_near_dup:.2f} seconds')
+  latency_processing_chunk["near_dup"] = f'{elapsed_near_dup:.2f}'
+  latency_processing_chunk["near_dup_skipped_chunks"] = len(linked_chunk_ids)
+  return remaining_chunks
+
+async def extract_chunks_batch(model, chunkId_chunkDoc_list, allowedNodes, allowedRelationship, chunks_to_combine, additional_instructions, latency_processing_chunk, bypass_cache=False):
+  """Extraction stage: gets the graph documents of one batch from the LLM, skipping the extraction cache when bypass_cache is set."""
   logging.info("Get graph document list from models")
-  
   start_entity_extraction = time.time()
-  graph_documents =  await get_graph_from_llm(model, chunkId_chunkDoc_list, allowedNodes, allowedRelationship, chunks_to_combine, additional_instructions)
+  graph_documents =  await get_graph_from_llm(model, chunkId_chunkDoc_list, allowedNodes, allowedRelationship, chunks_to_combine, additional_instructions, bypass_cache)
   end_entity_extraction = time.time()
   elapsed_entity_extraction = end_entity_extraction - start_entity_extraction
   logging.info(f'Time taken to extract enitities from LLM Graph Builder: {elapsed_entity_extraction:.2f} seconds')
   latency_processing_chunk["entity_extraction"] = f'{elapsed_entity_extraction:.2f}'
+  return graph_documents
+
+def write_chunks_batch(graph, graph_documents, chunkId_chunkDoc_list, file_name, latency_processing_chunk, count_chunk_ids=None):
+  """
+  Graph write stage: saves the graph documents of one batch and links them to their chunks.
+  With count_chunk_ids (all chunk ids of the batch window) the document counts are
+  incremented from the batch, otherwise the whole document is recounted.
+  """
   cleaned_graph_documents = handle_backticks_nodes_relationship_id_type(graph_documents)
   
   start_save_graphDocuments = time.time()
@@ -505,27 +655,68 @@ async def processing_chunks(chunkId_chunkDoc_list,graph,uri, userName, password,
   latency_processing_chunk["relationship_between_chunk_entity"] = f'{elapsed_relationship:.2f}'
   
   graphDb_data_Access = graphDBdataAccess(graph)
-  count_response = graphDb_data_Access.update_node_relationship_count(file_name)
+  start_count = time.time()
+  if count_chunk_ids is not None:
+    count_response = graphDb_data_Access.increment_node_relationship_count(file_name, count_chunk_ids)
+  else:
+    count_response = graphDb_data_Access.update_node_relationship_count(file_name)
+  latency_processing_chunk["update_node_relationship_count"] = f'{time.time() - start_count:.2f}'
   node_count = count_response[file_name].get('nodeCount',"0")
   rel_count = count_response[file_name].get('relationshipCount',"0")
-  return node_count,rel_count,latency_processing_chunk
+  return node_count,rel_count
+
+def clean_pages(pages, stats=None):
+  bad_chars = ['"', "\n", "'"]
+  if PREFILTER_ENABLED:
+    # Running headers and footers are only recognisable line by line, before newlines go.
+    pages = strip_repeated_page_lines(pages, stats)
+  for page in pages:
+    text = page.page_content
+    for j in bad_chars:
+      if j == '\n':
+        text = text.replace(j, ' ')
+      else:
+        text = text.replace(j, '')
+    yield Document(page_content=str(text), metadata=page.metadata)
+
+def peek_pages(pages):
+  """Returns (first page, pages) without consuming `pages`, which may be a generator; first page is None when empty."""
+  if pages is None:
+    return None, []
+  pages = iter(pages)
+  first_page = next(pages, None)
+  if first_page is None:
+    return None, []
+  return first_page, itertools.chain([first_page], pages)
+
+def stream_chunkId_chunkDoc_windows(graph, file_name, pages, token_chunk_size, chunk_overlap, window_size, stream_stats=None):
+  """
+  Loads, cleans and chunks `pages` lazily and writes the chunks to the graph one window
+  of `window_size` chunks at a time, yielding each window's chunkId_chunkDoc list. Only
+  the current page and window are held here, so memory does not grow with the document.
+  stream_stats['total_chunks'] is updated as windows are produced.
+  """
+  logging.info("Break down file into chunks")
+  chunks = CreateChunksofDocument(clean_pages(pages, stream_stats), graph).iter_chunks(token_chunk_size, chunk_overlap)
+  position, previous_chunk_id, offset = 1, "", 0
+  while True:
+    window = list(itertools.islice(chunks, window_size))
+    if not window:
+      break
+    chunkId_chunkDoc_list = create_relation_between_chunks(graph, file_name, window, position, previous_chunk_id, offset)
+    position += len(window)
+    previous_chunk_id = chunkId_chunkDoc_list[-1]['chunk_id']
+    offset += sum(len(chunk.page_content) for chunk in window)
+    if stream_stats is not None:
+      stream_stats['total_chunks'] = position - 1
+    yield chunkId_chunkDoc_list
 
 def get_chunkId_chunkDoc_list(graph, file_name, pages, token_chunk_size, chunk_overlap, retry_condition):
   if not retry_condition:
-    logging.info("Break down file into chunks")
-    bad_chars = ['"', "\n", "'"]
-    for i in range(0,len(pages)):
-      text = pages[i].page_content
-      for j in bad_chars:
-        if j == '\n':
-          text = text.replace(j, ' ')
-        else:
-          text = text.replace(j, '')
-      pages[i]=Document(page_content=str(text), metadata=pages[i].metadata)
-    create_chunks_obj = CreateChunksofDocument(pages, graph)
-    chunks = create_chunks_obj.split_file_into_chunks(token_chunk_size, chunk_overlap)
-    chunkId_chunkDoc_list = create_relation_between_chunks(graph,file_name,chunks)
-    return len(chunks), chunkId_chunkDoc_list
+    chunkId_chunkDoc_list = []
+    for window in stream_chunkId_chunkDoc_windows(graph, file_name, pages, token_chunk_size, chunk_overlap, int(os.environ.get('UPDATE_GRAPH_CHUNKS_PROCESSED', 20))):
+      chunkId_chunkDoc_list.extend(window)
+    return len(chunkId_chunkDoc_list), chunkId_chunkDoc_list
   
   else:  
     chunkId_chunkDoc_list=[]
@@ -540,14 +731,13 @@ def get_chunkId_chunkDoc_list(graph, file_name, pages, token_chunk_size, chunk_o
       
       if retry_condition ==  START_FROM_LAST_PROCESSED_POSITION:
         logging.info(f"Retry : start_from_last_processed_position")
-        starting_chunk = execute_graph_query(graph,QUERY_TO_GET_LAST_PROCESSED_CHUNK_POSITION, params={"filename":file_name})
-        
-        if starting_chunk and starting_chunk[0]["position"] < len(chunkId_chunkDoc_list):
-          return len(chunks), chunkId_chunkDoc_list[starting_chunk[0]["position"] - 1:]
+        # Embeddings run ahead of extraction in the chunk pipeline, so a chunk having an
+        # embedding does not mean it was extracted; resume from the written checkpoint instead.
+        checkpoint = execute_graph_query(graph,QUERY_TO_GET_PROCESSED_CHUNK_CHECKPOINT, params={"filename":file_name})
+        processed_chunk = checkpoint[0]["processed_chunk"] if checkpoint else 0
         
-        elif starting_chunk and starting_chunk[0]["position"] == len(chunkId_chunkDoc_list):
-          starting_chunk =  execute_graph_query(graph,QUERY_TO_GET_LAST_PROCESSED_CHUNK_WITHOUT_ENTITY, params={"filename":file_name})
-          return len(chunks), chunkId_chunkDoc_list[starting_chunk[0]["position"] - 1:]
+        if processed_chunk < len(chunkId_chunkDoc_list):
+          return len(chunks), chunkId_chunkDoc_list[processed_chunk:]
         
         else:
           raise LLMGraphBuilderException(f"All chunks of file {file_name} are already processed. If you want to re-process, Please start from begnning")    
@@ -570,11 +760,8 @@ def get_source_list_from_graph(uri,userName,password,db_name=None):
    sorting the list by the last updated date. 
  """
   logging.info("Get existing files list from graph")
-  graph = Neo4jGraph(url=uri, database=db_name, username=userName, password=password)
+  graph = create_graph_database_connection(uri, userName, password, db_name)
   graph_DB_dataAccess = graphDBdataAccess(graph)
-  if not graph._driver._closed:
-      logging.info(f"closing connection for sources_list api")
-      graph._driver.close()
   return graph_DB_dataAccess.get_source_list()
 
 def update_graph(graph):
@@ -714,7 +901,7 @@ def manually_cancelled_job(graph, filenames, source_types, merged_dir, uri):
       obj_source_node.updated_at = datetime.now()
       graphDb_data_Access = graphDBdataAccess(graph)
       graphDb_data_Access.update_source_node(obj_source_node)
-      count_response = graphDb_data_Access.update_node_relationship_count(file_name)
+      schedule_count_reconciliation(graph, file_name)
       obj_source_node = None
       merged_file_path = os.path.join(merged_dir, file_name)
       if source_type == 'local file' and gcs_file_cache == 'True':
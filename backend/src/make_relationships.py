@@ -1,7 +1,7 @@
 from langchain_neo4j import Neo4jGraph
 from langchain.docstore.document import Document
-from src.shared.common_fn import load_embedding_model,execute_graph_query
-from src.shared.common_fn import load_embedding_model,execute_graph_query
+from src.shared.common_fn import get_embedding_model,execute_graph_query
+from src.embedding_cache import embed_documents_with_cache
 import logging
 from typing import List
 import os
@@ -12,7 +12,62 @@ from langchain_neo4j import Neo4jVector
 logging.basicConfig(format='%(asctime)s - %(message)s',level='INFO')
 
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL')
-EMBEDDING_FUNCTION , EMBEDDING_DIMENSION = load_embedding_model(EMBEDDING_MODEL)
+CHUNK_WRITE_BATCH_BYTES = int(os.getenv('CHUNK_WRITE_BATCH_BYTES', 4 * 1024 * 1024))
+CHUNK_DEDUP_ENABLED = os.environ.get("CHUNK_DEDUP_ENABLED", "True").lower() in ("true", "1", "yes")
+ROW_OVERHEAD_BYTES = 256
+
+QUERY_TO_WRITE_CHUNK_GRAPH = """
+    MATCH (d:Document {fileName: $f_name})
+    UNWIND $batch_data AS data
+    MERGE (c:Chunk {id: data.id})
+    SET c.text = data.pg_content, c.position = data.position, c.length = data.length, c.fileName = data.f_name, c.content_offset = data.content_offset,
+        c.page_number = data.page_number, c.start_time = data.start_time, c.end_time = data.end_time
+    MERGE (c)-[:PART_OF]->(d)
+    FOREACH (_ IN CASE WHEN data.position = 1 THEN [1] ELSE [] END | MERGE (d)-[:FIRST_CHUNK]->(c))
+    WITH c, data
+    WHERE data.previous_id <> ""
+    MATCH (pc:Chunk {id: data.previous_id})
+    MERGE (pc)-[:NEXT_CHUNK]->(c)
+"""
+
+QUERY_TO_SET_CHUNK_EMBEDDING = """
+    UNWIND $data AS row
+    MATCH (c:Chunk {id: row.chunkId})
+    SET c.embedding = row.embeddings
+"""
+
+QUERY_TO_GET_EXTRACTED_CHUNK_IDS = """
+    MATCH (c:Chunk)
+    WHERE c.id IN $chunk_ids AND EXISTS { (c)-[:HAS_ENTITY]->() }
+    RETURN c.id AS id
+"""
+
+def get_extracted_chunk_ids(graph, chunk_ids):
+    """Returns the ids among `chunk_ids` of chunks that already have extracted entities."""
+    if not chunk_ids:
+        return set()
+    result = execute_graph_query(graph, QUERY_TO_GET_EXTRACTED_CHUNK_IDS, params={"chunk_ids": list(chunk_ids)})
+    return {row['id'] for row in result}
+
+QUERY_TO_LINK_ENTITIES_OF_SIMILAR_CHUNKS = """
+    UNWIND $pairs AS pair
+    MATCH (c:Chunk {id: pair.chunk_id}), (source:Chunk {id: pair.source_id})-[:HAS_ENTITY]->(e)
+    MERGE (c)-[:HAS_ENTITY]->(e)
+    SET c.near_duplicate_of = pair.source_id, c.near_duplicate_similarity = pair.similarity
+    RETURN DISTINCT c.id AS id
+"""
+
+def link_entities_of_similar_chunks(graph, near_duplicates):
+    """
+    Links each chunk in `near_duplicates` ({chunk_id: (source_chunk_id, similarity)}) to
+    the entities of its near-duplicate source chunk. Returns the ids of the linked chunks;
+    chunks whose source is missing or has no entities are not linked.
+    """
+    if not near_duplicates:
+        return set()
+    pairs = [{"chunk_id": chunk_id, "source_id": source_id, "similarity": similarity} for chunk_id, (source_id, similarity) in near_duplicates.items()]
+    result = execute_graph_query(graph, QUERY_TO_LINK_ENTITIES_OF_SIMILAR_CHUNKS, params={"pairs": pairs})
+    return {row['id'] for row in result}
 
 def merge_relationship_between_chunk_and_entites(graph: Neo4jGraph, graph_documents_chunk_chunk_Id : list):
     batch_data = []
@@ -35,54 +90,48 @@ def merge_relationship_between_chunk_and_entites(graph: Neo4jGraph, graph_docume
                     MERGE (c)-[:HAS_ENTITY]->(n)
                 """
         execute_graph_query(graph,unwind_query, params={"batch_data": batch_data})
-        execute_graph_query(graph,unwind_query, params={"batch_data": batch_data})
 
     
 def create_chunk_embeddings(graph, chunkId_chunkDoc_list, file_name):
     isEmbedding = os.getenv('IS_EMBEDDING')
     
-    embeddings, dimension = EMBEDDING_FUNCTION , EMBEDDING_DIMENSION
+    embeddings, dimension = get_embedding_model(EMBEDDING_MODEL)
     logging.info(f'embedding model:{embeddings} and dimesion:{dimension}')
     data_for_query = []
     logging.info(f"update embedding and vector index for chunks")
-    for row in chunkId_chunkDoc_list:
-        if isEmbedding.upper() == "TRUE":
-            embeddings_arr = embeddings.embed_query(row['chunk_doc'].page_content)
-                                    
-            data_for_query.append({
-                "chunkId": row['chunk_id'],
-                "embeddings": embeddings_arr
-            })
+    if isEmbedding.upper() == "TRUE":
+        start_time = time.time()
+        embeddings_arr = embed_documents_with_cache(embeddings, dimension, [row['chunk_doc'].page_content for row in chunkId_chunkDoc_list], [row['chunk_id'] for row in chunkId_chunkDoc_list])
+        data_for_query = [{"chunkId": row['chunk_id'], "embeddings": embedding} for row, embedding in zip(chunkId_chunkDoc_list, embeddings_arr)]
+        elapsed_time = time.time() - start_time
+        if elapsed_time > 0:
+            logging.info(f"Embedded {len(data_for_query)} chunks in {elapsed_time:.2f} seconds ({len(data_for_query)/elapsed_time:.1f} chunks/s)")
     
-    query_to_create_embedding = """
-        UNWIND $data AS row
-        MATCH (d:Document {fileName: $fileName})
-        MERGE (c:Chunk {id: row.chunkId})
-        SET c.embedding = row.embeddings
-        MERGE (c)-[:PART_OF]->(d)
-    """       
-    execute_graph_query(graph,query_to_create_embedding, params={"fileName":file_name, "data":data_for_query})
-    execute_graph_query(graph,query_to_create_embedding, params={"fileName":file_name, "data":data_for_query})
+    if data_for_query:
+        rows_written, elapsed = write_in_byte_batches(graph, QUERY_TO_SET_CHUNK_EMBEDDING, "data", data_for_query, lambda row: 8 * len(row["embeddings"]))
+        logging.info(f"Chunk embeddings for {file_name}: {rows_written} rows written in {elapsed:.2f} seconds")
     
-def create_relation_between_chunks(graph, file_name, chunks: List[Document])->list:
+def create_relation_between_chunks(graph, file_name, chunks: List[Document], start_position=1, previous_chunk_id="", start_offset=0)->list:
+    """
+    Creates the chunk nodes and their relationships. When a document is written in
+    windows, start_position, previous_chunk_id and start_offset continue the chain
+    from the last chunk of the previous window.
+    """
     logging.info("creating FIRST_CHUNK and NEXT_CHUNK relationships between chunks")
-    current_chunk_id = ""
+    current_chunk_id = previous_chunk_id
     lst_chunks_including_hash = []
     batch_data = []
-    relationships = []
-    offset=0
+    offset=start_offset
     for i, chunk in enumerate(chunks):
         page_content_sha1 = hashlib.sha1(chunk.page_content.encode())
         previous_chunk_id = current_chunk_id
         current_chunk_id = page_content_sha1.hexdigest()
-        position = i + 1 
+        position = start_position + i
         if i>0:
             offset += len(chunks[i-1].page_content)
-        if i == 0:
-            firstChunk = True
-        else:
-            firstChunk = False  
-        metadata = {"position": position,"length": len(chunk.page_content), "content_offset":offset}
+        # Chunkers that know the exact offset provide it; summing lengths is only right without overlap.
+        content_offset = chunk.metadata.get('content_offset', offset)
+        metadata = {"position": position,"length": len(chunk.page_content), "content_offset":content_offset}
         chunk_document = Document(
             page_content=chunk.page_content, metadata=metadata
         )
@@ -94,7 +143,7 @@ def create_relation_between_chunks(graph, file_name, chunks: List[Document])->li
             "length": chunk_document.metadata["length"],
             "f_name": file_name,
             "previous_id" : previous_chunk_id,
-            "content_offset" : offset
+            "content_offset" : content_offset
         }
         
         if 'page_number' in chunk.metadata:
@@ -107,66 +156,59 @@ def create_relation_between_chunks(graph, file_name, chunks: List[Document])->li
         batch_data.append(chunk_data)
         
         lst_chunks_including_hash.append({'chunk_id': current_chunk_id, 'chunk_doc': chunk})
-        
-        # create relationships between chunks
-        if firstChunk:
-            relationships.append({"type": "FIRST_CHUNK", "chunk_id": current_chunk_id})
-        else:
-            relationships.append({
-                "type": "NEXT_CHUNK",
-                "previous_chunk_id": previous_chunk_id,  # ID of previous chunk
-                "current_chunk_id": current_chunk_id
-            })
           
-    query_to_create_chunk_and_PART_OF_relation = """
-        UNWIND $batch_data AS data
-        MERGE (c:Chunk {id: data.id})
-        SET c.text = data.pg_content, c.position = data.position, c.length = data.length, c.fileName=data.f_name, c.content_offset=data.content_offset
-        WITH data, c
-        SET c.page_number = CASE WHEN data.page_number IS NOT NULL THEN data.page_number END,
-            c.start_time = CASE WHEN data.start_time IS NOT NULL THEN data.start_time END,
-            c.end_time = CASE WHEN data.end_time IS NOT NULL THEN data.end_time END
-        WITH data, c
-        MATCH (d:Document {fileName: data.f_name})
-        MERGE (c)-[:PART_OF]->(d)
-    """
-    execute_graph_query(graph,query_to_create_chunk_and_PART_OF_relation, params={"batch_data": batch_data})
-    execute_graph_query(graph,query_to_create_chunk_and_PART_OF_relation, params={"batch_data": batch_data})
-    
-    query_to_create_FIRST_relation = """ 
-        UNWIND $relationships AS relationship
-        MATCH (d:Document {fileName: $f_name})
-        MATCH (c:Chunk {id: relationship.chunk_id})
-        FOREACH(r IN CASE WHEN relationship.type = 'FIRST_CHUNK' THEN [1] ELSE [] END |
-                MERGE (d)-[:FIRST_CHUNK]->(c))
-        """
-    execute_graph_query(graph,query_to_create_FIRST_relation, params={"f_name": file_name, "relationships": relationships})
-    execute_graph_query(graph,query_to_create_FIRST_relation, params={"f_name": file_name, "relationships": relationships})
-    
-    query_to_create_NEXT_CHUNK_relation = """ 
-        UNWIND $relationships AS relationship
-        MATCH (c:Chunk {id: relationship.current_chunk_id})
-        WITH c, relationship
-        MATCH (pc:Chunk {id: relationship.previous_chunk_id})
-        FOREACH(r IN CASE WHEN relationship.type = 'NEXT_CHUNK' THEN [1] ELSE [] END |
-                MERGE (c)<-[:NEXT_CHUNK]-(pc))
-        """  
-    execute_graph_query(graph,query_to_create_NEXT_CHUNK_relation, params={"relationships": relationships})
+    rows_written, elapsed = write_chunk_graph(graph, file_name, batch_data)
+    logging.info(f"Chunk graph for {file_name}: {rows_written} chunks written in {elapsed:.2f} seconds")
     return lst_chunks_including_hash
 
 
+def write_in_byte_batches(graph, query, param_name, rows, row_size, params=None):
+    """
+    Runs `query` with `rows` passed as `param_name`, split into payloads of about
+    CHUNK_WRITE_BATCH_BYTES each; every payload is written in one transaction.
+    Returns the number of rows written and the elapsed seconds.
+    """
+    start_time = time.time()
+    batch, batch_bytes = [], 0
+    for row in rows:
+        size = row_size(row) + ROW_OVERHEAD_BYTES
+        if batch and batch_bytes + size > CHUNK_WRITE_BATCH_BYTES:
+            execute_graph_query(graph, query, params={**(params or {}), param_name: batch})
+            batch, batch_bytes = [], 0
+        batch.append(row)
+        batch_bytes += size
+    if batch:
+        execute_graph_query(graph, query, params={**(params or {}), param_name: batch})
+    return len(rows), time.time() - start_time
+
+
+def write_chunk_graph(graph, file_name, batch_data):
+    """
+    Writes the chunks of a document with their PART_OF, FIRST_CHUNK and NEXT_CHUNK
+    relationships in one query per byte batch. Embeddings are not part of this write:
+    create_chunk_embeddings sets them in a separate transaction per extraction batch,
+    after exact duplicate chunks are dropped and before the near-duplicate check.
+    Rows must be in position order so the previous chunk of each row already exists
+    when NEXT_CHUNK is merged.
+    """
+    return write_in_byte_batches(graph, QUERY_TO_WRITE_CHUNK_GRAPH, "batch_data", batch_data,
+                                 lambda row: len(row["pg_content"].encode()),
+                                 params={"f_name": file_name})
+
+
 def create_chunk_vector_index(graph):
     start_time = time.time()
     try:
         vector_index_query = "SHOW INDEXES YIELD name, type, labelsOrTypes, properties WHERE name = 'vector' AND type = 'VECTOR' AND 'Chunk' IN labelsOrTypes AND 'embedding' IN properties RETURN name"
         vector_index = execute_graph_query(graph,vector_index_query)
         if not vector_index:
-            vector_store = Neo4jVector(embedding=EMBEDDING_FUNCTION,
+            embeddings, dimension = get_embedding_model(EMBEDDING_MODEL)
+            vector_store = Neo4jVector(embedding=embeddings,
                                     graph=graph,
                                     node_label="Chunk", 
                                     embedding_node_property="embedding",
                                     index_name="vector",
-                                    embedding_dimension=EMBEDDING_DIMENSION
+                                    embedding_dimension=dimension
                                     )
             vector_store.create_new_index()
             logging.info(f"Index created successfully. Time taken: {time.time() - start_time:.2f} seconds")
@@ -0,0 +1,162 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+import numpy as np
+
+NEAR_DUP_ENABLED = os.environ.get("NEAR_DUP_ENABLED", "False").lower() in ("true", "1", "yes")
+NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', 0.9))
+NEAR_DUP_INDEX_PATH = os.getenv('NEAR_DUP_INDEX_PATH') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'near_duplicate_index.db')
+NEAR_DUP_NUM_PERM = int(os.getenv('NEAR_DUP_NUM_PERM', 128))
+NEAR_DUP_BANDS = int(os.getenv('NEAR_DUP_BANDS', 32))
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_PATTERN = re.compile(r"\w+")
+_DIGIT_PATTERN = re.compile(r"\d")
+
+
+def get_shingles(text):
+    """
+    Word 3-gram shingles of the text, lowercased and with digits folded to 0 so chunks that
+    differ only in whitespace, punctuation, page numbers or dates share their shingles.
+    """
+    words = _WORD_PATTERN.findall(_DIGIT_PATTERN.sub("0", text.lower()))
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures of chunk texts with an LSH band index, persisted in a local SQLite
+    file. Signatures have `num_perm` values split into `bands` bands; chunks sharing any band
+    are candidates, and the estimated Jaccard similarity of their signatures decides a match.
+    """
+
+    def __init__(self, path, num_perm=NEAR_DUP_NUM_PERM, bands=NEAR_DUP_BANDS):
+        if num_perm % bands:
+            raise ValueError(f"NEAR_DUP_NUM_PERM ({num_perm}) must be a multiple of NEAR_DUP_BANDS ({bands})")
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        generator = np.random.RandomState(1)
+        self._a = generator.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self._b = generator.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS signatures (chunk_id TEXT PRIMARY KEY, signature BLOB NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS bands (band_key TEXT NOT NULL, chunk_id TEXT NOT NULL, PRIMARY KEY (band_key, chunk_id))")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def signature(self, text):
+        shingles = get_shingles(text)
+        if not shingles:
+            return None
+        hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        # (a * x + b) mod p stays below 2**64 because a, b < 2**31 and x < 2**32.
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature):
+        return [f"{band}:{signature[band * self.rows:(band + 1) * self.rows].tobytes().hex()}" for band in range(self.bands)]
+
+    def add_many(self, chunks):
+        """Indexes (chunk_id, text) pairs; ids already in the index are left unchanged."""
+        signature_rows = []
+        band_rows = []
+        for chunk_id, text in chunks:
+            signature = self.signature(text)
+            if signature is None:
+                continue
+            signature_rows.append((chunk_id, signature.tobytes()))
+            band_rows.extend((band_key, chunk_id) for band_key in self.band_keys(signature))
+        if not signature_rows:
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.executemany("INSERT OR IGNORE INTO signatures (chunk_id, signature) VALUES (?, ?)", signature_rows)
+            conn.executemany("INSERT OR IGNORE INTO bands (band_key, chunk_id) VALUES (?, ?)", band_rows)
+            conn.execute("COMMIT")
+
+    def find_near_duplicates(self, chunks, threshold):
+        """
+        Returns {chunk_id: (matched_chunk_id, similarity)} for the (chunk_id, text) pairs whose
+        best indexed match, other than the chunk itself, reaches `threshold`.
+        """
+        matches = {}
+        with self._lock, self._connect() as conn:
+            for chunk_id, text in chunks:
+                signature = self.signature(text)
+                if signature is None:
+                    continue
+                band_keys = self.band_keys(signature)
+                placeholders = ",".join("?" * len(band_keys))
+                rows = conn.execute(f"""SELECT s.chunk_id, s.signature FROM signatures s
+                                        WHERE s.chunk_id IN (SELECT chunk_id FROM bands WHERE band_key IN ({placeholders}))
+                                        AND s.chunk_id <> ?""", [*band_keys, chunk_id]).fetchall()
+                best = None
+                for candidate_id, candidate_signature in rows:
+                    similarity = float(np.mean(np.frombuffer(candidate_signature, dtype=np.uint32) == signature))
+                    if similarity >= threshold and (best is None or similarity > best[1]):
+                        best = (candidate_id, similarity)
+                if best:
+                    matches[chunk_id] = best
+        return matches
+
+    def stats(self):
+        with self._connect() as conn:
+            indexed = conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+        return {'indexed_chunks': indexed, 'num_perm': self.num_perm, 'bands': self.bands}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex(NEAR_DUP_INDEX_PATH)
+        return _index
+
+
+def index_chunks(chunkId_chunkDoc_list):
+    """Adds extracted chunks to the near-duplicate index; failures only disable the lookup."""
+    try:
+        get_near_duplicate_index().add_many([(row['chunk_id'], row['chunk_doc'].page_content) for row in chunkId_chunkDoc_list])
+    except Exception as e:
+        logging.warning(f"Failed to update near-duplicate index: {e}")
+
+
+def find_near_duplicate_chunks(chunkId_chunkDoc_list, threshold=None):
+    try:
+        return get_near_duplicate_index().find_near_duplicates([(row['chunk_id'], row['chunk_doc'].page_content) for row in chunkId_chunkDoc_list],
+                                                               NEAR_DUP_THRESHOLD if threshold is None else threshold)
+    except Exception as e:
+        logging.warning(f"Near-duplicate lookup failed, extracting all chunks: {e}")
+        return {}
+
+
+def get_near_duplicate_stats():
+    if not NEAR_DUP_ENABLED:
+        return {'enabled': False}
+    stats = get_near_duplicate_index().stats()
+    stats['enabled'] = True
+    stats['threshold'] = NEAR_DUP_THRESHOLD
+    return stats
@@ -3,14 +3,16 @@ import logging
 import time
 from langchain_neo4j import Neo4jGraph
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from src.graph_query import get_graphDB_driver
-from src.shared.common_fn import load_embedding_model,execute_graph_query
+from src.shared.common_fn import get_embedding_model,execute_graph_query
+from src.embedding_cache import embed_documents_with_cache
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from src.shared.constants import GRAPH_CLEANUP_PROMPT
 from src.llm import get_llm
 from src.graphDB_dataAccess import graphDBdataAccess
-import time 
 
 DROP_INDEX_QUERY = "DROP INDEX entities IF EXISTS;"
 LABELS_QUERY = "CALL db.labels()"
@@ -27,6 +29,23 @@ CHUNK_VECTOR_INDEX_NAME = "vector"
 CHUNK_VECTOR_EMBEDDING_DIMENSION = 384
 
 DROP_CHUNK_VECTOR_INDEX_QUERY = f"DROP INDEX {CHUNK_VECTOR_INDEX_NAME} IF EXISTS;"
+
+ENTITY_EMBEDDING_PAGE_SIZE = int(os.getenv('ENTITY_EMBEDDING_PAGE_SIZE', 1000))
+ENTITY_EMBEDDING_WORKERS = int(os.getenv('ENTITY_EMBEDDING_WORKERS', 2))
+ENTITY_EMBEDDING_WRITE_BATCH = int(os.getenv('ENTITY_EMBEDDING_WRITE_BATCH', 500))
+ENTITY_EMBEDDING_FILTER = "NOT (e:Chunk OR e:Document OR e:`__Community__`) AND e.embedding IS NULL AND e.id IS NOT NULL"
+GET_ENTITIES_FOR_EMBEDDING_QUERY = f"MATCH (e) WHERE {ENTITY_EMBEDDING_FILTER} RETURN elementId(e) AS elementId"
+FETCH_ENTITIES_FOR_EMBEDDING_QUERY = """
+UNWIND $elementIds AS elementId
+MATCH (e) WHERE elementId(e) = elementId
+RETURN elementId, e.id + " " + coalesce(e.description, "") AS text
+"""
+SET_ENTITY_EMBEDDING_QUERY = """
+UNWIND $rows AS row
+MATCH (e) WHERE elementId(e) = row.elementId
+CALL db.create.setNodeVectorProperty(e, "embedding", row.embedding)
+"""
+_entity_embedding_progress = {'status': 'not started', 'total': 0, 'embedded': 0}
 CREATE_CHUNK_VECTOR_INDEX_QUERY = """
 CREATE VECTOR INDEX {index_name} IF NOT EXISTS FOR (c:Chunk) ON c.embedding
 OPTIONS {{
@@ -132,7 +151,7 @@ def create_fulltext(driver,type):
 def create_vector_fulltext_indexes(uri, username, password, database):
     types = ["entities", "hybrid"]
     embedding_model = os.getenv('EMBEDDING_MODEL')
-    embeddings, dimension = load_embedding_model(embedding_model)
+    embeddings, dimension = get_embedding_model(embedding_model)
     if not dimension:
         dimension = CHUNK_VECTOR_EMBEDDING_DIMENSION
     logging.info("Starting the process of creating full-text indexes.")
@@ -160,41 +179,70 @@ def create_vector_fulltext_indexes(uri, username, password, database):
     except Exception as e:
         logging.error(f"Failed to create vector index for '{CHUNK_VECTOR_INDEX_NAME}': {e}")
 
-    try:
-        driver.close()
-        logging.info("Driver closed successfully.")
-    except Exception as e:
-        logging.error(f"Error closing the driver: {e}")
-
     logging.info("Full-text and vector index creation process completed.")
 
 
 def create_entity_embedding(graph:Neo4jGraph):
-    rows = fetch_entities_for_embedding(graph)
-    for i in range(0, len(rows), 1000):
-        update_embeddings(rows[i:i+1000],graph)
-            
-def fetch_entities_for_embedding(graph):
-    query = """
-                MATCH (e)
-                WHERE NOT (e:Chunk OR e:Document OR e:`__Community__`) AND e.embedding IS NULL AND e.id IS NOT NULL
-                RETURN elementId(e) AS elementId, e.id + " " + coalesce(e.description, "") AS text
-                """ 
-    result = execute_graph_query(graph,query)        
-    return [{"elementId": record["elementId"], "text": record["text"]} for record in result]
+    """
+    Embeds every entity without an embedding. Their element ids are collected in one scan
+    and their texts are read in pages of ENTITY_EMBEDDING_PAGE_SIZE by element id lookup,
+    so no page rescans the graph. Up to ENTITY_EMBEDDING_WORKERS pages are embedded
+    concurrently while earlier pages are written back in transactions of
+    ENTITY_EMBEDDING_WRITE_BATCH rows. Only entities with a NULL embedding are read, so an
+    interrupted run resumes where it stopped when started again. Memory is O(entities):
+    the collected list holds one element id string per entity to embed (about 100 bytes
+    each), while the texts and embeddings are only held for the pages in flight.
+    """
+    embeddings, dimension = get_embedding_model(os.getenv('EMBEDDING_MODEL'))
+    start_time = time.time()
+    element_ids = [record['elementId'] for record in execute_graph_query(graph, GET_ENTITIES_FOR_EMBEDDING_QUERY)]
+    _entity_embedding_progress.update({'status': 'running', 'total': len(element_ids), 'embedded': 0, 'elapsed': 0})
+    logging.info(f"Creating embeddings for {len(element_ids)} entities")
+    try:
+        with ThreadPoolExecutor(max_workers=ENTITY_EMBEDDING_WORKERS) as executor:
+            in_flight = deque()
+            for rows in fetch_entities_for_embedding(graph, element_ids):
+                in_flight.append(executor.submit(embed_entity_rows, embeddings, dimension, rows))
+                if len(in_flight) >= ENTITY_EMBEDDING_WORKERS:
+                    write_entity_embeddings(graph, in_flight.popleft().result(), start_time)
+            while in_flight:
+                write_entity_embeddings(graph, in_flight.popleft().result(), start_time)
+    except Exception:
+        _entity_embedding_progress['status'] = 'failed'
+        raise
+    _entity_embedding_progress['status'] = 'completed'
+    logging.info(f"Created embeddings for {_entity_embedding_progress['embedded']} entities in {time.time() - start_time:.2f} seconds")
+
+def fetch_entities_for_embedding(graph, element_ids, page_size=None):
+    """Yields the {elementId, text} rows of `element_ids` in pages; entities deleted meanwhile are left out."""
+    page_size = page_size or ENTITY_EMBEDDING_PAGE_SIZE
+    for i in range(0, len(element_ids), page_size):
+        result = execute_graph_query(graph, FETCH_ENTITIES_FOR_EMBEDDING_QUERY, params={'elementIds': element_ids[i:i + page_size]})
+        rows = [{"elementId": record["elementId"], "text": record["text"]} for record in result]
+        if rows:
+            yield rows
+
+def embed_entity_rows(embeddings, dimension, rows):
+    for row, embedding in zip(rows, embed_documents_with_cache(embeddings, dimension, [row['text'] for row in rows])):
+        row['embedding'] = embedding
+    return rows
+
+def write_entity_embeddings(graph, rows, start_time=None):
+    for i in range(0, len(rows), ENTITY_EMBEDDING_WRITE_BATCH):
+        execute_graph_query(graph, SET_ENTITY_EMBEDDING_QUERY, params={'rows': rows[i:i + ENTITY_EMBEDDING_WRITE_BATCH]})
+    _entity_embedding_progress['embedded'] += len(rows)
+    if start_time is not None:
+        _entity_embedding_progress['elapsed'] = round(time.time() - start_time, 2)
+    logging.info(f"Entity embeddings: {_entity_embedding_progress['embedded']}/{_entity_embedding_progress['total']} written")
 
 def update_embeddings(rows, graph):
     embedding_model = os.getenv('EMBEDDING_MODEL')
-    embeddings, dimension = load_embedding_model(embedding_model)
+    embeddings, dimension = get_embedding_model(embedding_model)
     logging.info(f"update embedding for entities")
-    for row in rows:
-        row['embedding'] = embeddings.embed_query(row['text'])                        
-    query = """
-      UNWIND $rows AS row
-      MATCH (e) WHERE elementId(e) = row.elementId
-      CALL db.create.setNodeVectorProperty(e, "embedding", row.embedding)
-      """  
-    return execute_graph_query(graph,query,params={'rows':rows})          
+    return write_entity_embeddings(graph, embed_entity_rows(embeddings, dimension, rows))
+
+def get_entity_embedding_progress():
+    return dict(_entity_embedding_progress)
 
 def graph_schema_consolidation(graph):
     graphDb_data_Access = graphDBdataAccess(graph)
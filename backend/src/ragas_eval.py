@@ -6,19 +6,25 @@ from datasets import Dataset
 from dotenv import load_dotenv
 from ragas import evaluate
 from ragas.metrics import answer_relevancy, faithfulness,context_entity_recall
-from src.shared.common_fn import load_embedding_model 
+from src.shared.common_fn import get_embedding_model
 from ragas.dataset_schema import SingleTurnSample
 from ragas.metrics import RougeScore, SemanticSimilarity, ContextEntityRecall
 from ragas.llms import LangchainLLMWrapper
 from ragas.embeddings import LangchainEmbeddingsWrapper
-import nltk
+from functools import lru_cache
 
-nltk.download('punkt')
 load_dotenv()
 
 EMBEDDING_MODEL = os.getenv("RAGAS_EMBEDDING_MODEL")
-logging.info(f"Loading embedding model '{EMBEDDING_MODEL}' for ragas evaluation")
-EMBEDDING_FUNCTION, _ = load_embedding_model(EMBEDDING_MODEL)
+
+@lru_cache(maxsize=None)
+def get_ragas_embeddings():
+    """Loads the evaluation embedding model and the nltk tokenizer data on the first evaluation."""
+    import nltk
+    nltk.download('punkt')
+    logging.info(f"Loading embedding model '{EMBEDDING_MODEL}' for ragas evaluation")
+    embeddings, _ = get_embedding_model(EMBEDDING_MODEL)
+    return embeddings
 
 def get_ragas_metrics(question: str, context: list, answer: list, model: str):
     """Calculates RAGAS metrics."""
@@ -43,7 +49,7 @@ def get_ragas_metrics(question: str, context: list, answer: list, model: str):
             dataset=dataset,
             metrics=[faithfulness, answer_relevancy,context_entity_recall],
             llm=llm,
-            embeddings=EMBEDDING_FUNCTION,
+            embeddings=get_ragas_embeddings(),
         )
         
         score_dict = (
@@ -72,7 +78,7 @@ async def get_additional_metrics(question: str, contexts: list, answers: list, r
        if ("diffbot" in model_name) or ("ollama" in model_name):
            raise ValueError(f"Unsupported model for evaluation: {model_name}")
        llm, model_name = get_llm(model=model_name)
-       embeddings = EMBEDDING_FUNCTION
+       embeddings = get_ragas_embeddings()
        embedding_model = LangchainEmbeddingsWrapper(embeddings=embeddings)
        rouge_scorer = RougeScore()
        semantic_scorer = SemanticSimilarity()
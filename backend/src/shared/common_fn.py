@@ -1,9 +1,6 @@
 import hashlib
 import logging
 from src.document_sources.youtube import create_youtube_url
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_google_vertexai import VertexAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
 from langchain_neo4j import Neo4jGraph
 from neo4j.exceptions import TransientError
 from langchain_community.graphs.graph_document import GraphDocument
@@ -11,10 +8,11 @@ from typing import List
 import re
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from urllib.parse import urlparse
-import boto3
-from langchain_community.embeddings import BedrockEmbeddings
+from src.shared.driver_registry import DriverRegistry, driver_registry, get_database_key, get_pool_config
+from src.shared.embedding_registry import embedding_registry
 
 def check_url_source(source_type, yt_url:str=None, wiki_query:str=None):
     language=''
@@ -61,20 +59,28 @@ def get_chunk_and_graphDocument(graph_document_list, chunkId_chunkDoc_list):
   return lst_chunk_chunkId_document  
                  
 def create_graph_database_connection(uri, userName, password, database):
-  enable_user_agent = os.environ.get("ENABLE_USER_AGENT", "False").lower() in ("true", "1", "yes")
-  if enable_user_agent:
-    graph = Neo4jGraph(url=uri, database=database, username=userName, password=password, refresh_schema=False, sanitize=True,driver_config={'user_agent':os.environ.get('NEO4J_USER_AGENT')})  
-  else:
-    graph = Neo4jGraph(url=uri, database=database, username=userName, password=password, refresh_schema=False, sanitize=True)    
-  return graph
+  """Returns the shared Neo4jGraph for these credentials from the driver registry; callers must not close it."""
+  def connect():
+    driver_config = get_pool_config()
+    enable_user_agent = os.environ.get("ENABLE_USER_AGENT", "False").lower() in ("true", "1", "yes")
+    if enable_user_agent:
+      driver_config['user_agent'] = os.environ.get('NEO4J_USER_AGENT')
+    graph = Neo4jGraph(url=uri, database=database, username=userName, password=password, refresh_schema=False, sanitize=True, driver_config=driver_config)
+    # Identifies the database for status updates published on the status bus.
+    graph.status_key = get_database_key(uri, database)
+    return graph
+  return driver_registry.get(DriverRegistry.make_key('graph', uri, userName, password, database), connect)
 
 
 def load_embedding_model(embedding_model_name: str):
+    # Provider packages are imported on first use; see get_embedding_model for a shared instance.
     if embedding_model_name == "openai":
+        from langchain_openai import OpenAIEmbeddings
         embeddings = OpenAIEmbeddings()
         dimension = 1536
         logging.info(f"Embedding: Using OpenAI Embeddings , Dimension:{dimension}")
     elif embedding_model_name == "vertexai":        
+        from langchain_google_vertexai import VertexAIEmbeddings
         embeddings = VertexAIEmbeddings(
             model="textembedding-gecko@003"
         )
@@ -85,6 +91,7 @@ def load_embedding_model(embedding_model_name: str):
         dimension = 1536
         logging.info(f"Embedding: Using bedrock titan Embeddings , Dimension:{dimension}")
     else:
+        from langchain_huggingface import HuggingFaceEmbeddings
         embeddings = HuggingFaceEmbeddings(
             model_name="all-MiniLM-L6-v2"#, cache_folder="/embedding_model"
         )
@@ -92,6 +99,29 @@ def load_embedding_model(embedding_model_name: str):
         logging.info(f"Embedding: Using Langchain HuggingFaceEmbeddings , Dimension:{dimension}")
     return embeddings, dimension
 
+def get_embedding_model(embedding_model_name: str):
+    """Returns the process-wide shared (embeddings, dimension) for the model, loading it on first use."""
+    return embedding_registry.get(embedding_model_name, load_embedding_model)
+
+def preload_embedding_models(embedding_model_names):
+    embedding_registry.preload(embedding_model_names, load_embedding_model)
+
+def embed_documents_batched(embeddings, texts: List[str], batch_size=None, max_workers=None):
+    """
+    Embeds texts with `embed_documents` in batches of EMBEDDING_BATCH_SIZE, keeping input order.
+    The local HuggingFace model encodes each batch vectorized in turn; remote providers are
+    I/O bound, so their batches are sent concurrently on EMBEDDING_CONCURRENCY threads.
+    """
+    batch_size = batch_size or int(os.getenv('EMBEDDING_BATCH_SIZE', 64))
+    max_workers = max_workers or int(os.getenv('EMBEDDING_CONCURRENCY', 4))
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if type(embeddings).__name__ == "HuggingFaceEmbeddings" or len(batches) <= 1 or max_workers <= 1:
+        vectors = [embeddings.embed_documents(batch) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            vectors = list(executor.map(embeddings.embed_documents, batches))
+    return [vector for batch_vectors in vectors for vector in batch_vectors]
+
 def save_graphDocuments_in_neo4j(graph: Neo4jGraph, graph_document_list: List[GraphDocument], max_retries=3, delay=1):
    retries = 0
    while retries < max_retries:
@@ -189,6 +219,8 @@ def get_bedrock_embeddings():
                "Environment variable 'BEDROCK_EMBEDDING_MODEL' is improperly formatted. "
                "Expected format: 'model_name,aws_access_key,aws_secret_key,region_name'."
            )
+       import boto3
+       from langchain_community.embeddings import BedrockEmbeddings
        bedrock_client = boto3.client(
                service_name="bedrock-runtime",
                region_name=region_name.strip(),
@@ -246,6 +246,63 @@ RETURN
   COALESCE(entityEntityRelCount, 0) AS entityEntityRelCount
 """
 
+# Counts what one written batch of chunks added to its document: the batch chunks with their
+# PART_OF, incoming NEXT_CHUNK and HAS_ENTITY relationships, the entities no other chunk of
+# the document mentions, and the relationships touching those entities. Relationships added
+# between entities the document already had are left to the reconciliation recount.
+NODEREL_COUNT_INCREMENT_QUERY = """
+MATCH (d:Document {fileName: $document_name})
+CALL (d) {
+  UNWIND $chunk_ids AS chunk_id
+  MATCH (c:Chunk {id: chunk_id})-[:PART_OF]->(d)
+  WITH DISTINCT c
+  RETURN count(c) AS chunkNodeDelta,
+         sum(1 + COUNT { (:Chunk)-[:NEXT_CHUNK]->(c) } + COUNT { (c)-[:HAS_ENTITY]->(:__Entity__) }) AS chunkRelDelta,
+         collect(c.id) AS batchChunkIds
+}
+CALL (d, batchChunkIds) {
+  UNWIND batchChunkIds AS chunk_id
+  MATCH (:Chunk {id: chunk_id})-[:HAS_ENTITY]->(e:__Entity__)
+  WITH DISTINCT e
+  WHERE NOT EXISTS { (e)<-[:HAS_ENTITY]-(other:Chunk)-[:PART_OF]->(d) WHERE NOT other.id IN batchChunkIds }
+  RETURN collect(e) AS newEntities
+}
+CALL (d, newEntities) {
+  UNWIND newEntities AS e
+  MATCH (e)-[r]-(e2:__Entity__)
+  WHERE e2 IN newEntities OR EXISTS { (e2)<-[:HAS_ENTITY]-(:Chunk)-[:PART_OF]->(d) }
+  RETURN count(DISTINCT r) AS entityEntityRelDelta
+}
+WITH d,
+  coalesce(d.chunkNodeCount, 0) + chunkNodeDelta AS chunkNodeCount,
+  coalesce(d.chunkRelCount, 0) + coalesce(chunkRelDelta, 0) AS chunkRelCount,
+  coalesce(d.entityNodeCount, 0) + size(newEntities) AS entityNodeCount,
+  coalesce(d.entityEntityRelCount, 0) + entityEntityRelDelta AS entityEntityRelCount,
+  coalesce(d.communityNodeCount, 0) AS communityNodeCount,
+  coalesce(d.communityRelCount, 0) AS communityRelCount
+SET d.chunkNodeCount = chunkNodeCount,
+    d.chunkRelCount = chunkRelCount,
+    d.entityNodeCount = entityNodeCount,
+    d.entityEntityRelCount = entityEntityRelCount,
+    d.nodeCount = chunkNodeCount + entityNodeCount + communityNodeCount,
+    d.relationshipCount = chunkRelCount + entityEntityRelCount + communityRelCount
+RETURN d.fileName AS filename, chunkNodeCount, chunkRelCount, entityNodeCount, entityEntityRelCount,
+  communityNodeCount, communityRelCount, d.nodeCount AS nodeCount, d.relationshipCount AS relationshipCount
+"""
+
+NODEREL_COUNT_STORED_QUERY = """
+MATCH (d:Document {fileName: $document_name})
+RETURN d.fileName AS filename,
+  coalesce(d.chunkNodeCount, 0) AS chunkNodeCount,
+  coalesce(d.chunkRelCount, 0) AS chunkRelCount,
+  coalesce(d.entityNodeCount, 0) AS entityNodeCount,
+  coalesce(d.entityEntityRelCount, 0) AS entityEntityRelCount,
+  coalesce(d.communityNodeCount, 0) AS communityNodeCount,
+  coalesce(d.communityRelCount, 0) AS communityRelCount,
+  coalesce(d.nodeCount, 0) AS nodeCount,
+  coalesce(d.relationshipCount, 0) AS relationshipCount
+"""
+
 
 ## CHAT SETUP
 CHAT_MAX_TOKENS = 1000
@@ -792,6 +849,7 @@ QUERY_TO_GET_CHUNKS = """
             WITH d
             OPTIONAL MATCH (d)<-[:PART_OF|FIRST_CHUNK]-(c:Chunk)
             RETURN c.id as id, c.text as text, c.position as position 
+            ORDER BY c.position
             """
             
 QUERY_TO_DELETE_EXISTING_ENTITIES = """
@@ -820,6 +878,15 @@ QUERY_TO_GET_LAST_PROCESSED_CHUNK_WITHOUT_ENTITY = """
                               RETURN c.id as id,c.position as position 
                               ORDER BY c.position LIMIT 1
                               """
+QUERY_TO_GET_PROCESSED_CHUNK_CHECKPOINT = """
+                              MATCH (d:Document)
+                              WHERE d.fileName = $filename
+                              RETURN coalesce(d.processed_chunk, 0) as processed_chunk
+                              """
+QUERY_TO_GET_DOCUMENT_CHUNK_IDS = """
+                              MATCH (d:Document {fileName: $filename})<-[:PART_OF]-(c:Chunk)
+                              RETURN c.id AS id, c.position <= coalesce(d.processed_chunk, 0) AS processed
+                              """
 QUERY_TO_GET_NODES_AND_RELATIONS_OF_A_DOCUMENT = """
                               MATCH (d:Document)<-[:PART_OF]-(:Chunk)-[:HAS_ENTITY]->(e) where d.fileName=$filename
                               OPTIONAL MATCH (d)<-[:PART_OF]-(:Chunk)-[:HAS_ENTITY]->(e2:!Chunk)-[rel]-(e)
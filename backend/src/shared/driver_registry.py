@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+NEO4J_DRIVER_REGISTRY_SIZE = int(os.getenv('NEO4J_DRIVER_REGISTRY_SIZE', 32))
+NEO4J_DRIVER_IDLE_SECONDS = float(os.getenv('NEO4J_DRIVER_IDLE_SECONDS', 1800))
+NEO4J_DRIVER_HEALTH_CHECK_SECONDS = float(os.getenv('NEO4J_DRIVER_HEALTH_CHECK_SECONDS', 60))
+NEO4J_MAX_CONNECTION_POOL_SIZE = int(os.getenv('NEO4J_MAX_CONNECTION_POOL_SIZE', 100))
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(os.getenv('NEO4J_CONNECTION_ACQUISITION_TIMEOUT', 60))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv('NEO4J_MAX_CONNECTION_LIFETIME', 3600))
+NEO4J_LIVENESS_CHECK_TIMEOUT = float(os.getenv('NEO4J_LIVENESS_CHECK_TIMEOUT', 300))
+# Over capacity, drivers used this recently are kept; a running job may be between queries.
+LRU_EVICTION_MIN_IDLE_SECONDS = 60
+
+
+def get_pool_config():
+    """Connection pool settings passed to every driver the registry creates."""
+    return {
+        'max_connection_pool_size': NEO4J_MAX_CONNECTION_POOL_SIZE,
+        'connection_acquisition_timeout': NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+        'max_connection_lifetime': NEO4J_MAX_CONNECTION_LIFETIME,
+        'liveness_check_timeout': NEO4J_LIVENESS_CHECK_TIMEOUT,
+    }
+
+
+def get_database_key(uri, database):
+    """Identifies one database of one server; used by the job queue and the status bus."""
+    return f"{uri}|{database}"
+
+
+def _driver_of(client):
+    # Registry entries are either neo4j drivers or Neo4jGraph objects wrapping one.
+    return getattr(client, '_driver', client)
+
+
+def _connection_counts(driver):
+    """Best effort in-use/idle connection counts; the driver has no public pool API."""
+    try:
+        connections = [connection for address_connections in driver._pool.connections.values() for connection in address_connections]
+        in_use = sum(1 for connection in connections if connection.in_use)
+        return in_use, len(connections) - in_use
+    except Exception:
+        return None, None
+
+
+def _is_leased(entry):
+    """
+    True while code outside the registry still holds the client, e.g. a job between two
+    queries. The registry keeps one reference through the entry and getrefcount adds one
+    for its argument; any other reference is a caller that got the client from get().
+    """
+    return sys.getrefcount(entry.client) > 2
+
+
+class _Entry:
+
+    def __init__(self, client):
+        self.client = client
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_health_check = self.created_at
+
+
+class DriverRegistry:
+    """
+    Process-wide registry of Neo4j drivers and Neo4jGraph connections, keyed by
+    (kind, uri, user, database, password digest), so requests reuse a connection pool
+    instead of paying TLS, authentication and connectivity checks every time.
+
+    A cached entry is health checked with verify_connectivity at most every
+    `health_check_seconds` and recreated when closed or unhealthy. Entries unused for
+    `idle_seconds` are closed, and above `max_size` entries the least recently used ones
+    idle for a minute are closed first. Entries whose client is still referenced by a
+    caller, or that have connections in use, are never closed.
+    """
+
+    def __init__(self, max_size=NEO4J_DRIVER_REGISTRY_SIZE, idle_seconds=NEO4J_DRIVER_IDLE_SECONDS, health_check_seconds=NEO4J_DRIVER_HEALTH_CHECK_SECONDS):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.health_check_seconds = health_check_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.health_check_failures = 0
+
+    @staticmethod
+    def make_key(kind, uri, username, password, database):
+        password_digest = hashlib.sha256((password or '').encode()).hexdigest()
+        return (kind, uri, username, database, password_digest)
+
+    def get(self, key, factory):
+        """Returns the cached client for `key`, creating it with `factory()` when needed."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and self._is_usable(entry):
+            entry.last_used = time.monotonic()
+            with self._lock:
+                self.hits += 1
+            return entry.client
+        if entry is not None:
+            self._remove(key, entry)
+
+        client = factory()
+        with self._lock:
+            self.misses += 1
+            existing = self._entries.get(key)
+            if existing is not None and not _driver_of(existing.client)._closed:
+                # Another request created the same connection meanwhile; keep one.
+                duplicate, client = client, existing.client
+            else:
+                duplicate = None
+                self._entries[key] = _Entry(client)
+            to_close = self._collect_evictions()
+        for evicted in ([duplicate] if duplicate is not None else []) + to_close:
+            self._close(evicted)
+        return client
+
+    def _is_usable(self, entry):
+        driver = _driver_of(entry.client)
+        if getattr(driver, '_closed', False):
+            return False
+        if time.monotonic() - entry.last_health_check < self.health_check_seconds:
+            return True
+        try:
+            driver.verify_connectivity()
+            entry.last_health_check = time.monotonic()
+            return True
+        except Exception as e:
+            with self._lock:
+                self.health_check_failures += 1
+            logging.warning(f"Cached Neo4j driver failed its health check, reconnecting: {e}")
+            return False
+
+    def _remove(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        self._close(entry.client)
+
+    def _collect_evictions(self):
+        # Called with the lock held; returns the clients to close outside of it.
+        now = time.monotonic()
+        evicted = []
+        for key, entry in list(self._entries.items()):
+            idle_for = now - entry.last_used
+            over_capacity = len(self._entries) > self.max_size and idle_for >= LRU_EVICTION_MIN_IDLE_SECONDS
+            if idle_for < self.idle_seconds and not over_capacity:
+                continue
+            if _is_leased(entry) or _connection_counts(_driver_of(entry.client))[0]:
+                entry.last_used = now
+                continue
+            del self._entries[key]
+            evicted.append(entry.client)
+            self.evictions += 1
+        if len(self._entries) > self.max_size:
+            logging.info(f"Neo4j driver registry holds {len(self._entries)} active drivers, above NEO4J_DRIVER_REGISTRY_SIZE={self.max_size}")
+        return evicted
+
+    def _close(self, client):
+        try:
+            _driver_of(client).close()
+        except Exception as e:
+            logging.warning(f"Failed to close Neo4j driver: {e}")
+
+    def evict_idle(self):
+        with self._lock:
+            to_close = self._collect_evictions()
+        for client in to_close:
+            self._close(client)
+        return len(to_close)
+
+    def close_all(self):
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), OrderedDict()
+        for entry in entries:
+            self._close(entry.client)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.items())
+            stats = {'drivers': len(entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses,
+                     'evictions': self.evictions, 'health_check_failures': self.health_check_failures}
+        pools = []
+        # Served by the unauthenticated /runtime_metrics, so servers and users are left out.
+        for (kind, _, _, _, _), entry in entries:
+            in_use, idle = _connection_counts(_driver_of(entry.client))
+            pools.append({'kind': kind, 'idle_seconds': round(now - entry.last_used, 1), 'in_use_connections': in_use, 'idle_connections': idle})
+        stats['pools'] = pools
+        return stats
+
+
+driver_registry = DriverRegistry()
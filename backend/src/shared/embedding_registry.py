@@ -0,0 +1,89 @@
+import logging
+import resource
+import threading
+import time
+
+
+def _model_memory_bytes(embeddings):
+    """Parameter and buffer bytes of a local model; None for API backed embeddings."""
+    client = getattr(embeddings, '_client', None) or getattr(embeddings, 'client', None)
+    if client is None or not hasattr(client, 'parameters'):
+        return None
+    try:
+        tensors = list(client.parameters()) + list(client.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+    except Exception:
+        return None
+
+
+class _Entry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = None
+        self.load_seconds = None
+        self.memory_bytes = None
+        self.uses = 0
+
+
+class EmbeddingModelRegistry:
+    """
+    Process-wide registry of embedding models keyed by (model name, config), so every
+    module shares one instance per model instead of constructing its own copy. The first
+    caller of a key loads the model while later callers of the same key wait for it; other
+    keys load independently. Embedding instances are used concurrently from worker threads,
+    which the HuggingFace and API backed embedding classes support.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_name, config):
+        return (model_name, tuple(sorted(config.items())))
+
+    def get(self, model_name, loader, **config):
+        """Returns (embeddings, dimension) for the key, calling `loader(model_name, **config)` once."""
+        key = self.make_key(model_name, config)
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            entry.uses += 1
+        if entry.value is not None:
+            return entry.value
+        with entry.lock:
+            if entry.value is None:
+                start = time.time()
+                value = loader(model_name, **config)
+                entry.load_seconds = round(time.time() - start, 2)
+                entry.memory_bytes = _model_memory_bytes(value[0])
+                entry.value = value
+                logging.info(f"Embedding model {model_name} loaded in {entry.load_seconds} seconds")
+        return entry.value
+
+    def preload(self, model_names, loader):
+        """Loads the given models ahead of the first request; failures are logged and skipped."""
+        for model_name in model_names:
+            try:
+                self.get(model_name, loader)
+            except Exception as e:
+                logging.warning(f"Failed to preload embedding model {model_name}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._entries.items())
+        models = []
+        for (model_name, config), entry in entries:
+            models.append({'model': model_name, 'config': dict(config), 'loaded': entry.value is not None,
+                           'dimension': entry.value[1] if entry.value is not None else None, 'uses': entry.uses,
+                           'load_seconds': entry.load_seconds,
+                           'memory_mb': round(entry.memory_bytes / 2**20, 1) if entry.memory_bytes is not None else None})
+        # ru_maxrss is reported in kilobytes on Linux.
+        return {'models': models, 'process_peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+
+embedding_registry = EmbeddingModelRegistry()
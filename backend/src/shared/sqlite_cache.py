@@ -0,0 +1,116 @@
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class SQLiteBlobCache:
+    """
+    Persistent key/value cache of byte strings in a local SQLite file.
+
+    Entries older than `ttl_seconds` (when set) are treated as misses, and once the stored
+    values exceed `max_bytes` the least recently used entries are evicted down to 90% of it.
+    Hit, miss and eviction counters are kept per process.
+    """
+
+    def __init__(self, path, table, max_bytes, ttl_seconds=None):
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table}(accessed_at)")
+            self._total_bytes = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, keys):
+        """Returns a dict of the cached values for the given keys that are present and not expired."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            # Stay well below SQLite's bound parameter limit.
+            for i in range(0, len(keys), 500):
+                key_batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(key_batch))
+                query = f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})"
+                params = list(key_batch)
+                if self.ttl_seconds:
+                    query += " AND created_at >= ?"
+                    params.append(now - self.ttl_seconds)
+                found.update(conn.execute(query, params).fetchall())
+            if found:
+                conn.executemany(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", [(now, key) for key in found])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        if not items:
+            return
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(f"INSERT OR REPLACE INTO {self.table} (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                             [(key, value, len(value), now, now) for key, value in items.items()])
+            conn.execute("COMMIT")
+            # Overcounts replaced entries; _evict recounts before dropping anything.
+            self._total_bytes += sum(len(value) for value in items.values())
+            if self._total_bytes > self.max_bytes:
+                self._evict(conn)
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def _evict(self, conn):
+        # Other processes may share the file, so recount before deciding how much to drop.
+        self._total_bytes = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if self._total_bytes <= self.max_bytes:
+            return
+        evicted = 0
+        freed = 0
+        rows = conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC")
+        evict_keys = []
+        for key, size in rows:
+            if self._total_bytes - freed <= target:
+                break
+            evict_keys.append((key,))
+            freed += size
+            evicted += 1
+        rows.close()
+        conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", evict_keys)
+        self._total_bytes -= freed
+        self.evictions += evicted
+        logging.info(f"Cache {self.table}: evicted {evicted} entries ({freed} bytes)")
+
+    def delete_expired(self):
+        if not self.ttl_seconds:
+            return 0
+        with self._lock, self._connect() as conn:
+            deleted = conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl_seconds,)).rowcount
+            self._total_bytes = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        return deleted
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions, 'size_bytes': self._total_bytes, 'max_bytes': self.max_bytes}
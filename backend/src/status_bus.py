@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+STATUS_POLL_INTERVAL_SECONDS = float(os.getenv('STATUS_POLL_INTERVAL_SECONDS', 5))
+STATUS_MIN_PUBLISH_INTERVAL_SECONDS = float(os.getenv('STATUS_MIN_PUBLISH_INTERVAL_SECONDS', 0.5))
+STATUS_FIELDS = ('status', 'processingTime', 'nodeCount', 'relationshipCount', 'model', 'total_chunks', 'fileSize',
+                 'processed_chunk', 'fileSource', 'chunkNodeCount', 'chunkRelCount', 'entityNodeCount',
+                 'entityEntityRelCount', 'communityNodeCount', 'communityRelCount')
+
+
+class StatusSubscription:
+    """
+    One client's view of the bus: the (database key, file name) pairs it follows and the
+    ones that changed since it last read. Several updates to a file between two reads are
+    coalesced into the latest snapshot.
+    """
+
+    def __init__(self, bus, database_key, file_names):
+        self.bus = bus
+        self.keys = {(database_key, file_name) for file_name in file_names}
+        self.dirty = set()
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def _notify(self, key):
+        # Called with the bus lock held, possibly from a worker thread.
+        self.dirty.add(key)
+        self._loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self, timeout):
+        """Waits up to `timeout` seconds for a change; returns the changed file names."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self.bus._lock:
+            self._event.clear()
+            changed, self.dirty = self.dirty, set()
+        return [file_name for _, file_name in changed]
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class StatusBus:
+    """
+    In-process publish/subscribe bus for Document status. The ingestion pipeline publishes
+    the properties it writes to the Document node; SSE streams subscribe to the files they
+    show and only read Neo4j when the bus has no snapshot yet or as a periodic fallback
+    for updates made by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._subscribers = {}
+        self.published = 0
+        self.delivered = 0
+
+    def publish(self, database_key, file_name, fields):
+        key = (database_key, file_name)
+        with self._lock:
+            self.published += 1
+            # Only followed files keep a snapshot; a new subscriber starts from the DB.
+            if key not in self._subscribers:
+                return
+            self._snapshots.setdefault(key, {}).update(fields)
+            for subscription in self._subscribers[key]:
+                subscription._notify(key)
+
+    def snapshot(self, database_key, file_name):
+        with self._lock:
+            snapshot = self._snapshots.get((database_key, file_name))
+            return dict(snapshot) if snapshot is not None else None
+
+    def subscribe(self, database_key, file_names):
+        subscription = StatusSubscription(self, database_key, file_names)
+        with self._lock:
+            for key in subscription.keys:
+                self._subscribers.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for key in subscription.keys:
+                subscribers = self._subscribers.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[key]
+                        # Nobody follows the file any more; the DB has the final state.
+                        self._snapshots.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'subscriptions': len({id(s) for subscribers in self._subscribers.values() for s in subscribers}),
+                    'followed_files': len(self._subscribers), 'published': self.published, 'delivered': self.delivered}
+
+
+status_bus = StatusBus()
+
+
+def publish_document_status(graph, file_name, fields):
+    """Publishes Document properties written through `graph`; never fails the caller."""
+    database_key = getattr(graph, 'status_key', None)
+    fields = {field: value for field, value in fields.items() if field in STATUS_FIELDS}
+    if database_key is None or not file_name or not fields:
+        return
+    try:
+        status_bus.publish(database_key, file_name, fields)
+    except Exception as e:
+        logging.warning(f"Failed to publish status of {file_name}: {e}")
+
+
+async def stream_document_status(database_key, file_names, read_status, is_disconnected):
+    """
+    Yields status snapshots of `file_names` as they change, at most one per file every
+    STATUS_MIN_PUBLISH_INTERVAL_SECONDS. `read_status(file_name)` reads the Document node
+    from Neo4j; it is used for the initial state of each file and every
+    STATUS_POLL_INTERVAL_SECONDS to pick up changes made by other processes.
+    """
+    subscription = status_bus.subscribe(database_key, file_names)
+    last_sent = {}
+    try:
+        pending = list(file_names)
+        from_db = set(file_names)
+        last_poll = time.monotonic()
+        while True:
+            if await is_disconnected():
+                logging.info(" SSE Client disconnected")
+                break
+            for file_name in pending:
+                if file_name in from_db:
+                    status = await asyncio.to_thread(read_status, file_name)
+                    if status is not None:
+                        status_bus.publish(database_key, file_name, status)
+                else:
+                    status = status_bus.snapshot(database_key, file_name)
+                if status is not None and status != last_sent.get(file_name):
+                    last_sent[file_name] = status
+                    status_bus.delivered += 1
+                    yield {'fileName': file_name, **status}
+            await asyncio.sleep(STATUS_MIN_PUBLISH_INTERVAL_SECONDS)
+            changed = await subscription.wait(max(0, STATUS_POLL_INTERVAL_SECONDS - (time.monotonic() - last_poll)))
+            if time.monotonic() - last_poll >= STATUS_POLL_INTERVAL_SECONDS:
+                pending, from_db = list(file_names), set(file_names)
+                last_poll = time.monotonic()
+            else:
+                pending, from_db = changed, set()
+    finally:
+        subscription.close()
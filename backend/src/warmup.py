@@ -0,0 +1,64 @@
+import logging
+import os
+import threading
+import time
+from src.shared.common_fn import preload_embedding_models
+from src.create_chunks import get_token_encoder
+
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "True").lower() in ("true", "1", "yes")
+EMBEDDING_PRELOAD_MODELS = [model.strip() for model in os.getenv('EMBEDDING_PRELOAD_MODELS', '').split(',') if model.strip()]
+WARMUP_LLM_MODELS = [model.strip() for model in os.getenv('WARMUP_LLM_MODELS', '').split(',') if model.strip()]
+
+_warmup_stats = {'status': 'not started', 'steps': {}}
+_warmup_lock = threading.Lock()
+
+
+def _warmup_steps():
+    embedding_models = EMBEDDING_PRELOAD_MODELS or [os.getenv('EMBEDDING_MODEL')]
+    steps = [('embedding_models', lambda: preload_embedding_models(embedding_models)),
+             ('token_encoder', get_token_encoder)]
+    for model in WARMUP_LLM_MODELS:
+        steps.append((f'llm:{model}', lambda model=model: _create_llm(model)))
+    return steps
+
+
+def _create_llm(model):
+    # Imports the provider package and builds its client; no request is sent.
+    from src.llm import get_llm
+    get_llm(model)
+
+
+def warm_up():
+    """
+    Loads what the first requests would otherwise load: the embedding models, the token
+    encoder and the LLM providers listed in WARMUP_LLM_MODELS. Each step is timed; a
+    failing step is logged and the next one still runs.
+    """
+    with _warmup_lock:
+        if _warmup_stats['status'] != 'not started':
+            return
+        _warmup_stats['status'] = 'running'
+    start = time.time()
+    for name, step in _warmup_steps():
+        step_start = time.time()
+        try:
+            step()
+            _warmup_stats['steps'][name] = f'{time.time() - step_start:.2f}'
+        except Exception as e:
+            _warmup_stats['steps'][name] = f'failed: {e}'
+            logging.warning(f"Warm-up step {name} failed: {e}")
+    _warmup_stats['elapsed'] = f'{time.time() - start:.2f}'
+    _warmup_stats['status'] = 'completed'
+    logging.info(f"Warm-up completed in {_warmup_stats['elapsed']} seconds: {_warmup_stats['steps']}")
+
+
+def start_background_warmup():
+    """Runs warm_up on a daemon thread so startup does not wait for model loading."""
+    if not WARMUP_ON_STARTUP:
+        _warmup_stats['status'] = 'disabled'
+        return
+    threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+
+
+def get_warmup_stats():
+    return {**_warmup_stats, 'steps': dict(_warmup_stats['steps'])}
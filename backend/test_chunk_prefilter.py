@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.documents import Document
+from src.chunk_prefilter import filter_low_information_chunks, information_score, strip_repeated_page_lines
+
+PROSE = ("The committee approved the new budget after a long debate about school funding, road repairs and "
+         "the cost of expanding public transport to the northern districts of the city.")
+TABLE_OF_CONTENTS = "\n".join(f"{i}. Chapter {i} ........ {i * 12}" for i in range(1, 20))
+NUMBER_TABLE = " ".join(str(value) for value in range(1000, 1060))
+JAPANESE = "東京は日本の首都であり、政治と経済の中心地として多くの企業や官公庁が集まっている大都市です。"
+
+
+def test_prose_scores_high():
+    assert information_score(PROSE) > 0.7
+    assert information_score(JAPANESE) > 0.7
+
+
+def test_tables_and_lists_score_low():
+    assert information_score(TABLE_OF_CONTENTS) < 0.35
+    assert information_score(NUMBER_TABLE) < 0.35
+    assert information_score("the and of to the and of to " * 10) < 0.35
+
+
+def test_short_chunks_are_kept():
+    assert information_score("Revenue was 5M.") == 1.0
+    assert information_score("東京") == 1.0
+    assert information_score("") == 0.0
+
+
+def test_filter_splits_chunks():
+    rows = [{'chunk_id': str(i), 'chunk_doc': Document(page_content=text)} for i, text in enumerate([PROSE, TABLE_OF_CONTENTS, "Paris is the capital of France."])]
+    kept, skipped = filter_low_information_chunks(rows, min_score=0.35)
+    assert [row['chunk_id'] for row in kept] == ['0', '2']
+    assert [row['chunk_id'] for row in skipped] == ['1']
+
+
+def test_repeated_page_lines_are_stripped():
+    bodies = [" ".join(PROSE.split()[i:i + 8]) for i in range(10)]
+    pages = [Document(page_content=f"ACME Annual Report 2023\n{body}\nPage {i} of 10", metadata={'page': i}) for i, body in enumerate(bodies)]
+    stats = {}
+    stripped = list(strip_repeated_page_lines(pages, stats))
+    assert [page.metadata['page'] for page in stripped] == list(range(10))
+    assert [page.page_content for page in stripped] == bodies
+    assert stats['stripped_lines'] == 20
+
+
+def test_repeated_lines_are_only_stripped_at_the_page_edges():
+    bodies = [[f"{word} {'abcdefghij'[i]}" for word in PROSE.split()[:6]] for i in range(10)]
+    pages = [Document(page_content="\n".join(["ACME Annual Report", *body[:3], str(i * 7), *body[3:], str(i)]), metadata={'page': i}) for i, body in enumerate(bodies)]
+    stripped = list(strip_repeated_page_lines(pages))
+    # The body number folds to the same line as the page number footer, but is not at an edge.
+    assert [page.page_content for page in stripped] == ["\n".join([*body[:3], str(i * 7), *body[3:]]) for i, body in enumerate(bodies)]
@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("graphdatascience")
+pytest.importorskip("langchain_core")
+pytest.importorskip("neo4j")
+from src.communities import match_community_assignments
+
+
+def row(element_id, previous, next):
+    return {'elementId': element_id, 'previous': previous, 'next': next}
+
+
+def test_unchanged_communities_keep_their_ids():
+    rows = [row('a', [0, 0], [5, 1]), row('b', [0, 0], [5, 1]), row('c', [1, 0], [3, 1])]
+    updates, deleted_ids, created_ids, report = match_community_assignments(rows)
+    assert updates == []
+    assert deleted_ids == []
+    assert created_ids == []
+    assert report['communities_kept'] == 3
+    assert report['communities_created'] == 0
+
+
+def test_changed_community_gets_a_new_id_and_old_one_is_deleted():
+    rows = [row('a', [0], [0]), row('b', [0], [0]), row('c', [0], [1]), row('d', [1], [2])]
+    updates, deleted_ids, created_ids, report = match_community_assignments(rows)
+    # {a, b, c} split into {a, b} and {c}; {d} is unchanged.
+    assert sorted(deleted_ids) == ['0-0']
+    assert sorted(created_ids) == ['0-2', '0-3']
+    by_entity = {update['elementId']: update['communities'] for update in updates}
+    assert by_entity['a'] == by_entity['b']
+    assert by_entity['a'][0] not in (0, 1) and by_entity['c'][0] not in (0, 1)
+    assert by_entity['a'] != by_entity['c']
+    assert 'd' not in by_entity
+    assert report == {'entities': 4, 'changed_entities': 3, 'communities_kept': 1, 'communities_created': 2, 'communities_deleted': 1}
+
+
+def test_new_entities_join_without_renumbering_others():
+    rows = [row('a', [0], [4]), row('b', [1], [7]), row('c', None, [9])]
+    updates, deleted_ids, created_ids, report = match_community_assignments(rows)
+    assert updates == [{'elementId': 'c', 'communities': [2]}]
+    assert deleted_ids == []
+    assert created_ids == ['0-2']
+    assert report['communities_created'] == 1
+
+
+def test_entities_without_new_communities_are_cleared():
+    rows = [row('a', [0], [0]), row('b', [0], None)]
+    updates, deleted_ids, created_ids, report = match_community_assignments(rows)
+    assert {'elementId': 'b', 'communities': None} in updates
+    assert deleted_ids == ['0-0']
+    assert report['entities'] == 1
+
+
+def test_levels_are_matched_independently():
+    rows = [row('a', [0, 0], [0, 0]), row('b', [1, 0], [0, 0])]
+    updates, deleted_ids, created_ids, _ = match_community_assignments(rows)
+    assert sorted(deleted_ids) == ['0-0', '0-1']
+    assert created_ids == ['0-2']
+    assert all(update['communities'][1] == 0 for update in updates)
+
+
+def test_no_rows():
+    assert match_community_assignments([]) == ([], [], [], {'entities': 0, 'changed_entities': 0, 'communities_kept': 0, 'communities_created': 0, 'communities_deleted': 0})
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+pytest.importorskip("langchain_neo4j")
+from src.create_chunks import get_token_encoder, split_text_with_offsets
+
+try:
+    get_token_encoder()
+except Exception as e:
+    # tiktoken downloads the encoding on first use, which needs network access.
+    pytest.skip(f"token encoding unavailable: {e}", allow_module_level=True)
+
+TEXT = " ".join(f"Sentence {i} talks about topic {i % 7} and mentions café, naïve and 東京." for i in range(60))
+
+
+def token_windows(text, size, overlap):
+    tokens = get_token_encoder().encode_ordinary(text)
+    return [tokens[start:start + size] for start in range(0, max(len(tokens) - overlap, 1), size - overlap)]
+
+
+def test_offsets_slice_the_chunk_text():
+    offsets = split_text_with_offsets(TEXT, 50, 10)
+    windows = token_windows(TEXT, 50, 10)
+    assert len(offsets) == len(windows)
+    for (start, end), window in zip(offsets, windows):
+        decoded = get_token_encoder().decode(window)
+        # A window edge may fall inside a multi-byte character, which the slice keeps whole.
+        assert decoded.strip("�") in TEXT[start:end]
+        assert len(TEXT[start:end]) - len(decoded.strip("�")) <= 2
+
+
+def test_chunks_cover_the_text():
+    offsets = split_text_with_offsets(TEXT, 50, 10)
+    assert offsets[0][0] == 0
+    assert offsets[-1][1] == len(TEXT)
+
+
+def test_consecutive_chunks_overlap():
+    offsets = split_text_with_offsets(TEXT, 50, 10)
+    for (start, end), (next_start, next_end) in zip(offsets, offsets[1:]):
+        assert start < next_start < end < next_end
+        overlap = get_token_encoder().encode_ordinary(TEXT[next_start:end])
+        assert 8 <= len(overlap) <= 12
+
+
+def test_without_overlap_chunks_are_contiguous():
+    offsets = split_text_with_offsets(TEXT, 40, 0)
+    assert "".join(TEXT[start:end] for start, end in offsets) == TEXT
+
+
+def test_short_text_is_one_chunk():
+    assert split_text_with_offsets("A short text.", 200, 20) == [(0, len("A short text."))]
+
+
+def test_empty_text_has_no_chunks():
+    assert split_text_with_offsets("", 200, 20) == []
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        split_text_with_offsets(TEXT, 20, 20)
@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+import src.extraction_scheduler as extraction_scheduler
+from src.extraction_scheduler import AdaptiveConcurrencyLimiter, is_rate_limit_error, is_timeout_error
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(extraction_scheduler, 'EXTRACTION_RETRY_BACKOFF', 0)
+    monkeypatch.setattr(extraction_scheduler, 'EXTRACTION_CALL_TIMEOUT', 0)
+
+
+def test_error_classification():
+    assert is_rate_limit_error(RateLimitError())
+    assert is_rate_limit_error(Exception("Resource exhausted: RESOURCE_EXHAUSTED"))
+    assert not is_rate_limit_error(ValueError("bad input"))
+    assert is_timeout_error(asyncio.TimeoutError())
+    assert not is_timeout_error(ValueError("bad input"))
+
+
+def test_limit_stays_within_bounds():
+    limiter = AdaptiveConcurrencyLimiter("model", initial=50, minimum=2, maximum=8)
+    assert limiter.limit == 8
+    limiter = AdaptiveConcurrencyLimiter("model", initial=0, minimum=2, maximum=8)
+    assert limiter.limit == 2
+
+
+def test_successes_raise_the_limit_additively():
+    limiter = AdaptiveConcurrencyLimiter("model", initial=4, maximum=32, increase=1)
+    for _ in range(4):
+        limiter.on_success(0.1)
+    assert 4.9 < limiter.limit < 5.1
+    for _ in range(1000):
+        limiter.on_success(0.1)
+    assert limiter.limit == 32
+
+
+def test_overload_halves_the_limit_once_per_round():
+    limiter = AdaptiveConcurrencyLimiter("model", initial=16, minimum=1, decrease=0.5)
+    for _ in range(5):
+        limiter.on_overload(0.1, timed_out=False)
+    assert limiter.limit == 8
+    assert limiter.rate_limited == 5
+    limiter._last_decrease -= 2
+    limiter.on_overload(0.1, timed_out=True)
+    assert limiter.limit == 4
+    assert limiter.timeouts == 1
+
+
+def test_in_flight_calls_never_exceed_the_limit():
+    limiter = AdaptiveConcurrencyLimiter("model", initial=3, maximum=3)
+    running, peak = 0, 0
+
+    async def call(value):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return value
+
+    async def main():
+        return await asyncio.gather(*[limiter.run(call, i) for i in range(12)])
+
+    assert asyncio.run(main()) == list(range(12))
+    assert peak == 3
+    assert limiter.stats()['in_flight'] == 0
+    assert limiter.successes == 12
+
+
+def test_rate_limited_calls_are_retried():
+    limiter = AdaptiveConcurrencyLimiter("model", initial=4)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimitError("429 Too Many Requests")
+        return "done"
+
+    assert asyncio.run(limiter.run(call)) == "done"
+    assert len(attempts) == 3
+    assert limiter.rate_limited == 2
+    assert limiter.limit < 4
+
+
+def test_retries_are_bounded(monkeypatch):
+    monkeypatch.setattr(extraction_scheduler, 'EXTRACTION_MAX_RETRIES', 2)
+    limiter = AdaptiveConcurrencyLimiter("model")
+
+    async def call():
+        raise RateLimitError("429")
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(limiter.run(call))
+    assert limiter.calls == 3
+
+
+def test_other_errors_are_not_retried():
+    limiter = AdaptiveConcurrencyLimiter("model", initial=4)
+
+    async def call():
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        asyncio.run(limiter.run(call))
+    assert limiter.calls == 1
+    assert limiter.errors == 1
+    assert limiter.limit == 4
+    assert limiter.stats()['in_flight'] == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    limiter = AdaptiveConcurrencyLimiter("model", initial=1, maximum=1)
+
+    async def main():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        await asyncio.wait_for(limiter.acquire(), 1)
+        limiter.release()
+
+    asyncio.run(main())
+    assert limiter.in_flight == 0
+    assert limiter.stats()['queue_depth'] == 0
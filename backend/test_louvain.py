@@ -0,0 +1,73 @@
+import numpy as np
+from src.louvain import build_adjacency, hierarchical_louvain, modularity, relabel
+
+
+def two_cliques():
+    """Two 5-node cliques joined by a single edge."""
+    edges = [(i, j) for group in (range(5), range(5, 10)) for i in group for j in group if i < j] + [(4, 5)]
+    sources, targets = zip(*edges)
+    return build_adjacency(np.array(sources), np.array(targets), np.ones(len(edges)), 10)
+
+
+def planted_graph(nodes=2000, community_size=50, degree=10, noise=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    planted = np.arange(nodes) // community_size
+    edge_count = nodes * degree // 2
+    sources = rng.integers(0, nodes, edge_count)
+    targets = planted[sources] * community_size + rng.integers(0, community_size, edge_count)
+    noisy = rng.random(edge_count) < noise
+    targets[noisy] = rng.integers(0, nodes, noisy.sum())
+    return build_adjacency(sources, targets, np.ones(edge_count), nodes), planted
+
+
+def test_build_adjacency_is_symmetric():
+    adjacency = build_adjacency(np.array([0, 1]), np.array([1, 2]), np.array([2.0, 1.0]), 3)
+    assert (adjacency != adjacency.T).nnz == 0
+    assert adjacency[0, 1] == 2.0 and adjacency[2, 1] == 1.0
+
+
+def test_relabel_keeps_order():
+    assert relabel(np.array([7, 3, 7, 9])).tolist() == [1, 0, 1, 2]
+
+
+def test_modularity_of_trivial_partitions():
+    adjacency = two_cliques()
+    assert modularity(adjacency, np.zeros(10, dtype=int)) == 0.0
+    assert modularity(adjacency, np.array([0] * 5 + [1] * 5)) > 0.4
+
+
+def test_separates_two_cliques():
+    levels, modularities = hierarchical_louvain(two_cliques(), max_levels=3)
+    first = levels[0]
+    assert len(set(first[:5])) == 1 and len(set(first[5:])) == 1
+    assert first[0] != first[5]
+    assert modularities[0] == max(modularities)
+
+
+def test_reaches_planted_modularity():
+    adjacency, planted = planted_graph()
+    levels, modularities = hierarchical_louvain(adjacency, max_levels=3)
+    assert max(modularities) >= modularity(adjacency, planted) - 0.01
+    for level in levels:
+        assert len(level) == adjacency.shape[0]
+    assert [level.max() for level in levels] == sorted((level.max() for level in levels), reverse=True)
+
+
+def test_is_deterministic_for_a_random_seed():
+    adjacency, _ = planted_graph(nodes=500)
+    first, _ = hierarchical_louvain(adjacency, max_levels=2, random_seed=7)
+    second, _ = hierarchical_louvain(adjacency, max_levels=2, random_seed=7)
+    assert all((a == b).all() for a, b in zip(first, second))
+
+
+def test_seed_communities_are_kept_when_optimal():
+    seed = np.array([0] * 5 + [1] * 5)
+    levels, _ = hierarchical_louvain(two_cliques(), max_levels=1, seed_communities=seed)
+    assert levels[0].tolist() == seed.tolist()
+
+
+def test_graph_without_edges():
+    adjacency = build_adjacency(np.array([], dtype=int), np.array([], dtype=int), np.array([]), 4)
+    levels, modularities = hierarchical_louvain(adjacency, max_levels=3)
+    assert levels[0].tolist() == [0, 1, 2, 3]
+    assert modularities == [0.0]
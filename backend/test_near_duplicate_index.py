@@ -0,0 +1,56 @@
+import pytest
+from src.near_duplicate_index import NearDuplicateIndex, get_shingles
+
+ARTICLE = ("The company reported quarterly revenue growth driven by its cloud division, while operating costs "
+           "rose because of new data center investments in Europe and Asia. Analysts expect the trend to continue "
+           "as enterprise customers move more workloads to managed services over the next two years.")
+UNRELATED = ("The river flooded the valley after three days of heavy rain, forcing farmers to move their cattle to "
+             "higher ground and closing the only road to the village until the water receded in late spring.")
+
+
+@pytest.fixture
+def index(tmp_path):
+    return NearDuplicateIndex(str(tmp_path / "near_duplicates.db"), num_perm=128, bands=32)
+
+
+def test_shingles_ignore_case_punctuation_and_digits():
+    assert get_shingles("Page 12: The Quick, brown fox") == get_shingles("page 47 the quick brown  fox!")
+    assert get_shingles("two words") == {"two words"}
+    assert get_shingles("   ") == set()
+
+
+def test_num_perm_must_be_a_multiple_of_bands(tmp_path):
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(str(tmp_path / "index.db"), num_perm=100, bands=32)
+
+
+def test_finds_a_near_duplicate(index):
+    index.add_many([("article", ARTICLE), ("unrelated", UNRELATED)])
+    edited = ARTICLE.replace("two years", "three years") + " Page 7"
+    matches = index.find_near_duplicates([("edited", edited)], threshold=0.7)
+    assert matches["edited"][0] == "article"
+    assert 0.7 <= matches["edited"][1] < 1.0
+
+
+def test_unrelated_text_does_not_match(index):
+    index.add_many([("article", ARTICLE)])
+    assert index.find_near_duplicates([("unrelated", UNRELATED)], threshold=0.5) == {}
+
+
+def test_a_chunk_does_not_match_itself(index):
+    index.add_many([("article", ARTICLE)])
+    assert index.find_near_duplicates([("article", ARTICLE)], threshold=0.9) == {}
+
+
+def test_identical_text_has_similarity_one(index):
+    index.add_many([("article", ARTICLE)])
+    assert index.find_near_duplicates([("copy", ARTICLE)], threshold=0.9) == {"copy": ("article", 1.0)}
+
+
+def test_index_persists_and_ignores_known_ids(tmp_path):
+    path = str(tmp_path / "near_duplicates.db")
+    NearDuplicateIndex(path).add_many([("article", ARTICLE), ("empty", "")])
+    reopened = NearDuplicateIndex(path)
+    reopened.add_many([("article", UNRELATED)])
+    assert reopened.stats()['indexed_chunks'] == 1
+    assert reopened.find_near_duplicates([("copy", ARTICLE)], threshold=0.9)["copy"][0] == "article"